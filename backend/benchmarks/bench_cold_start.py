@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Benchmark: cold start of the one-shot predictor CLI
+
+server.js's workers load the data once, but `python ml_model/predictor.py <command> <json>` run on
+its own pays for interpreter start-up, imports and data loading on every call, so that is its
+latency. Each case runs in fresh processes and records:
+ - wall-clock from spawn to the first line of output (the result) and to exit; median and best of --repeat
+ - a `python -X importtime` breakdown: total import time and the heaviest top-level imports
+
+Cases: the bare interpreter and `import numpy` for reference, then search_players and duel
+(Monte Carlo and exact), each served from the feature store ("store", the CLI default) and from the
+features DataFrame (PREDICTOR_LEAN=0, the pre-store path). Both paths must return the same result.
+Store cases are compared against --target-ms; --check exits 1 when one is over it.
+
+The data folder is --data-dir, or a synthetic corpus (see synthetic_cricsheet.py) run through
+processing/pipeline.py in a scratch folder.
+
+Usage:
+  python benchmarks/bench_cold_start.py [--data-dir DIR | --matches 150] [--repeat 7] [--target-ms 100]
+                                        [--report data/cold_start_bench.json] [--check]
+"""
+
+import argparse
+import csv
+import json
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "processing"))
+
+PREDICTOR = os.path.abspath(os.path.join(HERE, "..", "ml_model", "predictor.py"))
+PIPELINE = os.path.abspath(os.path.join(HERE, "..", "processing", "pipeline.py"))
+DEFAULT_REPORT = os.path.join(HERE, "..", "data", "cold_start_bench.json")
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+TOP_IMPORTS = 6
+
+def busiest_players(data_dir, fmt="ODI"):
+    """(batter with the most balls faced, bowler with the most balls bowled) in fmt."""
+    with open(os.path.join(data_dir, "player_features.csv"), newline="", encoding="utf-8") as f:
+        rows = [r for r in csv.DictReader(f) if r['format'] == fmt]
+    batter = max(rows, key=lambda r: float(r['balls_faced'] or 0))['player_name']
+    bowler = max(rows, key=lambda r: float(r['balls_bowled'] or 0))['player_name']
+    return batter, bowler
+
+def cases(batter, bowler, trials):
+    """{name: (argv after the interpreter, extra env, is a store case)}"""
+    duel = {'batsman': batter, 'bowler': bowler, 'format': 'ODI', 'trials': trials, 'seed': 7}
+    search = {'query': batter.split()[0][:3], 'format': 'ODI', 'limit': 10}
+    requests = {
+        'search': ['search_players', json.dumps(search)],
+        'duel mc': ['duel', json.dumps(duel)],
+        'duel exact': ['duel', json.dumps(dict(duel, mode='exact'))],
+    }
+    table = {
+        'python': (['-c', 'pass'], {}, False),
+        'import numpy': (['-c', 'import numpy'], {}, False),
+    }
+    for name, request in requests.items():
+        table[f"{name} (store)"] = ([PREDICTOR] + request, {}, True)
+        table[f"{name} (pandas)"] = ([PREDICTOR] + request, {'PREDICTOR_LEAN': '0'}, False)
+    return table
+
+def run_once(argv, env):
+    """(ms to the first output line, ms to exit, first line)"""
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable] + argv, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                            text=True)
+    first = proc.stdout.readline()
+    first_ms = (time.perf_counter() - start) * 1000
+    proc.stdout.read()
+    if proc.wait() != 0:
+        raise RuntimeError(f"{' '.join(argv)} exited with {proc.returncode}")
+    return first_ms, (time.perf_counter() - start) * 1000, first.strip()
+
+def import_breakdown(argv, env):
+    """{'total_ms', 'top': [(module, cumulative ms)]} from one `python -X importtime` run."""
+    proc = subprocess.run([sys.executable, "-X", "importtime"] + argv, env=env, capture_output=True, text=True)
+    total_us = 0
+    top = []
+    for line in proc.stderr.splitlines():
+        match = IMPORT_LINE.match(line)
+        if not match:
+            continue
+        own, cumulative, indent, module = match.groups()
+        total_us += int(own)
+        if not indent:
+            top.append((module, int(cumulative) / 1000))
+    top.sort(key=lambda item: -item[1])
+    return {'total_ms': total_us / 1000, 'top': top[:TOP_IMPORTS]}
+
+def bench_case(name, argv, extra_env, base_env, repeat):
+    env = dict(base_env, **extra_env)
+    run_once(argv, env)  # warm the page cache
+    runs = [run_once(argv, env) for _ in range(repeat)]
+    firsts, exits = [r[0] for r in runs], [r[1] for r in runs]
+    return {
+        'case': name,
+        'first_result_ms': statistics.median(firsts),
+        'first_result_best_ms': min(firsts),
+        'exit_ms': statistics.median(exits),
+        'imports': import_breakdown(argv, env),
+        'output': runs[-1][2],
+    }
+
+def prepare_data(args):
+    """Data folder to benchmark against: --data-dir, or a fresh synthetic corpus run through the pipeline."""
+    if args.data_dir:
+        return os.path.abspath(args.data_dir), None
+    from synthetic_cricsheet import generate_corpus
+
+    work_dir = tempfile.mkdtemp(prefix="cold_start_")
+    corpus = generate_corpus(work_dir, matches=args.matches, players=args.players, seed=args.seed)
+    print(f"📂 {corpus['files']} synthetic matches, {corpus['deliveries']:,} deliveries; running the pipeline...")
+    env = dict(os.environ, CRICKET_DATA_DIR=work_dir, PIPELINE_METRICS_FILE="")
+    subprocess.run([sys.executable, PIPELINE], env=env, check=True, stdout=subprocess.DEVNULL)
+    return work_dir, work_dir
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the one-shot predictor CLI's cold start")
+    parser.add_argument("--data-dir", default=None, help="Data folder with player_features.csv and its store "
+                                                         "(default: build a synthetic one)")
+    parser.add_argument("--matches", type=int, default=150, help="Synthetic corpus size (default 150)")
+    parser.add_argument("--players", type=int, default=400, help="Synthetic player pool size (default 400)")
+    parser.add_argument("--seed", type=int, default=7, help="Corpus seed (default 7)")
+    parser.add_argument("--trials", type=int, default=10000, help="Trials of the duel mc case (default 10000)")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed runs per case; the median is reported (default 7)")
+    parser.add_argument("--target-ms", type=float, default=100.0,
+                        help="Time to first result the store cases should stay under (default 100)")
+    parser.add_argument("--report", default=DEFAULT_REPORT, help="JSON report path (default data/cold_start_bench.json)")
+    parser.add_argument("--check", action="store_true", help="Exit 1 if a store case misses --target-ms")
+    args = parser.parse_args()
+
+    data_dir, scratch = prepare_data(args)
+    try:
+        batter, bowler = busiest_players(data_dir)
+        base_env = dict(os.environ, CRICKET_DATA_DIR=data_dir, PIPELINE_METRICS_FILE="", SIM_CACHE_SIZE="0")
+        base_env.pop('PREDICTOR_LEAN', None)
+        print(f"🚀 Cold start: {batter} vs {bowler} (ODI), repeat {args.repeat}, target {args.target_ms:.0f} ms\n")
+        print(f"  {'case':<22} {'first result':>13} {'best':>8} {'exit':>8} {'imports':>9}  heaviest imports")
+        results = []
+        for name, (argv, extra_env, store) in cases(batter, bowler, args.trials).items():
+            row = bench_case(name, argv, extra_env, base_env, args.repeat)
+            row['store'] = store
+            row['over_target'] = store and row['first_result_ms'] > args.target_ms
+            results.append(row)
+            heaviest = ", ".join(f"{m} {ms:.0f}" for m, ms in row['imports']['top'][:3])
+            flag = " ⚠️" if row['over_target'] else ""
+            print(f"  {name:<22} {row['first_result_ms']:>10.0f} ms {row['first_result_best_ms']:>5.0f} ms "
+                  f"{row['exit_ms']:>5.0f} ms {row['imports']['total_ms']:>6.0f} ms  {heaviest}{flag}")
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    by_name = {r['case']: r for r in results}
+    mismatched = [name for name in by_name if name.endswith("(store)")
+                  and by_name[name]['output'] != by_name[name.replace("(store)", "(pandas)")]['output']]
+    for name in mismatched:
+        print(f"❌ {name} returned a different result from the DataFrame path")
+    if not mismatched:
+        print("\n✅ Store and DataFrame paths returned identical results")
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count()},
+        'config': {k: getattr(args, k) for k in ('matches', 'players', 'trials', 'repeat', 'target_ms')},
+        'data_dir': None if scratch else data_dir,
+        'results': results,
+        'mismatched': mismatched,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"✅ Report saved to {args.report}")
+
+    over = [r['case'] for r in results if r['over_target']]
+    if over:
+        print(f"⚠️ Over {args.target_ms:.0f} ms: {', '.join(over)}")
+    if mismatched or (args.check and over):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized vs loop engine for monte_carlo_duel.simulate_duel
+
+Times both engines on a few duel sizes and checks that they agree statistically:
+ - dismissal probability via a two-proportion z-test
+ - expected runs via a Welch z-test on the per-trial run totals
+
+The loop engine is only run on the smaller sizes; larger sizes report the vectorized time alone.
+
+Usage:
+  python benchmarks/bench_duel_engine.py [--seed 7] [--z-limit 4.0]
+"""
+
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "processing"))
+
+import monte_carlo_duel as mcd  # noqa: E402
+
+# (balls, trials, run loop engine too)
+CASES = [
+    (6, 10000, True),
+    (120, 2000, True),
+    (6, 100000, False),
+    (120, 100000, False),
+]
+
+BATTER = {'player_name': 'Bench Batter', 'strike_rate': 88.0, 'boundary_percent': 9.5, 'dismissal_probability': 0.025}
+BOWLER = {'player_name': 'Bench Bowler', 'wicket_probability': 0.03, 'economy_rate': 5.1}
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+def agreement(loop_arrays, vec_arrays):
+    """Return (z_dismissal, z_runs) between the two engines' per-trial samples."""
+    runs_a, out_a = (np.asarray(a, dtype=float) for a in loop_arrays)
+    runs_b, out_b = (np.asarray(a, dtype=float) for a in vec_arrays)
+
+    p_a, p_b = out_a.mean(), out_b.mean()
+    pooled = (out_a.sum() + out_b.sum()) / (len(out_a) + len(out_b))
+    se_p = math.sqrt(max(pooled * (1 - pooled), 1e-12) * (1 / len(out_a) + 1 / len(out_b)))
+    z_p = (p_a - p_b) / se_p
+
+    se_r = math.sqrt(runs_a.var(ddof=1) / len(runs_a) + runs_b.var(ddof=1) / len(runs_b))
+    z_r = (runs_a.mean() - runs_b.mean()) / se_r if se_r > 0 else 0.0
+    return z_p, z_r
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark vectorized vs loop duel engines")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default 7)")
+    parser.add_argument("--z-limit", type=float, default=4.0, help="Max |z| treated as agreement (default 4.0)")
+    args = parser.parse_args()
+
+    model = mcd.build_ball_model(BATTER, BOWLER, None)
+    failures = 0
+
+    print(f"{'balls':>6} {'trials':>8} {'loop s':>9} {'vector s':>9} {'speedup':>8} {'z_dismiss':>10} {'z_runs':>8}")
+    for balls, trials, run_loop in CASES:
+        t_vec, vec_arrays = timed(mcd.sample_duel_arrays, model, balls=balls, trials=trials, rng=args.seed)
+        if run_loop:
+            t_loop, loop_arrays = timed(mcd.simulate_duel_loop_arrays, model, balls=balls, trials=trials, rng_seed=args.seed)
+            z_p, z_r = agreement(loop_arrays, vec_arrays)
+            ok = abs(z_p) <= args.z_limit and abs(z_r) <= args.z_limit
+            failures += 0 if ok else 1
+            print(f"{balls:>6} {trials:>8} {t_loop:>9.3f} {t_vec:>9.4f} {t_loop / t_vec:>7.0f}x {z_p:>10.2f} {z_r:>8.2f}{'' if ok else '  MISMATCH'}")
+        else:
+            print(f"{balls:>6} {trials:>8} {'-':>9} {t_vec:>9.4f} {'-':>8} {'-':>10} {'-':>8}")
+
+    if failures:
+        print(f"\n❌ {failures} case(s) disagree beyond |z| > {args.z_limit}")
+        sys.exit(1)
+    print("\n✅ Engines agree statistically on all compared cases")
+
+if __name__ == "__main__":
+    main()
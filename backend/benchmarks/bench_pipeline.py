@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Benchmark: end-to-end pipeline on synthetic Cricsheet corpora
+
+For each corpus size, writes a synthetic corpus (see synthetic_cricsheet.py) into a scratch data
+folder and runs, each in a fresh process pointed at it through CRICKET_DATA_DIR:
+ - extract:  extract_cricsheet.process_all_matches
+ - clean:    clean_players.main
+ - features: generate_player_features.main
+ - duel:     monte_carlo_duel.simulate_duel for the busiest batter vs the busiest bowler
+
+Records wall and CPU time, peak RSS of the stage's process and throughput (files/s, balls/s;
+for the duel, simulated balls/s) into a JSON report. With --baseline, results are compared against
+a stored report and any stage whose throughput drops or peak RSS grows beyond the tolerance is
+flagged (exit status 1).
+
+Usage:
+  python benchmarks/bench_pipeline.py [--sizes 30,150,600] [--repeat 1] [--workers 1]
+                                      [--report data/pipeline_bench.json]
+                                      [--baseline BASELINE.json] [--save-baseline BASELINE.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "processing"))
+
+from instrumentation import peak_rss_mb
+
+STAGES = ["extract", "clean", "features", "duel"]
+DEFAULT_REPORT = os.path.join(HERE, "..", "data", "pipeline_bench.json")
+# stages faster than this are too noisy to flag on time
+MIN_WALL_S = 0.05
+
+# --- Stages (run inside the child process) ---
+# Each does its imports and setup untimed and returns (timed callable, work done)
+def stage_extract(args):
+    import extract_cricsheet
+    return lambda: extract_cricsheet.process_all_matches(workers=args.workers or os.cpu_count()), {}
+
+def stage_clean(args):
+    import clean_players
+    return clean_players.main, {}
+
+def stage_features(args):
+    import generate_player_features
+    return generate_player_features.main, {}
+
+def stage_duel(args):
+    import monte_carlo_duel as mcd
+    df = mcd.load_features()
+    odi = df[df['format'] == "ODI"]
+    batter = odi.loc[odi['balls_faced'].idxmax()].to_dict()
+    bowler = odi.loc[odi['balls_bowled'].idxmax()].to_dict()
+    model = mcd.build_ball_model(batter, bowler, df, fmt="ODI")
+
+    def run():
+        mcd.simulate_duel(model, balls=args.duel_balls, trials=args.duel_trials, rng_seed=7)
+    return run, {'balls': args.duel_trials * args.duel_balls}
+
+STAGE_FUNCTIONS = {'extract': stage_extract, 'clean': stage_clean, 'features': stage_features, 'duel': stage_duel}
+
+def run_stage_here(args):
+    """Child-process entry point: runs one stage quietly and prints its measurements as JSON."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        run, work = STAGE_FUNCTIONS[args.run_stage](args)
+        start_wall, start_cpu = time.perf_counter(), time.process_time()
+        run()
+        result = {
+            'wall_s': time.perf_counter() - start_wall,
+            'cpu_s': time.process_time() - start_cpu,
+            'peak_rss_mb': peak_rss_mb(),
+        }
+    result.update(work)
+    print(json.dumps(result))
+
+# --- Driver ---
+def run_stage(stage, data_dir, args):
+    command = [sys.executable, os.path.abspath(__file__), "--run-stage", stage, "--workers", str(args.workers),
+               "--duel-trials", str(args.duel_trials), "--duel-balls", str(args.duel_balls)]
+    env = dict(os.environ, CRICKET_DATA_DIR=data_dir)
+    proc = subprocess.run(command, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"stage {stage} failed:\n{proc.stderr[-2000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+def bench_size(matches, args, work_dir):
+    from synthetic_cricsheet import generate_corpus
+
+    if work_dir:
+        os.makedirs(work_dir, exist_ok=True)
+    data_dir = tempfile.mkdtemp(prefix=f"corpus_{matches}_", dir=work_dir)
+    try:
+        start = time.perf_counter()
+        corpus = generate_corpus(data_dir, matches=matches, players=args.players, seed=args.seed)
+        print(f"\n📂 {corpus['files']} matches, {corpus['deliveries']:,} deliveries "
+              f"({corpus['bytes'] / 1e6:.1f} MB, generated in {time.perf_counter() - start:.1f}s)")
+        rows = []
+        # stages run in pipeline order; unselected earlier stages still run (untimed) to produce their inputs
+        for stage in STAGES[:max(STAGES.index(s) for s in args.stages) + 1]:
+            if stage not in args.stages:
+                run_stage(stage, data_dir, args)
+                continue
+            runs = [run_stage(stage, data_dir, args) for _ in range(args.repeat)]
+            best = min(runs, key=lambda r: r['wall_s'])
+            peaks = [r['peak_rss_mb'] for r in runs if r['peak_rss_mb'] is not None]
+            row = {
+                'matches': matches,
+                'stage': stage,
+                'wall_s': best['wall_s'],
+                'cpu_s': best['cpu_s'],
+                'peak_rss_mb': max(peaks) if peaks else None,
+                'files': None if stage == "duel" else corpus['files'],
+                'balls': best.get('balls', corpus['deliveries']),
+            }
+            row['files_per_s'] = row['files'] / row['wall_s'] if row['files'] else None
+            row['balls_per_s'] = row['balls'] / row['wall_s']
+            rows.append(row)
+            print(format_row(row))
+        return rows
+    finally:
+        if not args.keep:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+def format_row(row):
+    files = f"{row['files_per_s']:>9,.0f}" if row['files_per_s'] is not None else f"{'-':>9}"
+    rss = f"{row['peak_rss_mb']:>8.0f}" if row['peak_rss_mb'] is not None else f"{'-':>8}"
+    return (f"  {row['stage']:<9} {row['wall_s']:>8.2f}s wall {row['cpu_s']:>8.2f}s cpu {rss} MB peak "
+            f"{files} files/s {row['balls_per_s']:>13,.0f} balls/s")
+
+def find_regressions(results, baseline, tolerance, rss_tolerance):
+    """Rows slower (by throughput) or bigger (by peak RSS) than the baseline's same size and stage."""
+    previous = {(r['matches'], r['stage']): r for r in baseline.get('results', [])}
+    flagged = []
+    for row in results:
+        base = previous.get((row['matches'], row['stage']))
+        if base is None:
+            continue
+        if base['wall_s'] >= MIN_WALL_S and row['balls_per_s'] < base['balls_per_s'] * (1 - tolerance):
+            flagged.append({'matches': row['matches'], 'stage': row['stage'], 'metric': 'balls_per_s',
+                            'baseline': base['balls_per_s'], 'current': row['balls_per_s']})
+        if base.get('peak_rss_mb') and row['peak_rss_mb'] \
+                and row['peak_rss_mb'] > base['peak_rss_mb'] * (1 + rss_tolerance):
+            flagged.append({'matches': row['matches'], 'stage': row['stage'], 'metric': 'peak_rss_mb',
+                            'baseline': base['peak_rss_mb'], 'current': row['peak_rss_mb']})
+    return flagged
+
+def environment():
+    import numpy
+    import pandas
+    return {
+        'python': platform.python_version(),
+        'numpy': numpy.__version__,
+        'pandas': pandas.__version__,
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the processing pipeline on synthetic corpora")
+    parser.add_argument("--sizes", default="30,150,600", help="Comma-separated corpus sizes in matches (default 30,150,600)")
+    parser.add_argument("--stages", default=",".join(STAGES), help=f"Stages to run (default {','.join(STAGES)})")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage; the fastest is reported (default 1)")
+    parser.add_argument("--workers", type=int, default=1, help="extract_cricsheet workers (default 1, 0 = all CPUs)")
+    parser.add_argument("--players", type=int, default=400, help="Synthetic player pool size (default 400)")
+    parser.add_argument("--duel-trials", type=int, default=200000, help="Duel stage trials (default 200000)")
+    parser.add_argument("--duel-balls", type=int, default=6, help="Duel stage balls per trial (default 6)")
+    parser.add_argument("--seed", type=int, default=7, help="Corpus seed (default 7)")
+    parser.add_argument("--work-dir", default=None, help="Folder for the scratch corpora (default: system temp)")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch corpora")
+    parser.add_argument("--report", default=DEFAULT_REPORT, help="JSON report path (default data/pipeline_bench.json)")
+    parser.add_argument("--baseline", default=None, help="Stored report to flag regressions against")
+    parser.add_argument("--save-baseline", default=None, help="Also write this run's report here as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed throughput drop (default 0.2 = 20%%)")
+    parser.add_argument("--rss-tolerance", type=float, default=0.2, help="Allowed peak RSS growth (default 0.2 = 20%%)")
+    parser.add_argument("--run-stage", choices=STAGES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_stage:
+        run_stage_here(args)
+        return
+
+    args.stages = [s.strip() for s in args.stages.split(",") if s.strip()]
+    unknown = [s for s in args.stages if s not in STAGES]
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    print(f"🚀 Pipeline benchmark: sizes {sizes}, stages {', '.join(args.stages)}, repeat {args.repeat}")
+    results = []
+    for matches in sizes:
+        results += bench_size(matches, args, args.work_dir)
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'environment': environment(),
+        'config': {k: getattr(args, k) for k in ('sizes', 'stages', 'repeat', 'workers', 'players',
+                                                 'duel_trials', 'duel_balls', 'seed')},
+        'results': results,
+        'regressions': [],
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report['regressions'] = find_regressions(results, json.load(f), args.tolerance, args.rss_tolerance)
+        report['baseline'] = os.path.abspath(args.baseline)
+
+    for path in filter(None, [args.report, args.save_baseline]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"\n✅ Report saved to {path}")
+
+    if args.baseline:
+        if report['regressions']:
+            for r in report['regressions']:
+                print(f"❌ Regression: {r['stage']} at {r['matches']} matches, {r['metric']} "
+                      f"{r['baseline']:,.1f} -> {r['current']:,.1f}")
+            sys.exit(1)
+        print("✅ No regressions against the baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Benchmark: vectorized vs lambda/apply player feature aggregation
+
+Builds a synthetic clean_balls table (default 3,000,000 rows) and times the batting + bowling
+feature builders of generate_player_features against the previous implementation, which used
+Python lambdas inside groupby().agg and DataFrame.apply(axis=1). Reports wall time and peak
+traced memory for each, and checks the two produce the same features.
+
+Usage:
+  python benchmarks/bench_player_features.py [--rows 3000000] [--players 6000] [--seed 7]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "processing"))
+
+import generate_player_features as gpf  # noqa: E402
+
+# --- Previous implementation, kept here as the baseline ---
+def legacy_batting(df):
+    batting = df.groupby(['format', 'batter'], observed=True).agg(
+        balls_faced=('batter', 'count'),
+        runs_scored=('runs_batter', 'sum'),
+        fours=('runs_batter', lambda x: (x == 4).sum()),
+        sixes=('runs_batter', lambda x: (x == 6).sum()),
+        dismissals=('player_out', lambda x: (x.notna()).sum())
+    ).reset_index()
+    batting['strike_rate'] = (batting['runs_scored'] / batting['balls_faced']) * 100
+    batting['boundary_percent'] = ((batting['fours'] + batting['sixes']) / batting['balls_faced']) * 100
+    batting['batting_average'] = batting.apply(
+        lambda row: row['runs_scored'] / row['dismissals'] if row['dismissals'] > 0 else row['runs_scored'],
+        axis=1
+    )
+    batting['dismissal_probability'] = batting['dismissals'] / batting['balls_faced']
+    return batting
+
+def legacy_bowling(df):
+    bowling = df.groupby(['format', 'bowler'], observed=True).agg(
+        balls_bowled=('bowler', 'count'),
+        runs_conceded=('runs_total', 'sum'),
+        wickets=('is_wicket', 'sum'),
+        dot_balls=('runs_total', lambda x: (x == 0).sum())
+    ).reset_index()
+    bowling['overs_bowled'] = bowling['balls_bowled'] / 6
+    bowling['economy_rate'] = bowling.apply(
+        lambda row: row['runs_conceded'] / row['overs_bowled'] if row['overs_bowled'] > 0 else 0,
+        axis=1
+    )
+    bowling['wicket_probability'] = bowling['wickets'] / bowling['balls_bowled']
+    bowling['dot_ball_percent'] = (bowling['dot_balls'] / bowling['balls_bowled']) * 100
+    return bowling
+
+def legacy(df):
+    return legacy_batting(df), legacy_bowling(df)
+
+def vectorized(df):
+    df = gpf.ball_indicators(df)
+    return gpf.generate_batting_features(df), gpf.generate_bowling_features(df)
+
+# --- Synthetic data ---
+def synthetic_balls(rows, players, seed):
+    rng = np.random.default_rng(seed)
+    names = np.array([f"Player {i}" for i in range(players)], dtype=object)
+    runs_batter = rng.choice([0, 1, 2, 3, 4, 6], size=rows, p=[0.45, 0.33, 0.08, 0.02, 0.09, 0.03]).astype(np.int8)
+    extras = (rng.random(rows) < 0.04).astype(np.int8)
+    is_wicket = (rng.random(rows) < 0.03).astype(np.int8)
+    batter = pd.Categorical(names[rng.integers(0, players, rows)])
+    player_out = pd.Series(pd.Categorical(batter)).where(is_wicket == 1)
+    return pd.DataFrame({
+        'format': pd.Categorical(rng.choice(["ODI", "T20", "TEST"], size=rows)),
+        'batter': batter,
+        'bowler': pd.Categorical(names[rng.integers(0, players, rows)]),
+        'runs_batter': runs_batter,
+        'runs_total': (runs_batter + extras).astype(np.int8),
+        'is_wicket': is_wicket,
+        'player_out': player_out,
+    })
+
+def measure(fn, df):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(df)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak / 2**20, result
+
+def same_features(a, b, key):
+    a = a.sort_values(['format', key]).reset_index(drop=True)
+    b = b.sort_values(['format', key]).reset_index(drop=True)
+    a[['format', key]] = a[['format', key]].astype(str)
+    b[['format', key]] = b[['format', key]].astype(str)
+    pd.testing.assert_frame_equal(a, b[a.columns], check_dtype=False)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark player feature aggregation")
+    parser.add_argument("--rows", type=int, default=3_000_000, help="Synthetic deliveries (default 3,000,000)")
+    parser.add_argument("--players", type=int, default=6000, help="Distinct players (default 6000)")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default 7)")
+    args = parser.parse_args()
+
+    print(f"🔹 Building {args.rows:,} synthetic deliveries over {args.players:,} players...")
+    df = synthetic_balls(args.rows, args.players, args.seed)
+
+    # Silence the pipeline's progress prints while timing
+    stdout, sys.stdout = sys.stdout, open(os.devnull, "w")
+    try:
+        t_old, mem_old, (bat_old, bowl_old) = measure(legacy, df)
+        t_new, mem_new, (bat_new, bowl_new) = measure(vectorized, df)
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+    same_features(bat_old, bat_new, 'batter')
+    same_features(bowl_old, bowl_new, 'bowler')
+
+    print(f"{'':<12} {'wall s':>9} {'peak MB':>9}")
+    print(f"{'lambda/apply':<12} {t_old:>9.2f} {mem_old:>9.1f}")
+    print(f"{'vectorized':<12} {t_new:>9.2f} {mem_new:>9.1f}")
+    print(f"\n✅ Same features; {t_old / t_new:.1f}x faster, peak memory {mem_new / mem_old:.2f}x")
+
+if __name__ == "__main__":
+    main()
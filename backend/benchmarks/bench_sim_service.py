@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Benchmark: duel throughput of the micro-batching simulation service vs one-at-a-time serving
+
+The same stream of duel requests is sent at several concurrency levels (requests in flight) to:
+ - worker: one ml_model/worker.py process, the pool's unit of work (it answers one request at a time)
+ - service, unbatched: ml_model/sim_service.py with --max-batch 1, i.e. one duel per pass
+ - service, batched: ml_model/sim_service.py with the given --window-ms / --max-batch
+For each it records throughput, client-side latency (median and p99) and, for the service, the
+mean batch size. The result cache is off (SIM_CACHE_SIZE=0), so every request is simulated.
+
+The timed requests carry no seed, as server.js sends them by default. Two checks follow:
+ - every server's dismissal probabilities agree with the exact solution (binomial z-test, --z-limit)
+ - a seeded copy of the stream returns identical results from all three
+
+The data folder is --data-dir, or a synthetic corpus run through the pipeline (see bench_cold_start.py).
+
+Usage:
+  python benchmarks/bench_sim_service.py [--data-dir DIR | --matches 150] [--requests 512] [--trials 10000]
+                                         [--concurrency 1 8 32 128 512] [--window-ms 5] [--max-batch 256]
+                                         [--z-limit 5] [--report data/sim_service_bench.json] [--check]
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import os
+import platform
+import random
+import shutil
+import socket
+import statistics
+import sys
+import time
+from datetime import datetime, timezone
+
+from bench_cold_start import prepare_data
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SERVICE = os.path.abspath(os.path.join(HERE, "..", "ml_model", "sim_service.py"))
+WORKER = os.path.abspath(os.path.join(HERE, "..", "ml_model", "worker.py"))
+DEFAULT_REPORT = os.path.join(HERE, "..", "data", "sim_service_bench.json")
+TOP_PLAYERS = 40
+
+def duel_requests(data_dir, count, trials, seed, fmt="ODI"):
+    """Duels between the busiest batters and bowlers of fmt, each with a seed (drop it for unseeded runs)."""
+    with open(os.path.join(data_dir, "player_features.csv"), newline="", encoding="utf-8") as f:
+        rows = [r for r in csv.DictReader(f) if r['format'] == fmt]
+    batters = [r['player_name'] for r in sorted(rows, key=lambda r: -float(r['balls_faced'] or 0))[:TOP_PLAYERS]]
+    bowlers = [r['player_name'] for r in sorted(rows, key=lambda r: -float(r['balls_bowled'] or 0))[:TOP_PLAYERS]]
+    rng = random.Random(seed)
+    return [{'batsman': rng.choice(batters), 'bowler': rng.choice(bowlers), 'format': fmt, 'trials': trials,
+             'seed': rng.randrange(1 << 30)} for _ in range(count)]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+async def start_service(env, window_ms, max_batch):
+    """(process, reader, writer) for a sim_service on a free port, once it listens."""
+    port = free_port()
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, SERVICE, "--port", str(port), "--window-ms", str(window_ms), "--max-batch", str(max_batch),
+        env=env, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    while b"listening" not in await proc.stdout.readline():
+        if proc.returncode is not None:
+            raise RuntimeError("sim_service.py exited before listening")
+    reader, writer = await asyncio.open_connection("127.0.0.1", port, limit=1 << 24)
+    return proc, reader, writer
+
+async def start_worker(env):
+    """(process, reader, writer) for a worker.py that has loaded its data."""
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, WORKER, env=env, cwd=os.path.dirname(WORKER),
+        stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL)
+    json.loads(await proc.stdout.readline())  # {"ready": true}
+    return proc, proc.stdout, proc.stdin
+
+class Client:
+    """JSON-lines client keeping many requests in flight on one stream, matched by id."""
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.pending = {}
+        self.next_id = 0
+        self._reading = asyncio.create_task(self._read())
+
+    async def _read(self):
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            message = json.loads(line)
+            future = self.pending.pop(message.get('id'), None)
+            if future is not None:
+                future.set_result(message)
+
+    async def request(self, command, args=None):
+        self.next_id += 1
+        future = asyncio.get_running_loop().create_future()
+        self.pending[self.next_id] = future
+        self.writer.write((json.dumps({'id': self.next_id, 'command': command, 'args': args or {}}) + "\n").encode())
+        await self.writer.drain()
+        message = await future
+        if not message['ok']:
+            raise RuntimeError(message['error'])
+        return message['result']
+
+    def close(self):
+        self._reading.cancel()
+
+async def drive(client, requests, concurrency):
+    """Sends every duel with at most `concurrency` in flight; returns (wall s, latencies ms, results)."""
+    slots = asyncio.Semaphore(concurrency)
+    latencies = [0.0] * len(requests)
+    results = [None] * len(requests)
+
+    async def one(i, args):
+        async with slots:
+            start = time.perf_counter()
+            results[i] = await client.request('duel', args)
+            latencies[i] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i, args) for i, args in enumerate(requests)))
+    return time.perf_counter() - start, latencies, results
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, min(len(ordered) - 1, round(q / 100 * len(ordered)) - 1))]
+
+def unseeded(requests):
+    return [{k: v for k, v in args.items() if k != 'seed'} for args in requests]
+
+async def bench_server(name, start, requests, levels, warmup):
+    """
+    Runs the unseeded stream at every concurrency level, then the seeded stream, against one server process.
+    Returns (rows, unseeded results of the last level, seeded results, exact solutions or None).
+    """
+    proc, reader, writer = await start()
+    client = Client(reader, writer)
+    rows = []
+    try:
+        await drive(client, unseeded(warmup), 4)
+        for concurrency in levels:
+            before = await client.request('metrics') if name != 'worker' else None
+            wall, latencies, results = await drive(client, unseeded(requests), concurrency)
+            row = {
+                'server': name,
+                'concurrency': concurrency,
+                'requests': len(requests),
+                'wall_s': wall,
+                'requests_per_s': len(requests) / wall,
+                'latency_p50_ms': statistics.median(latencies),
+                'latency_p99_ms': percentile(latencies, 99),
+                'mean_batch_size': None,
+            }
+            if before is not None:
+                after = await client.request('metrics')
+                batches = after['counters']['batches'] - before['counters']['batches']
+                batched = after['counters']['batched'] - before['counters']['batched']
+                row['mean_batch_size'] = batched / batches if batches else None
+            rows.append(row)
+            batch = f"{row['mean_batch_size']:>6.1f}" if row['mean_batch_size'] else f"{'-':>6}"
+            print(f"  {name:<18} {concurrency:>5} {row['requests_per_s']:>9.0f}/s {row['latency_p50_ms']:>9.1f} ms "
+                  f"{row['latency_p99_ms']:>9.1f} ms {batch}")
+        _, _, seeded = await drive(client, requests, max(levels))
+        exact = None
+        if name == 'worker':
+            _, _, exact = await drive(client, [dict(args, mode='exact') for args in unseeded(requests)], max(levels))
+    finally:
+        client.close()
+        writer.close()
+        if proc.returncode is None:
+            proc.terminate()
+        await proc.wait()
+    return rows, results, seeded, exact
+
+def max_z(results, exact):
+    """Largest |z| of the sampled dismissal probabilities against the exact ones."""
+    worst = 0.0
+    for sampled, solved in zip(results, exact):
+        p = solved['dismissal_probability']
+        se = math.sqrt(max(p * (1 - p), 1e-12) / sampled['trials'])
+        worst = max(worst, abs(sampled['dismissal_probability'] - p) / se)
+    return worst
+
+async def run(args, data_dir):
+    env = dict(os.environ, CRICKET_DATA_DIR=data_dir, PIPELINE_METRICS_FILE="", SIM_CACHE_SIZE="0")
+    requests = duel_requests(data_dir, args.requests, args.trials, args.seed)
+    warmup = duel_requests(data_dir, 16, args.trials, args.seed + 1)
+    servers = [
+        ('worker', lambda: start_worker(env)),
+        ('service unbatched', lambda: start_service(env, 0, 1)),
+        ('service batched', lambda: start_service(env, args.window_ms, args.max_batch)),
+    ]
+    print(f"  {'server':<18} {'in flight':>5} {'throughput':>11} {'p50':>12} {'p99':>12} {'batch':>6}")
+    rows, sampled, seeded, exact = [], {}, {}, None
+    for name, start in servers:
+        server_rows, sampled[name], seeded[name], solved = await bench_server(name, start, requests, args.concurrency, warmup)
+        rows.extend(server_rows)
+        exact = solved or exact
+    z = {name: max_z(results, exact) for name, results in sampled.items()}
+    mismatched = [name for name in seeded if seeded[name] != seeded['worker']]
+    return rows, z, mismatched
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the micro-batching simulation service")
+    parser.add_argument("--data-dir", default=None, help="Data folder with player_features.csv (default: build a synthetic one)")
+    parser.add_argument("--matches", type=int, default=150, help="Synthetic corpus size (default 150)")
+    parser.add_argument("--players", type=int, default=400, help="Synthetic player pool size (default 400)")
+    parser.add_argument("--seed", type=int, default=7, help="Corpus and request seed (default 7)")
+    parser.add_argument("--requests", type=int, default=512, help="Duels per concurrency level (default 512)")
+    parser.add_argument("--trials", type=int, default=10000, help="Trials per duel (default 10000)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128, 512],
+                        help="Requests in flight per level (default 1 8 32 128 512)")
+    parser.add_argument("--window-ms", type=float, default=5.0, help="Batching window of the batched service (default 5)")
+    parser.add_argument("--max-batch", type=int, default=256, help="Max batch of the batched service (default 256)")
+    parser.add_argument("--z-limit", type=float, default=5.0,
+                        help="Max |z| of a sampled dismissal probability against the exact one (default 5)")
+    parser.add_argument("--report", default=DEFAULT_REPORT, help="JSON report path (default data/sim_service_bench.json)")
+    parser.add_argument("--check", action="store_true",
+                        help="Exit 1 if seeded results differ between servers or sampled ones disagree with the exact solution")
+    args = parser.parse_args()
+
+    data_dir, scratch = prepare_data(args)
+    print(f"🚀 {args.requests} duels x {args.trials} trials per level\n")
+    try:
+        rows, z, mismatched = asyncio.run(run(args, data_dir))
+    finally:
+        if scratch:
+            shutil.rmtree(scratch, ignore_errors=True)
+
+    print()
+    for name, worst in z.items():
+        print(f"{'✅' if worst <= args.z_limit else '❌'} {name}: dismissal probabilities within |z| <= {worst:.2f} of exact")
+    for name in mismatched:
+        print(f"❌ {name} returned different seeded results from the worker")
+    if not mismatched:
+        print("✅ Worker, unbatched and batched service returned identical seeded results")
+    disagree = [name for name, worst in z.items() if worst > args.z_limit]
+
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'environment': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'cpu_count': os.cpu_count()},
+        'config': {k: getattr(args, k) for k in ('matches', 'players', 'requests', 'trials', 'concurrency',
+                                                 'window_ms', 'max_batch', 'z_limit')},
+        'data_dir': None if scratch else data_dir,
+        'results': rows,
+        'max_z': z,
+        'mismatched': mismatched,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.report)), exist_ok=True)
+    with open(args.report, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=1)
+    print(f"✅ Report saved to {args.report}")
+    if args.check and (mismatched or disagree):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
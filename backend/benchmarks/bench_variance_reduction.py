@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: variance-reduction sampling modes of the duel simulator
+
+For a fixed ball model, repeats simulate_duel many times per sampling mode and compares the
+spread of its estimates with the exact answer from solve_duel_exact:
+ - bias check: the mean estimate must sit within 4 standard errors of the exact value
+ - ESS: effective sample size = per-trial variance / variance of the estimate
+ - ESS per CPU second, and its gain over plain i.i.d. sampling
+
+It also compares the noise of a batter's difference between two bowlers with independent
+sampling versus common random numbers (duel_batch crn=True).
+
+Usage:
+  python benchmarks/bench_variance_reduction.py [--trials 10000] [--reps 200] [--balls 6] [--seed 7]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "processing"))
+
+import duel_batch  # noqa: E402
+import monte_carlo_duel as mcd  # noqa: E402
+
+BATTER = {'strike_rate': 88.0, 'boundary_percent': 9.0, 'dismissal_probability': 0.022}
+BOWLERS = [
+    {'wicket_probability': 0.028, 'economy_rate': 4.9},
+    {'wicket_probability': 0.024, 'economy_rate': 5.3},
+]
+BASELINES = {'strike_rate': 80.0, 'economy_rate': 5.2, 'wicket_probability': 0.025}
+METRICS = ['survival_probability', 'expected_runs']
+
+def exact_moments(model, balls):
+    """Exact mean and per-trial variance of each metric."""
+    survived, dismissed = mcd.duel_runs_distribution(model, balls)
+    pmf = survived + dismissed
+    runs = np.arange(len(pmf))
+    p_survive = survived.sum()
+    mean_runs = float(np.dot(runs, pmf))
+    return {
+        'survival_probability': (p_survive, p_survive * (1 - p_survive)),
+        'expected_runs': (mean_runs, float(np.dot(runs ** 2, pmf)) - mean_runs ** 2),
+    }
+
+def bench_modes(model, balls, trials, reps, seed):
+    exact = exact_moments(model, balls)
+    rows = []
+    for mode in mcd.SAMPLING_MODES:
+        seeds = np.random.SeedSequence([seed, mcd.SAMPLING_MODES.index(mode)]).spawn(reps)
+        estimates = {m: [] for m in METRICS}
+        start = time.process_time()
+        for child in seeds:
+            sim = mcd.simulate_duel(model, balls=balls, trials=trials, rng_seed=np.random.default_rng(child),
+                                    sampling=mode)
+            for m in METRICS:
+                estimates[m].append(sim[m])
+        cpu = (time.process_time() - start) / reps
+        row = {'mode': mode, 'cpu': cpu}
+        for m in METRICS:
+            values = np.array(estimates[m])
+            mean, trial_var = exact[m]
+            est_var = values.var(ddof=1)
+            row[m] = {
+                'bias_z': (values.mean() - mean) / np.sqrt(est_var / reps),
+                'ess': trial_var / est_var,
+            }
+        rows.append(row)
+    return rows
+
+def bench_crn(model_a, model_b, balls, trials, reps, seed):
+    """Std. dev. of the expected-runs difference between two bowlers, independent vs CRN."""
+    cdf = duel_batch.outcome_cdfs(
+        np.array([model_a['p_wicket'], model_b['p_wicket']]),
+        np.array([[m['run_probs'][r] for r in duel_batch.RUN_VALUES] for m in (model_a, model_b)]),
+    )
+    spread = {}
+    for crn in (False, True):
+        diffs = []
+        for child in np.random.SeedSequence([seed, 99, crn]).spawn(reps):
+            runs, _ = duel_batch.sample_pairs(cdf, balls, trials, np.random.default_rng(child), crn=crn)
+            diffs.append(runs[0].mean() - runs[1].mean())
+        spread[crn] = np.std(diffs, ddof=1)
+    return spread
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark duel variance-reduction modes")
+    parser.add_argument("--trials", type=int, default=10000, help="Trials per simulation (default 10000)")
+    parser.add_argument("--reps", type=int, default=200, help="Repeated simulations per mode (default 200)")
+    parser.add_argument("--balls", type=int, default=6, help="Balls per duel (default 6)")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default 7)")
+    args = parser.parse_args()
+
+    models = [mcd.build_ball_model(BATTER, bowler, None, baselines=BASELINES, h2h=False) for bowler in BOWLERS]
+    print(f"🔹 {args.reps} x {args.trials:,}-trial duels of {args.balls} balls per mode")
+
+    rows = bench_modes(models[0], args.balls, args.trials, args.reps, args.seed)
+    base = {m: rows[0][m]['ess'] / rows[0]['cpu'] for m in METRICS}
+    print(f"\n{'mode':<11} {'cpu ms':>7} | {'survival ESS':>12} {'/cpu s':>10} {'gain':>6} {'bias z':>7} |"
+          f" {'runs ESS':>10} {'/cpu s':>10} {'gain':>6} {'bias z':>7}")
+    for row in rows:
+        cells = []
+        for m in METRICS:
+            per_cpu = row[m]['ess'] / row['cpu']
+            cells.append(f"{row[m]['ess']:>12,.0f} {per_cpu:>10,.0f} {per_cpu / base[m]:>5.2f}x {row[m]['bias_z']:>7.2f}")
+        print(f"{row['mode']:<11} {row['cpu'] * 1000:>7.2f} | {cells[0]} | {cells[1].lstrip()}")
+    unbiased = all(abs(row[m]['bias_z']) < 4 for row in rows for m in METRICS)
+
+    spread = bench_crn(models[0], models[1], args.balls, args.trials, args.reps, args.seed)
+    print(f"\nExpected-runs difference between two bowlers, std. dev.: independent {spread[False]:.4f}, "
+          f"CRN {spread[True]:.4f} ({(spread[False] / spread[True]) ** 2:.1f}x variance reduction)")
+    print("\n✅ All modes agree with the exact means" if unbiased else "\n❌ A mode's mean is off the exact value")
+
+if __name__ == "__main__":
+    main()
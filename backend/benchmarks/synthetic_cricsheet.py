@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Synthetic Cricsheet corpus generator
+
+Writes match files in Cricsheet's JSON layout (info + innings -> overs -> deliveries) into the
+odis_json / t20s_json / tests_json folders that extract_cricsheet.py reads, so the pipeline can be
+benchmarked at any scale without the real download. Matches are played ball by ball:
+ - teams are squads of 15 from a shared player pool, picking an XI per match, so players meet repeatedly
+ - per-ball runs follow a format-specific mix; wickets fall at --wicket-rate (scaled per format)
+ - innings end at all out or the over limit (TEST: up to four innings of at most 90 overs)
+ - a few percent of names carry Cricsheet-style noise ("(c)", "(wk)", doubled spaces) for clean_players
+ - occasional wides and leg byes exercise the extras columns
+
+The corpus is fully determined by the options and --seed.
+
+Usage:
+  python benchmarks/synthetic_cricsheet.py --out /tmp/corpus [--matches 300] [--formats ODI,T20,TEST]
+                                           [--players 400] [--wicket-rate 0.03] [--seed 7]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "processing"))
+
+from extract_cricsheet import FORMATS  # noqa: E402
+
+# overs per innings, innings per side, per-ball run mix over RUNS and wicket-rate multiplier
+FORMAT_SHAPES = {
+    "T20": {'overs': 20, 'innings': 1, 'runs': [0.36, 0.37, 0.08, 0.01, 0.12, 0.06], 'wicket_scale': 1.6},
+    "ODI": {'overs': 50, 'innings': 1, 'runs': [0.48, 0.33, 0.07, 0.01, 0.09, 0.02], 'wicket_scale': 1.0},
+    "TEST": {'overs': 90, 'innings': 2, 'runs': [0.68, 0.19, 0.04, 0.01, 0.075, 0.005], 'wicket_scale': 0.6},
+}
+RUNS = np.array([0, 1, 2, 3, 4, 6])
+WICKET_KINDS = ["caught", "bowled", "lbw", "run out", "stumped", "caught and bowled"]
+WICKET_KIND_P = [0.6, 0.18, 0.13, 0.04, 0.02, 0.03]
+NAME_NOISE = [" (c)", " (wk)", "  ", " "]
+NOISE_RATE = 0.03
+WIDE_RATE = 0.02
+LEG_BYE_RATE = 0.01
+VENUES = ["Eden Gardens", "Lord's", "Melbourne Cricket Ground", "Newlands", "Galle International Stadium",
+          "Sharjah Cricket Stadium", "Kensington Oval", "Basin Reserve"]
+
+def player_name(i):
+    return f"Player {i}"
+
+def noisy(rng, name):
+    """The name as Cricsheet sometimes spells it: with a role tag or stray spaces."""
+    if rng.random() >= NOISE_RATE:
+        return name
+    noise = NAME_NOISE[rng.integers(len(NAME_NOISE))]
+    if noise.strip():
+        return name + noise
+    first, _, rest = name.partition(" ")
+    return f"{first}{noise}{rest}" if noise == "  " else name + noise
+
+def make_teams(rng, players, teams):
+    """Squads of 15 drawn from the pool; a team picks an XI from its squad each match."""
+    pool = rng.permutation(players)
+    return [pool[(t * 15 + np.arange(15)) % players] for t in range(teams)]
+
+def play_innings(rng, shape, wicket_rate, batting, bowling, target=None):
+    """One innings as a list of Cricsheet overs, and its total. A chase stops once target is reached."""
+    overs = []
+    total = 0
+    wickets = 0
+    striker, non_striker, next_in = 0, 1, 2
+    # the last five of the XI bowl, alternating ends so nobody bowls two overs running
+    ends = [bowling[-5:][0::2], bowling[-5:][1::2]]
+    for over in range(shape['overs']):
+        end = ends[over % 2]
+        bowler = player_name(end[(over // 2) % len(end)])
+        deliveries = []
+        legal = 0
+        while legal < 6 and (target is None or total < target):
+            delivery = {
+                "batter": player_name(batting[striker]),
+                "bowler": bowler,
+                "non_striker": player_name(batting[non_striker]),
+            }
+            u = rng.random()
+            if u < WIDE_RATE:
+                delivery["runs"] = {"batter": 0, "extras": 1, "total": 1}
+                delivery["extras"] = {"wides": 1}
+                total += 1
+                deliveries.append(delivery)
+                continue
+            legal += 1
+            if u < WIDE_RATE + wicket_rate:
+                kind = WICKET_KINDS[rng.choice(len(WICKET_KINDS), p=WICKET_KIND_P)]
+                delivery["runs"] = {"batter": 0, "extras": 0, "total": 0}
+                wicket = {"kind": kind, "player_out": delivery["batter"]}
+                if kind in ("caught", "run out", "stumped"):
+                    wicket["fielders"] = [{"name": player_name(bowling[rng.integers(len(bowling))])}]
+                delivery["wickets"] = [wicket]
+                deliveries.append(delivery)
+                wickets += 1
+                if wickets == len(batting) - 1:
+                    break
+                striker, next_in = next_in, next_in + 1
+                continue
+            if u < WIDE_RATE + wicket_rate + LEG_BYE_RATE:
+                delivery["runs"] = {"batter": 0, "extras": 1, "total": 1}
+                delivery["extras"] = {"legbyes": 1}
+                runs = 1
+            else:
+                runs = int(RUNS[rng.choice(len(RUNS), p=shape['runs'])])
+                delivery["runs"] = {"batter": runs, "extras": 0, "total": runs}
+            total += runs
+            deliveries.append(delivery)
+            if runs % 2 == 1:
+                striker, non_striker = non_striker, striker
+        overs.append({"over": over, "deliveries": deliveries})
+        if wickets == len(batting) - 1 or (target is not None and total >= target):
+            break
+        striker, non_striker = non_striker, striker
+    return overs, total
+
+def make_match(rng, fmt, match_number, squads, wicket_rate):
+    """A Cricsheet match dict and its number of deliveries."""
+    shape = FORMAT_SHAPES[fmt]
+    home, away = rng.choice(len(squads), size=2, replace=False)
+    xis = [rng.permutation(squads[t])[:11] for t in (home, away)]
+    names = [f"Team{home}", f"Team{away}"]
+    spelled = {}
+
+    def spell(name):
+        if name not in spelled:
+            spelled[name] = noisy(rng, name)
+        return spelled[name]
+
+    innings = []
+    totals = [0, 0]
+    rate = wicket_rate * shape['wicket_scale']
+    last = 2 * shape['innings'] - 1
+    for number in range(last + 1):
+        team = number % 2
+        target = totals[1 - team] - totals[team] + 1 if number == last else None
+        overs, runs = play_innings(rng, shape, rate, xis[team], xis[1 - team], target)
+        totals[team] += runs
+        for over in overs:
+            for d in over["deliveries"]:
+                for key in ("batter", "bowler", "non_striker"):
+                    d[key] = spell(d[key])
+                for w in d.get("wickets", []):
+                    w["player_out"] = spell(w["player_out"])
+        innings.append({"team": names[team], "overs": overs})
+
+    if totals[0] == totals[1]:
+        outcome = {"result": "tie"}
+    elif totals[0] > totals[1]:
+        outcome = {"winner": names[0], "by": {"runs": totals[0] - totals[1]}}
+    else:
+        outcome = {"winner": names[1], "by": {"wickets": int(rng.integers(1, 11))}}
+    day = date(2005, 1, 1) + timedelta(days=int(match_number * 3 + rng.integers(3)))
+    toss_winner = names[rng.integers(2)]
+    match = {
+        "meta": {"data_version": "1.1.0", "created": "2024-01-01", "revision": 1},
+        "info": {
+            "match_type": fmt,
+            "gender": "male",
+            "teams": names,
+            "dates": [(day + timedelta(days=d)).isoformat() for d in range(5 if fmt == "TEST" else 1)],
+            "venue": VENUES[rng.integers(len(VENUES))],
+            "toss": {"winner": toss_winner, "decision": "bat" if rng.random() < 0.5 else "field"},
+            "outcome": outcome,
+            "players": {names[t]: [spell(player_name(p)) for p in xis[t]] for t in range(2)},
+        },
+        "innings": innings,
+    }
+    deliveries = sum(len(o["deliveries"]) for inn in innings for o in inn["overs"])
+    return match, deliveries
+
+def generate_corpus(out_dir, matches=300, formats=tuple(FORMATS), players=400, wicket_rate=0.03, seed=7):
+    """
+    Writes `matches` files split evenly over `formats` into out_dir/<format folder>/.
+    Returns {'files', 'deliveries', 'bytes', 'per_format': {fmt: files}}.
+    """
+    rng = np.random.default_rng(seed)
+    squads = make_teams(rng, players, max(2, players // 15))
+    summary = {'files': 0, 'deliveries': 0, 'bytes': 0, 'per_format': {}}
+    for i, fmt in enumerate(formats):
+        folder = os.path.join(out_dir, FORMATS[fmt])
+        os.makedirs(folder, exist_ok=True)
+        count = matches // len(formats) + (1 if i < matches % len(formats) else 0)
+        for n in range(count):
+            match, deliveries = make_match(rng, fmt, n, squads, wicket_rate)
+            path = os.path.join(folder, f"{1000000 + i * 100000 + n}.json")
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(match, f, separators=(",", ":"))
+            summary['files'] += 1
+            summary['deliveries'] += deliveries
+            summary['bytes'] += os.path.getsize(path)
+        summary['per_format'][fmt] = count
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic Cricsheet JSON corpus")
+    parser.add_argument("--out", required=True, help="Data folder to write <format>_json folders into")
+    parser.add_argument("--matches", type=int, default=300, help="Total matches, split over formats (default 300)")
+    parser.add_argument("--formats", default=",".join(FORMATS), help="Comma-separated formats (default ODI,T20,TEST)")
+    parser.add_argument("--players", type=int, default=400, help="Size of the player pool (default 400)")
+    parser.add_argument("--wicket-rate", type=float, default=0.03,
+                        help="Per-ball wicket probability in ODIs; T20 / TEST are scaled from it (default 0.03)")
+    parser.add_argument("--seed", type=int, default=7, help="Random seed (default 7)")
+    args = parser.parse_args()
+
+    formats = [f.strip().upper() for f in args.formats.split(",") if f.strip()]
+    unknown = [f for f in formats if f not in FORMATS]
+    if unknown:
+        parser.error(f"unknown formats: {', '.join(unknown)}")
+    start = time.perf_counter()
+    summary = generate_corpus(args.out, args.matches, formats, args.players, args.wicket_rate, args.seed)
+    print(f"✅ {summary['files']} matches ({summary['deliveries']:,} deliveries, {summary['bytes'] / 1e6:.1f} MB) "
+          f"written to {args.out} in {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main()
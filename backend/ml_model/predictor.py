@@ -1,9 +1,11 @@
 import json
-import pandas as pd
-import numpy as np
 import sys
 import os
 
+# The simulation modules (and numpy / pandas behind them) are imported by the functions that use
+# them: a one-shot CLI call only pays for what its command needs (see lean_store).
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'processing'))
+
 # --- Data Loading and Preprocessing ---
 def load_data(filepath):
     """
@@ -21,7 +23,7 @@ def load_data(filepath):
 
 def load_and_preprocess_data(format_type):
     """
-    Loads mock cricket data for a given format from the /data directory.
+    Loads mock cricket data for a given format from the /data directory as {player_name: stats}.
     In a real scenario, this would involve processing the full Cricsheet data.
     """
     filepath = os.path.join('..', 'data', f'{format_type}_data.json')
@@ -48,53 +50,328 @@ def load_and_preprocess_data(format_type):
                 'bowl_economy': [3.5, 2.8, 3.2, 3.0]
             }
         else:
-            return pd.DataFrame() # Return empty if format is not recognized
-        
-        df = pd.DataFrame(data)
-        df.set_index('player_name', inplace=True)
-        return df
-    
+            return {} # Return empty if format is not recognized
+
+        return {name: {'bat_strike_rate': sr, 'bowl_economy': econ}
+                for name, sr, econ in zip(data['player_name'], data['bat_strike_rate'], data['bowl_economy'])}
+
     # Placeholder for actual data processing logic
-    # Here you would process the raw_data to create a structured DataFrame
-    processed_data = {
-        'player_name': [p['name'] for p in raw_data['players']],
-        'bat_strike_rate': [p['bat_strike_rate'] for p in raw_data['players']],
-        'bowl_economy': [p['bowl_economy'] for p in raw_data['players']]
-    }
-    df = pd.DataFrame(processed_data)
-    df.set_index('player_name', inplace=True)
-    return df
+    # Here you would process the raw_data into {player_name: stats}
+    return {p['name']: {'bat_strike_rate': p['bat_strike_rate'], 'bowl_economy': p['bowl_economy']}
+            for p in raw_data['players']}
+
+_data_cache = {}
+
+def get_format_data(format_type):
+    """
+    Cached load_and_preprocess_data: long-lived workers parse each format once.
+    """
+    if format_type not in _data_cache:
+        _data_cache[format_type] = load_and_preprocess_data(format_type)
+    return _data_cache[format_type]
+
+_features_df = None
+_features_version = None
+
+def get_duel_features():
+    """
+    Loads player_features.csv for the duel simulator once per process, reloading it
+    when the file or its memory-mapped feature store is regenerated.
+    """
+    import monte_carlo_duel
+    import sim_cache
+
+    global _features_df, _features_version
+    store_path = os.path.join(os.path.dirname(monte_carlo_duel.PLAYER_FEATURES_CSV), monte_carlo_duel.STORE_NAME)
+    version = (sim_cache.file_version(monte_carlo_duel.PLAYER_FEATURES_CSV), sim_cache.file_version(store_path))
+    if _features_df is None or version != _features_version:
+        _features_df = monte_carlo_duel.load_features()
+        _features_version = version
+    return _features_df
+
+_sim_cache = None
+
+def get_sim_cache():
+    """
+    Result cache for the duel and team simulations (configured by SIM_CACHE_* env vars).
+    """
+    import sim_cache
+
+    global _sim_cache
+    if _sim_cache is None:
+        _sim_cache = sim_cache.from_env()
+    return _sim_cache
+
+def lean_store():
+    """
+    The feature store when it is current with player_features.csv, for one-shot CLI calls: duels
+    and player search are answered from it without importing pandas or parsing the CSV.
+    None when it is missing or stale, or when PREDICTOR_LEAN=0.
+    """
+    if os.environ.get('PREDICTOR_LEAN', '1') == '0':
+        return None
+    import feature_store
+
+    store = feature_store.open_store()
+    return store if store is not None and store.matches(feature_store.FEATURES_FILE) else None
+
+def result_ttl(mode, seed):
+    """
+    Seconds a simulation's result is cached: the cache's TTL for exact solves and seeded runs, its
+    shorter unseeded TTL for unseeded Monte Carlo (0 = not cached).
+    """
+    cache = get_sim_cache()
+    return cache.ttl if mode == 'exact' or seed is not None else cache.unseeded_ttl
+
+def cached(key, ttl, compute):
+    """compute()'s result through the simulation cache, kept for ttl seconds (see result_ttl)."""
+    return get_sim_cache().get_or_compute(key, compute, ttl) if ttl > 0 else compute()
+
+def cache_key(kind, features_path, **params):
+    """Cache key for a simulation over the features at features_path; also drops cached results from older data versions."""
+    import sim_cache
+
+    version = sim_cache.data_version(features_path)
+    get_sim_cache().check_version(version)
+    return sim_cache.make_key(kind, version, **params)
+
+def player_key(row, name):
+    """Registry ID of a resolved player, else the lower-cased name that failed to resolve."""
+    player_id = row.get('player_id') if row is not None else None
+    # NaN for players missing from the registry
+    if player_id is not None and player_id == player_id:
+        return int(player_id)
+    return f"name:{name.lower()}"
 
 # --- Prediction Engine (Monte Carlo Simulation) ---
 def simulate_player_vs_player(player1, player2, format_type):
     """
     Simulates a player-vs-player matchup using a simple probabilistic model.
     """
-    data = load_and_preprocess_data(format_type)
+    data = get_format_data(format_type)
 
-    if player1 not in data.index or player2 not in data.index:
+    if player1 not in data or player2 not in data:
         return {"winner": "N/A", "probability": "0%", "reasoning": "Player not found in data."}
 
     # Simplified logic for demonstration
-    if data.loc[player1, 'bat_strike_rate'] > data.loc[player2, 'bowl_economy'] * 15:
+    if data[player1]['bat_strike_rate'] > data[player2]['bowl_economy'] * 15:
         return {"winner": player1, "probability": "75%", "reasoning": f"{player1}'s aggressive batting style gives him an edge over {player2}."}
     else:
         return {"winner": player2, "probability": "65%", "reasoning": f"{player2}'s disciplined bowling and control of the run-rate are predicted to be a challenge for {player1}."}
 
-def simulate_team_vs_team(team1, team2, format_type):
+def simulate_team_vs_team(team1, team2, format_type, trials=10000, seed=None, workers=None):
     """
-    Simulates a team-vs-team matchup based on aggregate team strengths.
+    Simulates a full team-vs-team match (team1 batting first) with processing/match_simulator.py.
+    workers shards the trials over a process pool (0 = all CPUs); the result does not depend on the
+    count, so the cache key only records whether the run was sharded. Unseeded runs are cached
+    briefly (see result_ttl).
     """
-    data = load_and_preprocess_data(format_type)
+    import monte_carlo_duel
 
-    # Simplified logic for demonstration
-    team1_strength = sum(data.loc[player, 'bat_strike_rate'] for player in team1)
-    team2_strength = sum(data.loc[player, 'bowl_economy'] for player in team2)
+    df = get_duel_features()
+    sides = [[player_key(monte_carlo_duel.find_player_row(df, name, format_type), name) for name in team]
+             for team in (team1, team2)]
+    key = cache_key('match', df.attrs.get('features_path'), team1=sides[0], team2=sides[1], format=format_type.upper(), trials=trials, seed=seed,
+                    sharded=workers is not None)
+    return cached(key, result_ttl('mc', seed),
+                  lambda: run_team_vs_team(df, team1, team2, format_type, trials, seed, workers))
+
+def run_team_vs_team(df, team1, team2, format_type, trials, seed, workers=None):
+    import match_simulator
+
+    sim = match_simulator.simulate_match(team1, team2, format_type, df, trials=trials, rng_seed=seed,
+                                         workers=workers)
+    p1, p2 = sim['team1_win_probability'], sim['team2_win_probability']
+    winner, probability = ("Team 1", p1) if p1 >= p2 else ("Team 2", p2)
+    t1, t2 = sim['team1_total'], sim['team2_total']
+    reasoning = (f"Over {sim['trials']} simulated matches Team 1 averaged {t1['mean']:.0f} runs "
+                 f"and Team 2 {t2['mean']:.0f}; Team 1 won {p1:.0%}, Team 2 {p2:.0%}.")
+    if sim['draw_probability'] > 0:
+        reasoning += f" {sim['draw_probability']:.0%} ended in a draw."
+    if sim['missing_players']:
+        reasoning += f" No data for {', '.join(sim['missing_players'])}; league averages used."
+    return {"winner": winner, "probability": f"{probability:.0%}", "reasoning": reasoning, "simulation": sim}
 
-    if team1_strength > team2_strength * 25:
-        return {"winner": "Team 1", "probability": "80%", "reasoning": "Team 1's superior batting depth is expected to outperform Team 2's bowlers."}
+def duel_inputs(batsman, bowler, format_type, balls=6, trials=10000, seed=None, mode='mc', target_se=None,
+                target_runs_se=None, max_trials=None, sampling='iid', workers=None, store=None):
+    """
+    (df, batter_row, bowler_row, cache key) for a duel; df is None when the rows come from the store,
+    which is dropped unless its head-to-head pairs are the table's as it is now.
+    Raises ValueError for settings the duel would ignore (see monte_carlo_duel.unused_settings),
+    bar trials, which requests always carry.
+    """
+    import monte_carlo_duel
+    from head_to_head import H2H_TABLE
+    from table_io import find_table
+
+    kind = monte_carlo_duel.duel_kind(mode, target_se, target_runs_se)
+    unused = monte_carlo_duel.unused_settings(kind, sampling=sampling, workers=workers, target_se=target_se,
+                                              target_runs_se=target_runs_se, max_trials=max_trials)
+    if unused:
+        raise ValueError(f"{', '.join(unused)} can't be used with {kind} duels" if kind != 'mc'
+                         else f"{', '.join(unused)} needs target_se or target_runs_se")
+    if store is not None and not store.has_head_to_head(find_table(H2H_TABLE)):
+        store = None
+    if store is not None:
+        df = None
+        features_path = os.path.abspath(monte_carlo_duel.PLAYER_FEATURES_CSV)
+        batter_row = store.find_row(batsman, format_type)
+        bowler_row = store.find_row(bowler, format_type)
+    else:
+        df = get_duel_features()
+        features_path = df.attrs.get('features_path')
+        batter_row = monte_carlo_duel.find_player_row(df, batsman, format_type)
+        bowler_row = monte_carlo_duel.find_player_row(df, bowler, format_type)
+    if mode == 'exact':
+        settings = None
+    elif kind == 'adaptive':
+        # adaptive runs size themselves and aren't sharded: trials and workers don't apply
+        settings = ['adaptive', seed, target_se, target_runs_se,
+                    monte_carlo_duel.ADAPTIVE_MAX_TRIALS if max_trials is None else max_trials]
     else:
-        return {"winner": "Team 2", "probability": "70%", "reasoning": "Team 2's balanced bowling attack is likely to contain Team 1's batsmen."}
+        settings = [trials, seed, sampling, workers is not None]
+    key = cache_key('duel', features_path, batsman=player_key(batter_row, batsman), bowler=player_key(bowler_row, bowler),
+                    format=format_type.upper(), balls=balls, mode=mode, sampling=settings)
+    return df, batter_row, bowler_row, key
+
+def simulate_batter_vs_bowler(batsman, bowler, format_type, balls=6, trials=10000, seed=None, mode='mc',
+                              target_se=None, target_runs_se=None, max_trials=None, sampling='iid', workers=None,
+                              store=None):
+    """
+    Batsman-vs-bowler duel using the per-ball model from processing/monte_carlo_duel.py.
+    A target_se / target_runs_se switches to adaptive (iid) sampling in place of a fixed trial
+    count, capped at max_trials; sampling picks the variance-reduction scheme of fixed-count runs,
+    and workers shards them over a process pool (0 = all CPUs). Results are cached per (players,
+    format, sampling settings, model and data version); unseeded runs only briefly (see result_ttl).
+    With a feature store (see lean_store) the players, baselines and head-to-head record come from
+    it when it is current, and no DataFrame is built; the result is the same.
+    """
+    df, batter_row, bowler_row, key = duel_inputs(batsman, bowler, format_type, balls, trials, seed, mode, target_se,
+                                                  target_runs_se, max_trials, sampling, workers, store)
+    if df is not None:
+        store = None
+    return cached(key, result_ttl(mode, seed), lambda: run_batter_vs_bowler(
+        df, batter_row, bowler_row, format_type, balls, trials, seed, mode,
+        target_se, target_runs_se, max_trials, sampling, workers, store))
+
+def duel_model(df, batter_row, bowler_row, format_type, store=None):
+    """(ball model, head-to-head record) for a duel's resolved rows."""
+    import monte_carlo_duel
+
+    h2h = monte_carlo_duel.head_to_head_record(batter_row, bowler_row, format_type, store)
+    baselines = store.baselines(format_type) if store is not None else None
+    model = monte_carlo_duel.build_ball_model(batter_row, bowler_row, df, fmt=format_type, baselines=baselines,
+                                              h2h=h2h or False)
+    return model, h2h
+
+def describe_duel(sim, batter_row, bowler_row, model, h2h):
+    """Adds the players, head-to-head record and reasoning to a duel summary, in place."""
+    import monte_carlo_duel
+
+    sim['batsman_found'] = batter_row is not None
+    sim['bowler_found'] = bowler_row is not None
+    sim['head_to_head'] = h2h
+    sim['reasoning'] = monte_carlo_duel.pretty_reason(batter_row, bowler_row, model)
+    return sim
+
+def run_batter_vs_bowler(df, batter_row, bowler_row, format_type, balls, trials, seed, mode,
+                         target_se=None, target_runs_se=None, max_trials=None, sampling='iid', workers=None,
+                         store=None):
+    import monte_carlo_duel
+
+    model, h2h = duel_model(df, batter_row, bowler_row, format_type, store)
+    if mode == 'exact':
+        sim = monte_carlo_duel.solve_duel_exact(model, balls=balls)
+    elif target_se is not None or target_runs_se is not None:
+        sim = monte_carlo_duel.simulate_duel_adaptive(
+            model, balls=balls, target_se=target_se, target_runs_se=target_runs_se,
+            max_trials=monte_carlo_duel.ADAPTIVE_MAX_TRIALS if max_trials is None else max_trials, rng_seed=seed)
+    elif workers is not None:
+        sim = monte_carlo_duel.simulate_duel_parallel(model, balls=balls, trials=trials, rng_seed=seed,
+                                                      workers=workers, sampling=sampling)
+    else:
+        sim = monte_carlo_duel.simulate_duel(model, balls=balls, trials=trials, rng_seed=seed, sampling=sampling)
+    return describe_duel(sim, batter_row, bowler_row, model, h2h)
+
+def simulate_duel_matrix(request):
+    """
+    Many duels in one call (batters x bowlers, or explicit pairs) via processing/duel_batch.py.
+    """
+    import duel_batch
+
+    return duel_batch.run_batch(request, get_duel_features())
+
+def generate_insights(player):
+    """
+    Short text summary of a player's batting and bowling numbers across formats.
+    """
+    lines = []
+    for format_type in ('t20', 'odi', 'test'):
+        data = get_format_data(format_type)
+        if player in data:
+            row = data[player]
+            lines.append(f"{format_type.upper()}: strike rate {row['bat_strike_rate']}, economy {row['bowl_economy']}.")
+    if not lines:
+        return f"No data available for {player}."
+    return f"{player}\n" + "\n".join(lines)
+
+def search_players(query, format_type, limit=10, store=None):
+    """
+    Typeahead over player_features.csv using the prebuilt name index (or a scan of the feature store).
+    """
+    if store is not None:
+        return store.suggest(query, format_type, limit)
+    import player_registry
+
+    return player_registry.index_for(get_duel_features()).suggest(query, format_type, limit)
+
+# --- Command dispatch shared by the CLI and ml_model/worker.py ---
+COMMANDS = ('simulate_player_vs_player', 'simulate_team_vs_team', 'duel', 'duel_matrix', 'generate_insights',
+            'search_players', 'cache_stats')
+# Commands the CLI answers from the feature store
+LEAN_COMMANDS = ('duel', 'search_players')
+
+def optional_float(value):
+    return None if value is None else float(value)
+
+def optional_int(value):
+    return None if value is None else int(value)
+
+def duel_params(args):
+    """simulate_batter_vs_bowler keyword arguments (bar store) for a duel request's parsed JSON args."""
+    return {
+        'batsman': args['batsman'], 'bowler': args['bowler'], 'format_type': args.get('format', 'ODI'),
+        'balls': int(args.get('balls', 6)), 'trials': int(args.get('trials', 10000)),
+        'seed': args.get('seed'), 'mode': args.get('mode', 'mc'),
+        'target_se': optional_float(args.get('target_se')), 'target_runs_se': optional_float(args.get('target_runs_se')),
+        'max_trials': optional_int(args.get('max_trials')),
+        'sampling': args.get('sampling') or 'iid', 'workers': optional_int(args.get('workers')),
+    }
+
+def run_command(command, args, store=None):
+    """
+    Runs one named command with its parsed arguments and returns a JSON-serializable result.
+    store (see lean_store) serves duel and search_players without loading the features DataFrame.
+    Raises ValueError for unknown commands and invalid arguments (the worker reports those as INVALID_REQUEST).
+    """
+    if command == 'simulate_player_vs_player':
+        return simulate_player_vs_player(args['player1'], args['player2'], args['format'])
+    if command == 'simulate_team_vs_team':
+        return simulate_team_vs_team(
+            args['team1'], args['team2'], args['format'],
+            trials=int(args.get('trials', 10000)), seed=args.get('seed'), workers=optional_int(args.get('workers'))
+        )
+    if command == 'duel':
+        return simulate_batter_vs_bowler(**duel_params(args), store=store)
+    if command == 'duel_matrix':
+        return simulate_duel_matrix(args)
+    if command == 'generate_insights':
+        return generate_insights(args['player'])
+    if command == 'search_players':
+        return search_players(args['query'], args.get('format', 'ODI'), int(args.get('limit', 10)), store)
+    if command == 'cache_stats':
+        return dict(get_sim_cache().stats(), pid=os.getpid())
+    raise ValueError(f"Unknown command: {command}")
 
 # --- Main function to handle CLI arguments ---
 if __name__ == "__main__":
@@ -103,14 +380,20 @@ if __name__ == "__main__":
         sys.exit(1)
 
     command = sys.argv[1]
-    args = json.loads(sys.argv[2])
-
-    if command == 'simulate_player_vs_player':
-        result = simulate_player_vs_player(args['player1'], args['player2'], args['format'])
-        print(json.dumps(result))
-    elif command == 'simulate_team_vs_team':
-        result = simulate_team_vs_team(args['team1'], args['team2'], args['format'])
-        print(json.dumps(result))
+    if command == 'generate_insights' and not sys.argv[2].lstrip().startswith('{'):
+        # server.js historically passed the bare player name
+        args = {'player': sys.argv[2]}
     else:
+        args = json.loads(sys.argv[2])
+
+    if command not in COMMANDS:
         print(json.dumps({"error": "Unknown command."}))
         sys.exit(1)
+
+    # a one-shot process: cold start is the request latency, so serve from the feature store when possible
+    try:
+        result = run_command(command, args, store=lean_store() if command in LEAN_COMMANDS else None)
+    except ValueError as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+    print(result if isinstance(result, str) else json.dumps(result))
@@ -0,0 +1,456 @@
+#!/usr/bin/env python3
+"""
+Asyncio simulation service: micro-batches concurrent duel requests.
+
+The worker pool behind server.js serves one request per worker at a time, so N concurrent duels
+cost N model builds and N sampling loops. This service keeps the data loaded in one process and
+holds duel and duel_matrix (matchup) requests for up to --window-ms. It groups them by ball count
+(each pair carries its own format's outcome table, so formats share a batch) and resolves every
+pair of a group in one vectorized pass, then hands each caller its own rows:
+ - exact: one dynamic programme over all pairs (duel_batch.solve_pairs)
+ - unseeded plain Monte Carlo: the same programme, then one multinomial draw of each pair's trials
+   from its exact distribution (duel_batch.sample_distributions); same law as ball-by-ball sampling,
+   at a cost that doesn't grow with trials
+ - seeded or variance-reduced Monte Carlo: each request draws its own uniforms from its seed and
+   the group plays them together (duel_batch.play_pairs), so the result is the one
+   predictor.run_command returns, whatever it was batched with
+
+Requests that don't fit a batch run on their own, in arrival order:
+ - adaptive (target_se) or sharded (workers) duels
+ - form-weighted matrices
+ - anything over SAMPLE_CHUNK_CELLS trials x balls
+ - every other predictor command
+All simulation happens on one thread, so the event loop keeps queueing while a batch runs and the
+next batch takes everything that arrived in the meantime: under load, batches grow instead of the queue.
+
+Protocol: JSON lines over TCP, as ml_model/worker.py speaks over stdio. A connection may have many
+requests in flight; responses come back as they complete, matched by id:
+ - request:  {"id": 7, "command": "duel", "args": {...}}
+ - response: {"id": 7, "ok": true, "result": ...}  or  {"id": 7, "ok": false, "error": "..."}
+   (with "code": "INVALID_REQUEST" when the arguments were rejected)
+The "metrics" command returns queue depth, batch sizes, per-request latency and throughput.
+
+Usage:
+  python ml_model/sim_service.py [--host 127.0.0.1] [--port 5100] [--window-ms 5] [--max-batch 256]
+then start server.js with SIM_SERVICE_PORT=5100 to send duels to it.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import sys
+import time
+import traceback
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+import predictor  # puts processing/ on sys.path
+from worker import error_response, parse_request, preload
+import duel_batch
+import monte_carlo_duel as mcd
+
+DEFAULT_PORT = 5100
+DEFAULT_WINDOW_MS = 5.0
+DEFAULT_MAX_BATCH = 256
+# Uniforms resolved per vectorized pass (8 bytes each), whatever the number of requests in the batch
+PASS_CELLS = 4 * mcd.SAMPLE_CHUNK_CELLS
+# Recent batches and requests the metrics percentiles are taken over
+METRICS_WINDOW = 4096
+RECENT_RATE_S = 10.0
+
+# --- Batching: which group a request joins, and running a group on the simulation thread ---
+def batch_key(command, args):
+    """
+    The group a request is batched with, or None when it runs on its own (see the module docstring):
+     - ('exact', balls): exact solves
+     - ('histogram', balls): unseeded iid Monte Carlo, drawn from the exact distributions
+     - ('mc', balls, trials): seeded or variance-reduced Monte Carlo, resolved ball by ball
+    """
+    if command == 'duel':
+        params = predictor.duel_params(args)
+        if params['target_se'] is not None or params['target_runs_se'] is not None or params['workers'] is not None:
+            return None
+        mode, balls, trials, pairs = params['mode'], params['balls'], params['trials'], 1
+        seed, sampling, crn = params['seed'], params['sampling'], False
+    elif command == 'duel_matrix':
+        params = duel_batch.batch_params(args)
+        if args.get('form'):
+            return None
+        mode, balls, trials = params['mode'], params['balls'], params['trials']
+        pairs = len(params['pairs']) if params['pairs'] is not None else len(params['batters'] or []) * len(params['bowlers'] or [])
+        seed, sampling, crn = params['rng_seed'], params['sampling'], params['crn']
+    else:
+        return None
+    if mode == 'exact':
+        return ('exact', balls)
+    if seed is None and sampling == 'iid' and not crn:
+        return ('histogram', balls)
+    if pairs * trials * balls > mcd.SAMPLE_CHUNK_CELLS:
+        return None
+    return ('mc', balls, trials)
+
+_rng = None
+
+def service_rng():
+    """Generator for requests without a seed (used on the simulation thread only)."""
+    global _rng
+    if _rng is None:
+        _rng = np.random.default_rng()
+    return _rng
+
+def request_rng(seed):
+    return service_rng() if seed is None else np.random.default_rng(seed)
+
+def prepare(job, balls, seen):
+    """
+    Resolves a job's players and sets its outcome CDF rows (job['cdf']), trial count, and callbacks
+    that draw its uniforms, summarize its sampled rows and build its response from the summaries.
+    Cached duels get job['result'] instead, and a duel already in this batch (same cache key) job['same_as'],
+    unless its result isn't cached at all (predictor.result_ttl of 0).
+    """
+    args = job['args']
+    if job['command'] == 'duel':
+        params = predictor.duel_params(args)
+        df, batter_row, bowler_row, key = predictor.duel_inputs(**params)
+        ttl = predictor.result_ttl(params['mode'], params['seed'])
+        if ttl > 0:
+            cache = predictor.get_sim_cache()
+            cached = cache.get(key)
+            if cached is not None:
+                job['result'] = cached
+                return
+            if cache.enabled and key in seen:
+                job['same_as'] = seen[key]
+                return
+            seen[key] = job
+        model, h2h = predictor.duel_model(df, batter_row, bowler_row, params['format_type'])
+        job['key'] = key
+        job['ttl'] = ttl
+        job['cdf'] = duel_batch.model_cdf(model)[None, :]
+        job['trials'] = params['trials']
+        # simulate_duel's draws: one (trials x balls) matrix from the request's generator
+        job['uniforms'] = lambda trials: mcd.sample_uniforms(
+            request_rng(params['seed']), trials, balls, params['sampling']).T[:, None, :]
+        job['summarize'] = lambda runs, dismissed: [mcd.summarize_trials(runs[0], dismissed[0], balls)]
+        job['finish'] = lambda summaries: predictor.describe_duel(summaries[0], batter_row, bowler_row, model, h2h)
+        return
+
+    params = duel_batch.batch_params(args)
+    plan = duel_batch.plan_duels(predictor.get_duel_features(), params['batters'], params['bowlers'], params['pairs'],
+                                 params['fmt'], params['use_h2h'])
+    job['cdf'] = plan['cdf']
+    job['trials'] = params['trials']
+
+    def uniforms(trials):
+        # simulate_duels' draws: it fits one sample_pairs chunk (see batch_key)
+        rng = params['rng_seed'] if isinstance(params['rng_seed'], np.random.Generator) else request_rng(params['rng_seed'])
+        planes = [np.broadcast_to(p, (balls, stop - start, trials))
+                  for start, stop, p in duel_batch.pair_uniforms(rng, len(plan['cdf']), balls, trials,
+                                                                 params['sampling'], params['crn'])]
+        return np.concatenate(planes, axis=1)
+
+    job['uniforms'] = uniforms
+    job['summarize'] = lambda runs, dismissed: duel_batch.summarize_pairs(runs, dismissed, balls)
+    job['finish'] = lambda summaries: duel_batch.duel_results(plan, summaries, params['fmt'], balls, params['mode'])
+
+def finish(jobs, summaries):
+    """Hands each job its slice of the summaries (one per CDF row) and caches the duels."""
+    row = 0
+    for job in jobs:
+        job['result'] = job['finish'](summaries[row:row + len(job['cdf'])])
+        row += len(job['cdf'])
+        if job.get('key') and job['ttl'] > 0:
+            predictor.get_sim_cache().put(job['key'], job['result'], job['ttl'])
+
+def run_jobs(jobs, key):
+    """Sets job['result'] for prepared jobs: one vectorized pass over all their pairs (a few for long ball-by-ball runs)."""
+    mode, balls = key[0], key[1]
+    if mode == 'exact':
+        finish(jobs, duel_batch.solve_pairs(np.concatenate([job['cdf'] for job in jobs]), balls))
+        return
+    if mode == 'histogram':
+        trials = np.concatenate([np.full(len(job['cdf']), job['trials']) for job in jobs])
+        histograms, dismissals = duel_batch.sample_distributions(np.concatenate([job['cdf'] for job in jobs]), balls,
+                                                                 trials, service_rng())
+        finish(jobs, duel_batch.summarize_histograms(histograms, dismissals, balls))
+        return
+    trials = key[2]
+    start = 0
+    while start < len(jobs):
+        # as many jobs as fit PASS_CELLS uniforms (at least one)
+        stop, cells = start + 1, len(jobs[start]['cdf']) * balls * trials
+        while stop < len(jobs) and cells + len(jobs[stop]['cdf']) * balls * trials <= PASS_CELLS:
+            cells += len(jobs[stop]['cdf']) * balls * trials
+            stop += 1
+        part = jobs[start:stop]
+        total_runs, dismissed = duel_batch.play_pairs(np.concatenate([job['cdf'] for job in part]),
+                                                      np.concatenate([job['uniforms'](trials) for job in part], axis=1))
+        summaries, row = [], 0
+        for job in part:
+            rows = slice(row, row + len(job['cdf']))
+            row = rows.stop
+            summaries.extend(job['summarize'](total_runs[rows], dismissed[rows]))
+        finish(part, summaries)
+        start = stop
+
+def run_group(key, jobs):
+    """
+    Results for a group of requests sharing batch_key `key`, in order; a request that fails gets
+    its exception in place of a result and doesn't fail the others.
+    """
+    seen = {}
+    live = []
+    for job in jobs:
+        try:
+            prepare(job, key[1], seen)
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            job['result'] = e
+        if 'cdf' in job and 'result' not in job:
+            live.append(job)
+    try:
+        run_jobs(live, key)
+    except Exception:
+        # one request broke a shared pass (e.g. an unknown sampling mode): retry them one by one so only it fails
+        traceback.print_exc(file=sys.stderr)
+        for job in live:
+            if 'result' not in job:
+                try:
+                    run_jobs([job], key)
+                except Exception as e:
+                    job['result'] = e
+    return [job['same_as']['result'] if 'same_as' in job else job['result'] for job in jobs]
+
+# --- Metrics ---
+def summary(values):
+    """{'count', 'mean', 'p50', 'p90', 'p99', 'max'} of recent values (nearest rank), or {'count': 0}."""
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+    n = len(ordered)
+    rank = lambda q: ordered[max(0, math.ceil(q / 100 * n) - 1)]
+    return {'count': n, 'mean': sum(ordered) / n, 'p50': rank(50), 'p90': rank(90), 'p99': rank(99), 'max': ordered[-1]}
+
+class ServiceMetrics:
+    """Counters since start, plus the last METRICS_WINDOW batch sizes, queue depths and request latencies."""
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.started = time.perf_counter()
+        self.counters = {'requests': 0, 'batched': 0, 'direct': 0, 'errors': 0, 'batches': 0}
+        self.max_queue_depth = 0
+        self.batch_histogram = {}  # power-of-two lower bound -> batches
+        self.batch_sizes = deque(maxlen=window)
+        self.batch_ms = deque(maxlen=window)
+        self.queue_depths = deque(maxlen=window)  # requests waiting when each batch started
+        self.queue_wait_ms = deque(maxlen=window)  # time each batched request waited for its batch
+        self.latency_ms = deque(maxlen=window)  # request received -> response ready
+        self.completed = deque(maxlen=window)
+
+    def batch_started(self, size, queue_depth, waits_ms):
+        self.counters['batches'] += 1
+        bucket = 1 << (size.bit_length() - 1)
+        self.batch_histogram[bucket] = self.batch_histogram.get(bucket, 0) + 1
+        self.batch_sizes.append(size)
+        self.queue_depths.append(queue_depth)
+        self.queue_wait_ms.extend(waits_ms)
+
+    def request_done(self, started, ok):
+        now = time.perf_counter()
+        self.counters['requests'] += 1
+        if not ok:
+            self.counters['errors'] += 1
+        self.latency_ms.append((now - started) * 1000)
+        self.completed.append(now)
+
+    def snapshot(self, queue_depth, config):
+        now = time.perf_counter()
+        uptime = now - self.started
+        recent = sum(1 for t in self.completed if t >= now - RECENT_RATE_S)
+        return {
+            'pid': os.getpid(),
+            'uptime_s': uptime,
+            'config': config,
+            'counters': dict(self.counters),
+            'queue_depth': {'current': queue_depth, 'max': self.max_queue_depth, 'at_batch_start': summary(self.queue_depths)},
+            'batch_size': dict(summary(self.batch_sizes),
+                               histogram={str(k): v for k, v in sorted(self.batch_histogram.items())}),
+            'batch_ms': summary(self.batch_ms),
+            'queue_wait_ms': summary(self.queue_wait_ms),
+            'latency_ms': summary(self.latency_ms),
+            'throughput': {
+                'requests_per_s': self.counters['requests'] / uptime if uptime > 0 else 0.0,
+                'recent_requests_per_s': recent / min(RECENT_RATE_S, uptime) if uptime > 0 else 0.0,
+            },
+        }
+
+# --- Service ---
+class MicroBatcher:
+    """
+    Holds submitted jobs for up to `window` seconds (less once a group reaches max_batch), grouped by
+    key, then runs each group of at most max_batch jobs through run_group on the executor.
+    """
+
+    def __init__(self, run_group, executor, window, max_batch, metrics):
+        self.run_group = run_group
+        self.executor = executor
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self.metrics = metrics
+        self.pending = {}  # key -> [(job, future, enqueued)]
+        self.depth = 0
+        self._arrived = asyncio.Event()
+        self._full = asyncio.Event()
+
+    def submit(self, key, job):
+        """Queues a job; returns a future for its result."""
+        future = asyncio.get_running_loop().create_future()
+        group = self.pending.setdefault(key, [])
+        group.append((job, future, time.perf_counter()))
+        self.depth += 1
+        self.metrics.max_queue_depth = max(self.metrics.max_queue_depth, self.depth)
+        self._arrived.set()
+        if len(group) >= self.max_batch:
+            self._full.set()
+        return future
+
+    async def run(self):
+        while True:
+            await self._arrived.wait()
+            oldest = min(entries[0][2] for entries in self.pending.values())
+            delay = self.window - (time.perf_counter() - oldest)
+            if delay > 0 and not self._full.is_set():
+                try:
+                    await asyncio.wait_for(self._full.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+            self._arrived.clear()
+            self._full.clear()
+            groups, self.pending = self.pending, {}
+            for key, entries in groups.items():
+                for start in range(0, len(entries), self.max_batch):
+                    await self._run_batch(key, entries[start:start + self.max_batch])
+
+    async def _run_batch(self, key, entries):
+        started = time.perf_counter()
+        self.metrics.batch_started(len(entries), self.depth, [(started - enqueued) * 1000 for _, _, enqueued in entries])
+        self.depth -= len(entries)
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                self.executor, self.run_group, key, [job for job, _, _ in entries])
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            results = [e] * len(entries)
+        self.metrics.batch_ms.append((time.perf_counter() - started) * 1000)
+        for (_, future, _), result in zip(entries, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+class SimulationService:
+    """Serves JSON-line requests, batching duels through a MicroBatcher and running everything else directly."""
+
+    def __init__(self, window_ms=DEFAULT_WINDOW_MS, max_batch=DEFAULT_MAX_BATCH):
+        # one simulation thread: the data, caches and generators are never shared between threads
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="simulation")
+        self.metrics = ServiceMetrics()
+        self.config = {'window_ms': window_ms, 'max_batch': max_batch}
+        self.batcher = MicroBatcher(run_group, self.executor, window_ms / 1000, max_batch, self.metrics)
+
+    async def handle(self, line):
+        """The response dict for one request line."""
+        started = time.perf_counter()
+        request, invalid = parse_request(line)
+        if invalid is not None:
+            return invalid
+
+        request_id = request.get("id")
+        command, args = request.get("command"), request.get("args") or {}
+        if command == 'metrics':
+            return {"id": request_id, "ok": True, "result": self.metrics.snapshot(self.batcher.depth, self.config)}
+        ok = False
+        try:
+            key = batch_key(command, args)
+            if key is None:
+                self.metrics.counters['direct'] += 1
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, predictor.run_command, command, args)
+            else:
+                self.metrics.counters['batched'] += 1
+                result = await self.batcher.submit(key, {'command': command, 'args': args})
+            ok = True
+            return {"id": request_id, "ok": True, "result": result}
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            return error_response(request_id, e)
+        finally:
+            self.metrics.request_done(started, ok)
+
+    async def respond(self, line, writer):
+        response = await self.handle(line)
+        if writer.is_closing():
+            return
+        writer.write((json.dumps(response, default=float) + "\n").encode("utf-8"))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def serve_connection(self, reader, writer):
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.respond(line, writer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            if tasks:
+                await asyncio.gather(*tasks, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host, port):
+        loop = asyncio.get_running_loop()
+        # loaded on the simulation thread, which is the only one that touches them afterwards
+        await loop.run_in_executor(self.executor, preload)
+        batcher = asyncio.create_task(self.batcher.run())
+        # duel_matrix requests can list many players: allow long lines
+        server = await asyncio.start_server(self.serve_connection, host, port, limit=1 << 24)
+        stop = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        print(f"🚀 Simulation service listening on {host}:{port} "
+              f"(window {self.config['window_ms']:g} ms, max batch {self.config['max_batch']})", flush=True)
+        async with server:
+            await stop.wait()
+        batcher.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Asyncio simulation service that micro-batches concurrent duels")
+    parser.add_argument("--host", default=os.environ.get('SIM_SERVICE_HOST', '127.0.0.1'),
+                        help="Interface to listen on (default SIM_SERVICE_HOST or 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=int(os.environ.get('SIM_SERVICE_PORT', DEFAULT_PORT)),
+                        help=f"Port to listen on (default SIM_SERVICE_PORT or {DEFAULT_PORT})")
+    parser.add_argument("--window-ms", type=float, default=float(os.environ.get('SIM_BATCH_WINDOW_MS', DEFAULT_WINDOW_MS)),
+                        help=f"How long a request waits for others to batch with (default {DEFAULT_WINDOW_MS:g}; 0 = no wait)")
+    parser.add_argument("--max-batch", type=int, default=int(os.environ.get('SIM_MAX_BATCH', DEFAULT_MAX_BATCH)),
+                        help=f"Most requests per batch (default {DEFAULT_MAX_BATCH}; 1 = no batching)")
+    args = parser.parse_args()
+    asyncio.run(SimulationService(args.window_ms, args.max_batch).serve(args.host, args.port))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Long-lived prediction worker for server.js.
+
+Speaks JSON lines over stdio so one interpreter serves many requests:
+ - request:  {"id": 7, "command": "duel", "args": {...}}
+ - response: {"id": 7, "ok": true, "result": ...}  or  {"id": 7, "ok": false, "error": "..."}
+A request rejected for its arguments (a ValueError) also carries "code": "INVALID_REQUEST".
+
+On startup the feature data is loaded once and {"ready": true} is written.
+Commands are the ones accepted by predictor.run_command.
+"""
+
+import json
+import os
+import sys
+import traceback
+
+import predictor
+
+def preload():
+    """Load every data source up front so the first request doesn't pay for it."""
+    for format_type in ('t20', 'odi', 'test'):
+        predictor.get_format_data(format_type)
+    try:
+        import monte_carlo_duel
+
+        predictor.get_duel_features()
+        monte_carlo_duel.load_head_to_head()
+    except FileNotFoundError as e:
+        print(f"Duel features unavailable: {e}", file=sys.stderr)
+
+def error_response(request_id, error):
+    """The response for a request that raised `error`."""
+    response = {"id": request_id, "ok": False, "error": str(error)}
+    if isinstance(error, ValueError):
+        response["code"] = "INVALID_REQUEST"
+    return response
+
+def parse_request(line):
+    """(request dict, None) for a request line, or (None, error response) when it isn't a JSON object."""
+    try:
+        request = json.loads(line)
+    except json.JSONDecodeError as e:
+        return None, {"id": None, "ok": False, "error": f"Invalid JSON: {e}"}
+    if not isinstance(request, dict):
+        error = f"Invalid request: expected a JSON object, got {type(request).__name__}"
+        return None, {"id": None, "ok": False, "error": error}
+    return request, None
+
+def handle_line(line):
+    """Run one request line and return the response dict."""
+    request, invalid = parse_request(line)
+    if invalid is not None:
+        return invalid
+
+    request_id = request.get("id")
+    try:
+        result = predictor.run_command(request.get("command"), request.get("args") or {})
+        return {"id": request_id, "ok": True, "result": result}
+    except Exception as e:
+        traceback.print_exc(file=sys.stderr)
+        return error_response(request_id, e)
+
+def main():
+    # Keep the protocol stream clean: stray prints from library code go to stderr.
+    protocol = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    sys.stdout = sys.stderr
+
+    preload()
+    protocol.write(json.dumps({"ready": True, "pid": os.getpid()}) + "\n")
+    protocol.flush()
+
+    for line in sys.stdin:
+        if not line.strip():
+            continue
+        protocol.write(json.dumps(handle_line(line), default=float) + "\n")
+        protocol.flush()
+
+if __name__ == "__main__":
+    main()
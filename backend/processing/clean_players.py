@@ -1,13 +1,25 @@
 import pandas as pd
 import re
 import os
+import argparse
 
-BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
-BALLS_FILE = os.path.join(BASE_PATH, "balls.csv")
+from incremental import read_json, write_json, new_delta, can_apply
+from instrumentation import add_arguments, configure_from_args, count, instrumented, stage
+from player_registry import update_registry
+from table_io import data_dir
+
+BASE_PATH = data_dir()
 PLAYERS_FILE = os.path.join(BASE_PATH, "players.csv")
 
 OUTPUT_MAPPING_FILE = os.path.join(BASE_PATH, "player_mapping.csv")
-OUTPUT_CLEAN_BALLS_FILE = os.path.join(BASE_PATH, "clean_balls.csv")
+
+# Incremental mode: consume extract_cricsheet's delta, emit our own for generate_player_features
+EXTRACT_DELTA_FILE = os.path.join(BASE_PATH, "extract_delta.json")
+CLEAN_DELTA_FILE = os.path.join(BASE_PATH, "clean_delta.json")
+
+# (c), (wk), etc.
+ROLE_TAG = r"\(.*?\)"
+SPACES = r"\s+"
 
 # Helper function to clean player names
 def clean_name(name):
@@ -15,26 +27,39 @@ def clean_name(name):
         return name
 
     # Remove (c), (wk), etc.
-    name = re.sub(r"\(.*?\)", "", name)
+    name = re.sub(ROLE_TAG, "", name)
 
     # Remove extra spaces
     name = name.strip()
 
     # Replace multiple spaces with single
-    name = re.sub(r"\s+", " ", name)
+    name = re.sub(SPACES, " ", name)
 
     return name
 
+def clean_names(names):
+    """
+    clean_name over an array of names with vectorized string ops. Callers pass the distinct
+    names (a players list or a column's categories), never a per-delivery column.
+    """
+    names = pd.Series(names, dtype=object)
+    return names.str.replace(ROLE_TAG, "", regex=True).str.strip().str.replace(SPACES, " ", regex=True)
+
+def player_mapping(players_df):
+    """raw_name -> clean_name rows for a players.csv frame, one per distinct clean name."""
+    players_df = players_df.copy()
+    players_df['clean_name'] = clean_names(players_df['player_name']).to_numpy()
+
+    # Remove duplicates
+    return players_df.drop_duplicates(subset=['clean_name'])
+
 def generate_player_mapping():
     """Creates a mapping of raw_name -> clean_name"""
     players_df = pd.read_csv(PLAYERS_FILE)
 
     print(f"🔹 Original players loaded: {len(players_df)}")
 
-    players_df['clean_name'] = players_df['player_name'].apply(clean_name)
-
-    # Remove duplicates
-    players_df = players_df.drop_duplicates(subset=['clean_name'])
+    players_df = player_mapping(players_df)
 
     # Save the mapping
     players_df[['player_name', 'clean_name']].to_csv(OUTPUT_MAPPING_FILE, index=False)
@@ -42,34 +67,49 @@ def generate_player_mapping():
 
     return players_df
 
-def clean_balls_data(mapping_df):
-    """Replaces raw names in balls.csv with clean names."""
-    print("📂 Loading balls.csv for cleaning...")
-    balls_df = pd.read_csv(BALLS_FILE)
-
-    # Create a mapping dictionary
-    name_map = dict(zip(mapping_df['player_name'], mapping_df['clean_name']))
-
-    print("🔹 Replacing names in batter, bowler, and player_out columns...")
-
-    for col in ['batter', 'bowler', 'non_striker', 'player_out']:
-        balls_df[col] = balls_df[col].map(name_map).fillna(balls_df[col])
-
-    # Save cleaned balls file
-    balls_df.to_csv(OUTPUT_CLEAN_BALLS_FILE, index=False)
-    print(f"✅ Cleaned balls.csv saved to {OUTPUT_CLEAN_BALLS_FILE}")
-    print(f"Final rows: {len(balls_df)}")
-
-def main():
+@instrumented("clean_players")
+def main(incremental=False):
     print("🚀 Starting player cleaning process...")
 
-    # Step 1: Generate player mapping
-    mapping_df = generate_player_mapping()
-
-    # Step 2: Clean balls.csv using mapping
-    clean_balls_data(mapping_df)
+    extract_delta = read_json(EXTRACT_DELTA_FILE)
+    previous = read_json(CLEAN_DELTA_FILE)
+    source_delta_id = extract_delta['delta_id'] if extract_delta else None
+
+    if incremental and previous is not None and source_delta_id is not None \
+            and previous.get('source_delta_id') == source_delta_id:
+        print("✅ Extraction delta already applied; nothing to clean.")
+        return
+
+    if incremental and not can_apply(extract_delta, previous and previous.get('source_delta_id')):
+        print("⚠️ Extraction delta does not follow the last cleaned run; cleaning everything.")
+        incremental = False
+
+    # The mapping covers every distinct name, so it is rebuilt in full either way.
+    # Deliveries need no rewrite: extract_cricsheet stores them with clean names already.
+    with stage("mapping"):
+        mapping_df = generate_player_mapping()
+        update_registry(mapping_df['clean_name'])
+        count("players", len(mapping_df))
+
+    if incremental:
+        delta = new_delta(
+            previous_delta_id=previous['delta_id'],
+            appended=extract_delta['appended'],
+            removed=extract_delta['removed'],
+        )
+    else:
+        delta = new_delta(full_rebuild=True)
+
+    delta['source_delta_id'] = source_delta_id
+    write_json(CLEAN_DELTA_FILE, delta)
 
     print("🎉 Cleaning process complete!")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build the raw -> clean player name mapping")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Chain onto the last incremental extraction instead of marking a full rebuild")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    main(incremental=args.incremental)
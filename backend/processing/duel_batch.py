@@ -0,0 +1,371 @@
+"""
+Batch duels: a whole batter x bowler matrix (or a list of explicit pairs) in one call.
+
+Features are loaded once and every per-ball model is built together as arrays, following
+monte_carlo_duel.build_ball_model field for field, then all duels are sampled (or solved exactly)
+in batches. monte_carlo_duel.py exposes this through --batch:
+
+  python processing/monte_carlo_duel.py --batch matchups.json      # or --batch - to read stdin
+
+with input such as
+  {"batters": ["V Kohli", "RG Sharma"], "bowlers": ["JM Anderson"], "format": "ODI", "balls": 6, "trials": 10000}
+or
+  {"pairs": [["V Kohli", "JM Anderson"], ["RG Sharma", "SCJ Broad"]], "format": "TEST", "mode": "exact"}
+
+Monte Carlo requests may also set "sampling" (iid / antithetic / stratified) and "crn": true to
+share one set of random numbers across all pairs, which makes comparisons such as one batter
+against several bowlers much less noisy. "form" (last10 / 12m / 24m / decay) uses form-weighted
+features, as monte_carlo_duel.py --form does.
+"""
+
+import math
+
+import numpy as np
+
+from head_to_head import RUN_COLUMNS, RUN_VALUES, load_head_to_head
+from league_baselines import baselines_for
+from parallel_mc import histogram_mean, histogram_percentile
+from player_registry import index_for
+import monte_carlo_duel as mcd
+
+# Non-boundary run shape of build_ball_model, normalized, on the RUN_VALUES grid (4s and 6s come from boundary%)
+BASE_RUN_SHARES = np.array([mcd.DEFAULT_RUN_DISTRIBUTION.get(r, 0.0) for r in RUN_VALUES])
+BASE_RUN_SHARES = BASE_RUN_SHARES / BASE_RUN_SHARES.sum()
+FOUR, SIX = RUN_VALUES.index(4), RUN_VALUES.index(6)
+
+# Only these feature columns reach the per-ball pmf (strike rate and economy feed
+# build_ball_model's runs-per-ball estimate, which the run distribution doesn't use)
+PLAYER_COLUMNS = ['player_id', 'boundary_percent', 'dismissal_probability', 'wicket_probability']
+
+def player_arrays(df, names, fmt):
+    """Looks players up once; returns (found mask, {column: float array}) with NaN where missing."""
+    index = index_for(df)
+    positions = [index.find(name, fmt) for name in names]
+    found = np.array([pos is not None for pos in positions], dtype=bool)
+    rows = np.array([pos for pos in positions if pos is not None], dtype=np.int64)
+    arrays = {}
+    for col in PLAYER_COLUMNS:
+        values = np.full(len(names), np.nan)
+        if col in df.columns and rows.size:
+            values[found] = df[col].to_numpy(dtype=float, na_value=np.nan)[rows]
+        arrays[col] = values
+    return found, arrays
+
+def league_default(value, default):
+    return value if value and not math.isnan(value) else default
+
+def build_ball_models(batters, bowlers, baselines, h2h_counts=None):
+    """
+    Array form of monte_carlo_duel.build_ball_model for every batter x bowler combination.
+
+    batters / bowlers are (found, arrays) from player_arrays; h2h_counts optionally holds
+    head-to-head (balls, dismissals, runs-per-value) arrays shaped like the pair grid.
+    Returns (p_wicket, run_probs): shapes (nb, nw) and (nb, nw, len(RUN_VALUES)).
+    """
+    bat_found, bat = batters
+    bowl_found, bowl = bowlers
+    league_wicket_prob = baselines.get('wicket_probability')
+
+    # player stats, falling back to league averages / defaults where a player is missing
+    boundary_pct = np.where(bat_found, bat['boundary_percent'], 6.0)
+    dismissal_prob = np.where(bat_found, bat['dismissal_probability'], 0.02)
+    wicket_prob = np.where(bowl_found, bowl['wicket_probability'], league_default(league_wicket_prob, 0.02))
+
+    p_wicket = mcd.ALPHA_WICKET * wicket_prob[None, :] + (1 - mcd.ALPHA_WICKET) * dismissal_prob[:, None]
+    p_wicket = np.clip(p_wicket * mcd.BOWLER_PRESSURE_FACTOR, 0.0005, 0.5)
+
+    boundary = boundary_pct / 100.0
+    prob_4 = boundary * 0.8
+    prob_6 = boundary * 0.2
+    scale = np.where(prob_4 + prob_6 > 0.6, 0.6 / np.maximum(prob_4 + prob_6, 1e-12), 1.0)
+    prob_4, prob_6 = prob_4 * scale, prob_6 * scale
+
+    # The same 0/1/2/3 shape fills whatever mass the wicket and boundaries leave
+    non_bound_mass = np.maximum(0.0, 1.0 - p_wicket - (prob_4 + prob_6)[:, None])
+    run_probs = non_bound_mass[..., None] * BASE_RUN_SHARES
+    run_probs[..., FOUR] = prob_4[:, None]
+    run_probs[..., SIX] = prob_6[:, None]
+
+    if h2h_counts is not None:
+        p_wicket, run_probs = blend_head_to_head(p_wicket, run_probs, *h2h_counts)
+    return p_wicket, run_probs
+
+def blend_head_to_head(p_wicket, run_probs, balls, dismissals, runs, prior_balls=None):
+    """Array form of monte_carlo_duel.blend_head_to_head; pairs with no balls are left unchanged."""
+    prior_balls = mcd.H2H_PRIOR_BALLS if prior_balls is None else prior_balls
+    met = balls > 0
+    weight = np.where(met, balls / (balls + prior_balls), 0.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        h2h_wicket = np.where(met, dismissals / balls, 0.0)
+        blended_wicket = np.where(met, np.clip((1 - weight) * p_wicket + weight * h2h_wicket, 0.0005, 0.5), p_wicket)
+
+        model_total = run_probs.sum(axis=-1, keepdims=True)
+        conditional = np.where(model_total > 0, run_probs / model_total, 0.0)
+        observed_total = runs.sum(axis=-1, keepdims=True)
+        observed = np.where(observed_total > 0, runs / observed_total, 0.0)
+        w = weight[..., None]
+        conditional = np.where(observed_total > 0, (1 - w) * conditional + w * observed, conditional)
+        norm = conditional.sum(axis=-1, keepdims=True)
+        norm = np.where(norm > 0, norm, 1.0)
+    blended_runs = np.where(met[..., None], conditional / norm * (1 - blended_wicket)[..., None], run_probs)
+    return blended_wicket, blended_runs
+
+def head_to_head_counts(fmt, batter_ids, bowler_ids):
+    """(balls, dismissals, runs) arrays for the pair grid from the head-to-head matrix, or None without one."""
+    index = load_head_to_head()
+    if index is None:
+        return None
+    shape = (len(batter_ids), len(bowler_ids))
+    balls = np.zeros(shape)
+    dismissals = np.zeros(shape)
+    runs = np.zeros(shape + (len(RUN_VALUES),))
+    for i, batter_id in enumerate(batter_ids):
+        if math.isnan(batter_id):
+            continue
+        for j, bowler_id in enumerate(bowler_ids):
+            record = None if math.isnan(bowler_id) else index.lookup(fmt, batter_id, bowler_id)
+            if record:
+                balls[i, j] = record['balls']
+                dismissals[i, j] = record['dismissals']
+                runs[i, j] = [record.get(col, 0) for col in RUN_COLUMNS]
+    return balls, dismissals, runs
+
+# --- Sampling and exact solving over many pairs ---
+def outcome_cdfs(p_wicket, run_probs):
+    """(pairs, 1 + len(RUN_VALUES)) outcome CDFs; outcome 0 is a wicket, then RUN_VALUES."""
+    probs = run_probs / run_probs.sum(axis=-1, keepdims=True)
+    pmf = np.concatenate([p_wicket[:, None], (1.0 - p_wicket)[:, None] * probs], axis=1)
+    cdf = np.cumsum(pmf, axis=1)
+    cdf[:, -1] = 1.0
+    return cdf
+
+def model_cdf(model):
+    """
+    A monte_carlo_duel ball model's outcome CDF on the outcome_cdfs grid. Outcomes the model lacks get
+    zero mass, i.e. repeat the previous step, so a uniform resolves to the same outcome as with
+    monte_carlo_duel.outcome_table.
+    """
+    run_values, cdf = mcd.outcome_table(model)
+    if not set(run_values[1:].tolist()) <= set(RUN_VALUES):
+        raise ValueError(f"Run values {run_values[1:].tolist()} are not on the grid {RUN_VALUES}")
+    steps = np.searchsorted(run_values[1:], RUN_VALUES, side='right')
+    return np.concatenate([cdf[:1], cdf[steps]])
+
+def pair_uniforms(rng, pairs, balls, trials, sampling="iid", crn=False):
+    """
+    The uniforms sample_pairs resolves, as (start, stop, planes) chunks of pairs; planes is
+    ball-major, (balls, stop - start, trials), or (balls, 1, trials) shared by every pair with crn.
+    """
+    shared = mcd.sample_uniforms(rng, trials, balls, sampling).T[:, None, :] if crn else None
+    chunk = max(1, mcd.SAMPLE_CHUNK_CELLS // max(1, trials * balls))
+    for start in range(0, pairs, chunk):
+        stop = min(pairs, start + chunk)
+        if shared is not None:
+            yield start, stop, shared
+        elif sampling == "iid":
+            yield start, stop, rng.random((balls, stop - start, trials))
+        else:
+            yield start, stop, np.stack([mcd.sample_uniforms(rng, trials, balls, sampling).T for _ in range(start, stop)],
+                                        axis=1)
+
+def play_pairs(cdf, planes):
+    """
+    Resolves ball-major uniforms against each pair's outcome CDF (see outcome_cdfs); a pair's
+    results depend only on its own CDF row and uniforms. Returns (total_runs, dismissed) shaped (pairs, trials).
+    """
+    run_values = np.array([0] + RUN_VALUES, dtype=np.int8)
+    shape = (len(cdf), planes.shape[2])
+    thresholds = [cdf[:, k, None] for k in range(cdf.shape[1] - 1)]  # the last is always 1
+    total_runs = np.zeros(shape, dtype=np.int64)
+    alive = np.ones(shape, dtype=bool)
+    # ball-major so each step works on contiguous (pairs x trials) planes
+    for uniforms in planes:
+        idx = np.zeros(shape, dtype=np.int8)
+        for threshold in thresholds:
+            idx += uniforms >= threshold
+        scored = run_values.take(idx)
+        scored *= alive
+        total_runs += scored
+        alive &= idx != 0
+    return total_runs, ~alive
+
+def sample_pairs(cdf, balls, trials, rng, sampling="iid", crn=False):
+    """
+    Monte Carlo duels for every pair; returns (total_runs, dismissed) shaped (pairs, trials).
+    sampling is a monte_carlo_duel.SAMPLING_MODES scheme; crn=True gives every pair the same
+    uniforms (common random numbers), so differences between pairs carry far less noise.
+    """
+    total_runs = np.zeros((len(cdf), trials), dtype=np.int64)
+    dismissed = np.zeros((len(cdf), trials), dtype=bool)
+    for start, stop, planes in pair_uniforms(rng, len(cdf), balls, trials, sampling, crn):
+        total_runs[start:stop], dismissed[start:stop] = play_pairs(cdf[start:stop], planes)
+    return total_runs, dismissed
+
+def summarize_pairs(total_runs, dismissed, balls):
+    """Per-pair summary dicts matching monte_carlo_duel.summarize_trials."""
+    dismissal = dismissed.mean(axis=1)
+    expected = total_runs.mean(axis=1)
+    p10, p50, p90 = np.percentile(total_runs, [10, 50, 90], axis=1)
+    return [{
+        'trials': int(total_runs.shape[1]),
+        'balls': balls,
+        'survival_probability': 1.0 - float(dismissal[i]),
+        'expected_runs': float(expected[i]),
+        'dismissal_probability': float(dismissal[i]),
+        'runs_p50': float(p50[i]),
+        'runs_p10': float(p10[i]),
+        'runs_p90': float(p90[i])
+    } for i in range(len(total_runs))]
+
+def runs_distributions(cdf, balls):
+    """
+    monte_carlo_duel.duel_runs_distribution for every pair at once: (survived, dismissed) arrays
+    shaped (pairs, max runs + 1), the probability of each runs total with the batter not out / out.
+    """
+    pmf = np.diff(cdf, axis=1, prepend=0.0)
+    max_runs = max(RUN_VALUES) * balls
+    survived = np.zeros((len(cdf), max_runs + 1))
+    survived[:, 0] = 1.0
+    dismissed = np.zeros_like(survived)
+    for _ in range(balls):
+        dismissed += pmf[:, :1] * survived
+        after = np.zeros_like(survived)
+        for k, r in enumerate(RUN_VALUES, start=1):
+            after[:, r:] += pmf[:, k:k + 1] * survived[:, :max_runs + 1 - r]
+        survived = after
+    return survived, dismissed
+
+def solve_pairs(cdf, balls):
+    """Exact duels for every pair: monte_carlo_duel.solve_duel_exact's summaries off runs_distributions."""
+    survived, dismissed = runs_distributions(cdf, balls)
+    results = []
+    for survived_row, dismissed_row in zip(survived, dismissed):
+        pmf_row = survived_row + dismissed_row
+        dismissal_prob = float(dismissed_row.sum())
+        results.append({
+            'trials': None,
+            'balls': balls,
+            'survival_probability': 1.0 - dismissal_prob,
+            'expected_runs': float(np.dot(np.arange(len(pmf_row)), pmf_row)),
+            'dismissal_probability': dismissal_prob,
+            'runs_p50': mcd.distribution_percentile(pmf_row, 50),
+            'runs_p10': mcd.distribution_percentile(pmf_row, 10),
+            'runs_p90': mcd.distribution_percentile(pmf_row, 90)
+        })
+    return results
+
+def sample_distributions(cdf, balls, trials, rng):
+    """
+    iid Monte Carlo duels without simulating balls: each trial's (runs, out) outcome follows the
+    pair's exact distribution (runs_distributions), so `trials` duels are one multinomial draw over
+    those outcomes. Same law as sample_pairs with iid sampling, at a cost that doesn't grow with trials.
+    trials may differ per pair. Returns (runs histograms shaped (pairs, max runs + 1), dismissals per pair).
+    """
+    survived, dismissed = runs_distributions(cdf, balls)
+    pvals = np.concatenate([survived, dismissed], axis=1)
+    pvals /= pvals.sum(axis=1, keepdims=True)
+    counts = rng.multinomial(np.asarray(trials, dtype=np.int64), pvals)
+    width = survived.shape[1]
+    return counts[:, :width] + counts[:, width:], counts[:, width:].sum(axis=1)
+
+def summarize_histograms(histograms, dismissals, balls):
+    """Per-pair summary dicts matching monte_carlo_duel.summarize_trials, from runs histograms."""
+    results = []
+    for hist, out in zip(histograms, dismissals):
+        trials = int(hist.sum())
+        dismissal_prob = int(out) / trials
+        results.append({
+            'trials': trials,
+            'balls': balls,
+            'survival_probability': 1.0 - dismissal_prob,
+            'expected_runs': histogram_mean(hist),
+            'dismissal_probability': dismissal_prob,
+            'runs_p50': histogram_percentile(hist, 50),
+            'runs_p10': histogram_percentile(hist, 10),
+            'runs_p90': histogram_percentile(hist, 90)
+        })
+    return results
+
+# --- Entry point ---
+def plan_duels(df, batters=None, bowlers=None, pairs=None, fmt="ODI", use_h2h=True):
+    """
+    Looks the players up and builds every pair's ball model. Returns {'batters', 'bowlers', 'matrix',
+    'cells': [(i, j)], 'found': (batter mask, bowler mask), 'cdf'}, with the CDFs in cell order
+    (row-major over batters x bowlers for a matrix, else the order of pairs).
+    """
+    matrix = pairs is None
+    if not matrix:
+        pairs = [tuple(pair) for pair in pairs]
+        batters = list(dict.fromkeys(p[0] for p in pairs))
+        bowlers = list(dict.fromkeys(p[1] for p in pairs))
+    if not batters or not bowlers:
+        raise ValueError("Provide batters and bowlers, or pairs")
+
+    bat = player_arrays(df, batters, fmt)
+    bowl = player_arrays(df, bowlers, fmt)
+    h2h = head_to_head_counts(fmt, bat[1]['player_id'], bowl[1]['player_id']) if use_h2h else None
+    p_wicket, run_probs = build_ball_models(bat, bowl, baselines_for(df, fmt), h2h)
+
+    if matrix:
+        cells = [(i, j) for i in range(len(batters)) for j in range(len(bowlers))]
+    else:
+        bat_pos = {name: i for i, name in enumerate(batters)}
+        bowl_pos = {name: j for j, name in enumerate(bowlers)}
+        cells = [(bat_pos[b], bowl_pos[w]) for b, w in pairs]
+    rows, cols = np.array(cells).T
+    return {
+        'batters': batters, 'bowlers': bowlers, 'matrix': matrix, 'cells': cells, 'found': (bat[0], bowl[0]),
+        'cdf': outcome_cdfs(p_wicket[rows, cols], run_probs[rows, cols]),
+    }
+
+def duel_results(plan, summaries, fmt, balls, mode):
+    """simulate_duels' result from a plan_duels plan and one summary per cell."""
+    batters, bowlers = plan['batters'], plan['bowlers']
+    bat_found, bowl_found = plan['found']
+    for (i, j), summary in zip(plan['cells'], summaries):
+        summary.update({
+            'batsman': batters[i], 'bowler': bowlers[j],
+            'batsman_found': bool(bat_found[i]), 'bowler_found': bool(bowl_found[j]),
+        })
+    if plan['matrix']:
+        summaries = [summaries[i * len(bowlers):(i + 1) * len(bowlers)] for i in range(len(batters))]
+    return {
+        'format': str(fmt).upper(),
+        'balls': balls,
+        'mode': mode,
+        'batters': batters,
+        'bowlers': bowlers,
+        'results': summaries,
+    }
+
+def simulate_duels(df, batters=None, bowlers=None, pairs=None, fmt="ODI", balls=6, trials=10000,
+                   rng_seed=None, mode="mc", use_h2h=True, sampling="iid", crn=False):
+    """
+    Duel results for every batter x bowler (results[i][j]) or for each explicit (batter, bowler)
+    pair (results[k]). Each result is the simulate_duel / solve_duel_exact summary plus the names
+    and whether each player was found. sampling / crn select variance reduction (see sample_pairs).
+    """
+    plan = plan_duels(df, batters, bowlers, pairs, fmt, use_h2h)
+    if mode == "exact":
+        summaries = solve_pairs(plan['cdf'], balls)
+    else:
+        rng = rng_seed if isinstance(rng_seed, np.random.Generator) else np.random.default_rng(rng_seed)
+        summaries = summarize_pairs(*sample_pairs(plan['cdf'], balls, trials, rng, sampling, crn), balls)
+    return duel_results(plan, summaries, fmt, balls, mode)
+
+def batch_params(request):
+    """simulate_duels keyword arguments (all but df) for a parsed JSON batch request."""
+    return {
+        'batters': request.get('batters'), 'bowlers': request.get('bowlers'), 'pairs': request.get('pairs'),
+        'fmt': request.get('format', 'ODI'), 'balls': int(request.get('balls', 6)),
+        'trials': int(request.get('trials', 10000)), 'rng_seed': request.get('seed'),
+        'mode': request.get('mode', 'mc'), 'use_h2h': request.get('h2h', True),
+        'sampling': request.get('sampling', 'iid'), 'crn': bool(request.get('crn', False)),
+    }
+
+def run_batch(request, df=None):
+    """simulate_duels for a parsed JSON batch request (see the module docstring)."""
+    form = request.get('form')
+    if df is None or (form and df.attrs.get('form', 'career') != form):
+        df = mcd.load_features(form=form)
+    return simulate_duels(df, **batch_params(request))
@@ -1,23 +1,157 @@
 import os
 import json
+import argparse
+import hashlib
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
+
+from clean_players import clean_names
+from incremental import read_json, write_json, new_delta, drop_matches
+from instrumentation import add_arguments, configure_from_args, count, instrumented, profiled, stage
+from table_io import BALL_COLUMNS, ball_table_writer, data_dir, read_table, write_table, append_table, table_exists
 
 # Define dataset folders
 import os
-BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
+BASE_PATH = data_dir()
 FORMATS = {
     "ODI": "odis_json",
     "T20": "t20s_json",
     "TEST": "tests_json"
 }
 
-# Storage lists
+# Incremental extraction bookkeeping
+MANIFEST_FILE = os.path.join(BASE_PATH, "extract_manifest.json")
+DELTA_FILE = os.path.join(BASE_PATH, "extract_delta.json")
+# The rows an incremental run added to matches.csv, alongside balls_delta (recent_form dates its innings from it)
+MATCHES_DELTA_FILE = os.path.join(BASE_PATH, "matches_delta.csv")
+
+PLAYER_COLUMNS = ["batter", "bowler", "non_striker", "player_out"]
+# Bumped when the stored form of player names changes; an older balls table forces a full extraction
+NAMES_VERSION = 1
+
+# Files handed to a pool worker at a time
+SHARD_SIZE = 32
+# Deliveries buffered before a chunk is flushed to the balls table
+FLUSH_ROWS = 250_000
+
+# array typecode per non-string column; every other column is a dictionary-encoded string
+DELIVERY_TYPECODES = {
+    "inning": "h", "over": "h", "ball": "d",
+    "runs_batter": "h", "runs_extras": "h", "runs_total": "h", "is_wicket": "b",
+}
+NUMPY_TYPES = {"h": np.int16, "b": np.int8, "i": np.int32, "d": np.float64}
+
+class DeliveryBuffer:
+    """
+    Array-backed column buffer for deliveries.
+
+    String columns are dictionary-encoded as rows arrive (an int32 code per row, -1 for None) and
+    numeric columns live in typed arrays, so a buffered delivery costs a few dozen bytes instead of
+    a 15-key dict. A missing number is stored as 0 and its row recorded in the column's null list;
+    such a column comes out of to_frame as float64 with NaN, as a frame built from the rows would.
+    Buffers are picklable, so pool workers return them directly.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.dictionaries = {c: {} for c in BALL_COLUMNS if c not in DELIVERY_TYPECODES}
+        self.arrays = {c: array(DELIVERY_TYPECODES.get(c, "i")) for c in BALL_COLUMNS}
+        self.nulls = {c: array("q") for c in DELIVERY_TYPECODES}
+
+    def __len__(self):
+        return len(self.arrays["inning"])
+
+    def append(self, row):
+        """Appends one delivery given as a tuple in BALL_COLUMNS order."""
+        for col, value in zip(BALL_COLUMNS, row):
+            codes = self.dictionaries.get(col)
+            if codes is None:
+                if value is None:
+                    self.nulls[col].append(len(self.arrays[col]))
+                    value = 0
+                self.arrays[col].append(value)
+            elif value is None:
+                self.arrays[col].append(-1)
+            else:
+                code = codes.get(value)
+                if code is None:
+                    code = codes[value] = len(codes)
+                self.arrays[col].append(code)
+
+    def truncate(self, rows):
+        """Drops rows past `rows` (used to roll back a file that failed mid-parse)."""
+        for values in self.arrays.values():
+            del values[rows:]
+        for rows_missing in self.nulls.values():
+            while rows_missing and rows_missing[-1] >= rows:
+                rows_missing.pop()
+
+    def extend(self, other):
+        """Appends another buffer's rows, re-mapping its dictionary codes onto ours."""
+        offset = len(self)
+        for col, rows_missing in self.nulls.items():
+            rows_missing.extend(row + offset for row in other.nulls[col])
+        for col, values in self.arrays.items():
+            codes = self.dictionaries.get(col)
+            if codes is None:
+                values.extend(other.arrays[col])
+                continue
+            translate = np.empty(len(other.dictionaries[col]) + 1, dtype=np.int32)
+            translate[-1] = -1
+            for value, code in other.dictionaries[col].items():
+                mapped = codes.get(value)
+                if mapped is None:
+                    mapped = codes[value] = len(codes)
+                translate[code] = mapped
+            other_codes = np.frombuffer(other.arrays[col], dtype=np.int32)
+            values.frombytes(translate[other_codes].tobytes())
+
+    def to_frame(self):
+        """The buffered rows as a balls frame, with player names in their clean form."""
+        columns = {}
+        for col, values in self.arrays.items():
+            data = np.array(values, dtype=NUMPY_TYPES[values.typecode])
+            codes = self.dictionaries.get(col)
+            if codes is None:
+                if self.nulls[col]:
+                    data = data.astype(np.float64)
+                    data[np.frombuffer(self.nulls[col], dtype=np.int64)] = np.nan
+                columns[col] = data
+            elif col in PLAYER_COLUMNS:
+                columns[col] = canonical_categorical(data, list(codes))
+            else:
+                columns[col] = pd.Categorical.from_codes(data, categories=pd.Index(list(codes), dtype=object))
+        return pd.DataFrame(columns, columns=BALL_COLUMNS)
+
+def canonical_categorical(codes, raw_names):
+    """
+    Categorical of clean names from dictionary codes into raw_names. Names are cleaned once per
+    distinct raw name, and raw spellings of the same player collapse onto one category.
+    """
+    if not raw_names:
+        return pd.Categorical.from_codes(codes, categories=pd.Index([], dtype=object))
+    categories, inverse = np.unique(clean_names(raw_names).to_numpy(dtype=object), return_inverse=True)
+    return pd.Categorical.from_codes(np.where(codes >= 0, inverse[codes], -1),
+                                     categories=pd.Index(categories, dtype=object))
+
+# Storage
 matches_list = []
-balls_list = []
+balls_buffer = DeliveryBuffer()
 players_set = set()
 
-def extract_match_data(file_path, match_format):
-    """Extracts match-level and ball-by-ball data from a single Cricsheet JSON file."""
+def parse_match_file(file_path, match_format, delivery_buffer):
+    """
+    Parses a single Cricsheet JSON file, appending its deliveries to `delivery_buffer`.
+    Returns (match_record, players).
+    """
+    players = set()
+
     with open(file_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
@@ -41,8 +175,6 @@ def extract_match_data(file_path, match_format):
         "win_by_runs": info.get("outcome", {}).get("by", {}).get("runs", None),
         "win_by_wickets": info.get("outcome", {}).get("by", {}).get("wickets", None)
     }
-    matches_list.append(match_record)
-
     # Extract ball-by-ball data
     innings = data.get("innings", [])
     for inning_index, inning_details in enumerate(innings, start=1):
@@ -59,9 +191,9 @@ def extract_match_data(file_path, match_format):
                 non_striker = delivery.get("non_striker")
 
                 # Add players to master set
-                players_set.add(batter)
-                players_set.add(bowler)
-                players_set.add(non_striker)
+                players.add(batter)
+                players.add(bowler)
+                players.add(non_striker)
 
                 # Runs
                 runs = delivery.get("runs", {})
@@ -77,28 +209,38 @@ def extract_match_data(file_path, match_format):
                 if is_wicket:
                     wicket_kind = wicket_info[0].get("kind", None)
                     player_out = wicket_info[0].get("player_out", None)
-                    players_set.add(player_out)
-
-                balls_list.append({
-                    "match_id": match_id,
-                    "format": match_format,
-                    "inning": inning_index,
-                    "batting_team": batting_team,
-                    "over": over_number,
-                    "ball": delivery.get("ball", None),
-                    "batter": batter,
-                    "bowler": bowler,
-                    "non_striker": non_striker,
-                    "runs_batter": runs_batter,
-                    "runs_extras": runs_extras,
-                    "runs_total": runs_total,
-                    "is_wicket": is_wicket,
-                    "wicket_kind": wicket_kind,
-                    "player_out": player_out
-                })
-
-def process_all_matches():
-    """Process all formats and generate matches.csv, balls.csv, players.csv."""
+                    players.add(player_out)
+
+                # Same order as BALL_COLUMNS
+                delivery_buffer.append((
+                    match_id,
+                    match_format,
+                    inning_index,
+                    batting_team,
+                    over_number,
+                    delivery.get("ball", None),
+                    batter,
+                    bowler,
+                    non_striker,
+                    runs_batter,
+                    runs_extras,
+                    runs_total,
+                    is_wicket,
+                    wicket_kind,
+                    player_out
+                ))
+
+    return match_record, players
+
+def extract_match_data(file_path, match_format):
+    """Extracts match-level and ball-by-ball data from a single Cricsheet JSON file."""
+    match_record, players = parse_match_file(file_path, match_format, balls_buffer)
+    matches_list.append(match_record)
+    players_set.update(players)
+
+def list_match_files():
+    """Returns [(file_path, match_format)] for every match file, in a fixed format/filename order."""
+    tasks = []
     for match_format, folder in FORMATS.items():
         folder_path = os.path.join(BASE_PATH, folder)
 
@@ -106,33 +248,304 @@ def process_all_matches():
             print(f"⚠️ Folder not found: {folder_path}")
             continue
 
-        print(f"📂 Processing {match_format} matches...")
-        for filename in os.listdir(folder_path):
-            if filename.endswith(".json"):
-                file_path = os.path.join(folder_path, filename)
-                try:
-                    extract_match_data(file_path, match_format)
-                except Exception as e:
-                    print(f"❌ Error processing {filename}: {e}")
+        filenames = sorted(f for f in os.listdir(folder_path) if f.endswith(".json"))
+        print(f"📂 Processing {match_format} matches ({len(filenames)} files)...")
+        tasks.extend((os.path.join(folder_path, f), match_format) for f in filenames)
+    return tasks
+
+def file_fingerprint(file_path, match_format, digest=True):
+    """Manifest entry for a match file: size, mtime and (optionally) sha256 of its contents."""
+    stat = os.stat(file_path)
+    entry = {
+        "format": match_format,
+        "match_id": os.path.splitext(os.path.basename(file_path))[0],
+        "size": stat.st_size,
+        "mtime": stat.st_mtime,
+    }
+    if digest:
+        sha = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        entry["sha256"] = sha.hexdigest()
+    return entry
+
+def manifest_key(file_path):
+    return os.path.relpath(file_path, BASE_PATH).replace(os.sep, "/")
+
+def plan_incremental(tasks, manifest):
+    """
+    Compares the current files against the manifest.
+    Returns (to_parse, kept_entries, removed_keys) where removed_keys are the
+    (format, match_id) pairs whose existing rows must be dropped.
+    """
+    to_parse = []
+    kept = {}
+    removed = set()
+    seen = set()
+    for file_path, match_format in tasks:
+        key = manifest_key(file_path)
+        seen.add(key)
+        old = manifest.get(key)
+        if old is None:
+            to_parse.append((file_path, match_format))
+            continue
+        entry = file_fingerprint(file_path, match_format, digest=False)
+        if entry["size"] == old["size"] and entry["mtime"] == old["mtime"]:
+            kept[key] = old
+            continue
+        entry = file_fingerprint(file_path, match_format)
+        if entry["sha256"] == old["sha256"]:
+            # touched but identical: just refresh the stat fields
+            kept[key] = entry
+            continue
+        to_parse.append((file_path, match_format))
+        removed.add((old["format"], old["match_id"]))
+    for key, old in manifest.items():
+        if key not in seen:
+            removed.add((old["format"], old["match_id"]))
+    return to_parse, kept, removed
+
+def parse_shard(tasks):
+    """
+    Pool worker: parses a shard of files into a local delivery buffer.
+    Returns (deliveries, [(file_path, match_format, parsed, fingerprint, rows, error)]) with files in
+    input order; error is set when parsing failed, and that file's deliveries are rolled back.
+    """
+    deliveries = DeliveryBuffer()
+    results = []
+    for file_path, match_format in tasks:
+        mark = len(deliveries)
+        try:
+            parsed = parse_match_file(file_path, match_format, deliveries)
+            fingerprint = file_fingerprint(file_path, match_format)
+            results.append((file_path, match_format, parsed, fingerprint, len(deliveries) - mark, None))
+        except Exception as e:
+            deliveries.truncate(mark)
+            results.append((file_path, match_format, None, None, 0, str(e)))
+    return deliveries, results
+
+def merge_results(shard, manifest, writer):
+    """
+    Appends one shard's parsed files to module state, records them in the manifest and reports
+    per-file errors. Failed files stay out of the manifest so the next run retries them.
+    Buffered deliveries are flushed to `writer` once FLUSH_ROWS is reached.
+    """
+    deliveries, results = shard
+    for file_path, match_format, parsed, fingerprint, rows, error in results:
+        if error is not None:
+            print(f"❌ Error processing {os.path.basename(file_path)}: {error}")
+            count("errors", format=match_format)
+            continue
+        count("files", format=match_format)
+        count("rows", rows, format=match_format)
+        match_record, players = parsed
+        matches_list.append(match_record)
+        players_set.update(players)
+        manifest[manifest_key(file_path)] = fingerprint
+    balls_buffer.extend(deliveries)
+    if len(balls_buffer) >= FLUSH_ROWS:
+        flush_deliveries(writer)
+
+def flush_deliveries(writer):
+    if len(balls_buffer):
+        writer.write(balls_buffer.to_frame())
+        balls_buffer.clear()
+
+def bounded_map(pool, fn, items, window):
+    """Like pool.map, in order, but with at most `window` tasks in flight so results can't pile up."""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+def parse_files(tasks, manifest, writer, workers=1):
+    """
+    Parses tasks into module state and streams their deliveries into `writer` in bounded chunks,
+    sharded across a process pool when workers > 1.
+    """
+    shards = [tasks[i:i + SHARD_SIZE] for i in range(0, len(tasks), SHARD_SIZE)]
+
+    if workers > 1 and len(shards) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for shard in bounded_map(pool, parse_shard, shards, window=2 * workers):
+                merge_results(shard, manifest, writer)
+    else:
+        for shard in shards:
+            merge_results(parse_shard(shard), manifest, writer)
+    flush_deliveries(writer)
+
+def parse_by_format(tasks, manifest, writer, workers=1):
+    """parse_files one format at a time, so each format gets its own timed stage."""
+    with profiled("parse"):
+        for match_format in FORMATS:
+            group = [task for task in tasks if task[1] == match_format]
+            if group:
+                with stage("parse", format=match_format):
+                    parse_files(group, manifest, writer, workers=workers)
+
+class FrameCollector:
+    """Stands in for a TableWriter and keeps the flushed chunks in memory (see extract_frames)."""
+
+    def __init__(self):
+        self.frames = []
+        self.rows = 0
+
+    def write(self, df):
+        self.frames.append(df)
+        self.rows += len(df)
 
-    # Convert to DataFrames
-    matches_df = pd.DataFrame(matches_list)
-    balls_df = pd.DataFrame(balls_list)
-    players_df = pd.DataFrame(sorted(list(players_set)), columns=["player_name"])
+    def frame(self):
+        """The chunks as one balls frame; categorical columns are unioned rather than decoded."""
+        if not self.frames:
+            return DeliveryBuffer().to_frame()
+        columns = {}
+        for col in BALL_COLUMNS:
+            parts = [df[col] for df in self.frames]
+            if isinstance(parts[0].dtype, pd.CategoricalDtype):
+                columns[col] = union_categoricals(parts)
+            else:
+                columns[col] = np.concatenate([part.to_numpy() for part in parts])
+        return pd.DataFrame(columns, columns=BALL_COLUMNS)
+
+def extract_frames(tasks, workers=1):
+    """
+    Parses tasks without writing anything, for pipeline.py.
+    Returns (matches_df, balls_df, players_df, manifest).
+    """
+    matches_list.clear()
+    players_set.clear()
+    balls_buffer.clear()
+    manifest = {}
+    collector = FrameCollector()
+    parse_by_format(tasks, manifest, collector, workers=workers)
+    players_df = pd.DataFrame(sorted(players_set), columns=["player_name"])
+    return pd.DataFrame(matches_list), collector.frame(), players_df, manifest
+
+def manifest_payload(manifest):
+    return {"files": manifest, "names_version": NAMES_VERSION}
+
+def merged_players(players_path):
+    """
+    players.csv's raw names plus those parsed in this run. The balls table only holds clean names,
+    so names of replaced or removed matches stay listed until the next full extraction.
+    """
+    players = set(pd.read_csv(players_path)["player_name"].dropna()) | players_set
+    return pd.DataFrame(sorted(players), columns=["player_name"])
+
+@instrumented("extract_cricsheet")
+def process_all_matches(workers=1, incremental=False):
+    """
+    Process all formats and generate matches.csv, the balls table (see table_io) and players.csv.
+
+    With workers > 1 the files are parsed in shards across a process pool; shards are merged
+    in file order so the output is identical for any worker count. Deliveries are streamed to
+    disk in chunks of FLUSH_ROWS, so memory stays flat as the corpus grows.
+
+    Player names go into the balls table already cleaned (see canonical_categorical), so there is
+    no separate clean_balls copy; players.csv keeps the raw spellings for player_mapping.csv.
+
+    With incremental=True only files that are new or changed since the last run (per the
+    manifest) are parsed; their rows are appended or replaced in the existing tables and a delta
+    description is written for clean_players.py --incremental.
+    """
+    with stage("list_files"):
+        tasks = list_match_files()
 
     # Ensure BASE_PATH exists before saving CSVs
     if not os.path.exists(BASE_PATH):
         os.makedirs(BASE_PATH)
 
-    # Save to CSV files
-    matches_df.to_csv(os.path.join(BASE_PATH, "matches.csv"), index=False)
-    balls_df.to_csv(os.path.join(BASE_PATH, "balls.csv"), index=False)
-    players_df.to_csv(os.path.join(BASE_PATH, "players.csv"), index=False)
+    matches_path = os.path.join(BASE_PATH, "matches.csv")
+    players_path = os.path.join(BASE_PATH, "players.csv")
+    previous = read_json(MANIFEST_FILE)
+    previous_delta = read_json(DELTA_FILE)
+
+    outputs_exist = os.path.exists(matches_path) and os.path.exists(players_path) and table_exists("balls", BASE_PATH)
+    if incremental and (previous is None or not outputs_exist):
+        print("⚠️ No manifest or previous outputs found; running a full extraction.")
+        incremental = False
+    elif incremental and previous.get("names_version") != NAMES_VERSION:
+        print("⚠️ The balls table predates clean player names; running a full extraction.")
+        incremental = False
+
+    if not incremental:
+        manifest = {}
+        with ball_table_writer("balls", BASE_PATH) as writer:
+            parse_by_format(tasks, manifest, writer, workers=workers)
+        balls_rows = writer.rows
+
+        with stage("write_outputs"):
+            # Convert to DataFrames
+            matches_df = pd.DataFrame(matches_list)
+            players_df = pd.DataFrame(sorted(list(players_set)), columns=["player_name"])
+
+            # Save to CSV files
+            matches_df.to_csv(matches_path, index=False)
+            players_df.to_csv(players_path, index=False)
+        delta = new_delta(full_rebuild=True)
+    else:
+        to_parse, manifest, removed = plan_incremental(tasks, previous["files"])
+        print(f"🔹 Incremental run: {len(to_parse)} new/changed files, {len(removed)} matches to replace or remove")
+        if not to_parse and not removed:
+            write_json(MANIFEST_FILE, manifest_payload(manifest))
+            print("\n✅ Nothing new to extract; outputs are up to date.")
+            return
+        with ball_table_writer("balls_delta", BASE_PATH) as writer:
+            parse_by_format(to_parse, manifest, writer, workers=workers)
+
+        new_matches_df = pd.DataFrame(matches_list)
+        new_matches_df.to_csv(MATCHES_DELTA_FILE, index=False)
+        new_balls_df = read_table("balls_delta", base_path=BASE_PATH)
+        appended = set(zip(new_matches_df["format"], new_matches_df["match_id"])) if len(new_matches_df) else set()
+
+        if removed:
+            # Replaced or deleted matches: rewrite the tables without their old rows
+            matches_df = drop_matches(pd.read_csv(matches_path, dtype={"match_id": str}), removed)
+            balls_df = drop_matches(read_table("balls", base_path=BASE_PATH), removed)
+            matches_df = pd.concat([matches_df, new_matches_df], ignore_index=True)
+            balls_df = pd.concat([balls_df, new_balls_df], ignore_index=True)
+            matches_df.to_csv(matches_path, index=False)
+            write_table(balls_df, "balls", BASE_PATH)
+            balls_rows = len(balls_df)
+        else:
+            # Pure additions: append rows without re-reading the existing tables
+            if len(new_matches_df):
+                new_matches_df.to_csv(matches_path, mode="a", header=False, index=False)
+                append_table(new_balls_df, "balls", BASE_PATH)
+            matches_df = None
+            balls_rows = len(new_balls_df)
+        players_df = merged_players(players_path)
+        players_df.to_csv(players_path, index=False)
+
+        delta = new_delta(
+            previous_delta_id=previous_delta["delta_id"] if previous_delta else None,
+            appended=appended,
+            removed=removed,
+        )
+
+    write_json(MANIFEST_FILE, manifest_payload(manifest))
+    write_json(DELTA_FILE, delta)
 
     print("\n✅ Extraction Complete!")
-    print(f"Matches: {len(matches_df)} rows saved to matches.csv")
-    print(f"Balls: {len(balls_df)} rows saved to balls.csv")
+    if matches_df is not None:
+        print(f"Matches: {len(matches_df)} rows saved to matches.csv")
+        print(f"Balls: {balls_rows} rows saved to the balls table")
+    else:
+        print(f"Matches: {len(matches_list)} rows appended to matches.csv")
+        print(f"Balls: {balls_rows} rows appended to the balls table")
     print(f"Players: {len(players_df)} unique players saved to players.csv")
 
 if __name__ == "__main__":
-    process_all_matches()
+    parser = argparse.ArgumentParser(description="Extract Cricsheet JSON into matches/balls/players CSVs")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parallel parser processes (default 1, 0 = all CPUs)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only parse files that are new or changed since the last run")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    process_all_matches(workers=args.workers or os.cpu_count(), incremental=args.incremental)
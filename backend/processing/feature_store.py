@@ -0,0 +1,423 @@
+"""
+Binary, memory-mapped copy of player_features.csv.
+
+generate_player_features.py writes data/player_features.bin next to the CSV. Readers map it instead
+of parsing the CSV, so every worker process shares the same page-cache pages, opening it costs a
+header read, and rows are read in place. Layout (little-endian):
+
+  MAGIC (8 bytes) | layout version (uint32) | header length (uint32) | JSON header | padding
+  data section, every block 64-byte aligned:
+   - one fixed-width array per numeric column (rows in CSV order; 'format' as uint8 codes)
+   - per format, an int32 array indexed by player_id giving the row (-1 when absent)
+   - names table: uint64 offsets indexed by player_id into a UTF-8 blob
+   - head-to-head pairs: sorted int64 (format, batter_id, bowler_id) keys and one int64 array per count
+
+The header also carries the league baselines, so a duel can be answered from the store alone. It
+has a build_id (new on every write) and the size/mtime of the CSV and head-to-head table it was
+written from, so a reader can tell both that the store was rebuilt and whether it still matches
+them. Stores are replaced atomically; a process that has the old file mapped keeps reading it
+intact until it reopens.
+
+Reading needs neither pandas nor numpy (the arrays are memoryviews over an mmap), so one-shot
+processes can look players up and build a duel model without importing either; frame() converts
+to a DataFrame for the callers that want one.
+
+Usage:
+  python processing/feature_store.py build      # (re)write the store from player_features.csv
+  python processing/feature_store.py info
+"""
+
+import argparse
+import bisect
+import json
+import mmap
+import os
+import struct
+import sys
+
+from table_io import data_dir
+
+BASE_PATH = data_dir()
+FEATURES_FILE = os.path.join(BASE_PATH, "player_features.csv")
+STORE_NAME = "player_features.bin"
+STORE_FILE = os.path.join(BASE_PATH, STORE_NAME)
+
+MAGIC = b"CRKTFEAT"
+LAYOUT_VERSION = 2
+PREAMBLE = struct.Struct("<8sII")
+ALIGN = 64
+
+# Columns kept outside the fixed-width blocks: names live in the names table, formats as codes
+NAME_COLUMN = 'player_name'
+FORMAT_COLUMN = 'format'
+# Key of the baselines pooled over every format (league_baselines.ALL_FORMATS)
+ALL_FORMATS = "ALL"
+
+# numpy dtype strings written to the header -> memoryview type codes used to read them back
+TYPECODES = {'<f8': 'd', '<i8': 'q', '|u1': 'B', '<i4': 'i', '<u8': 'Q'}
+
+def aligned(n):
+    return -(-n // ALIGN) * ALIGN
+
+def source_version(path):
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def column_array(series):
+    """Fixed-width array for a numeric feature column: int64 when integral and complete, else float64."""
+    import numpy as np
+    import pandas as pd
+
+    if pd.api.types.is_integer_dtype(series.dtype) and not series.isna().any():
+        return series.to_numpy(dtype=np.int64)
+    if pd.api.types.is_bool_dtype(series.dtype):
+        return series.to_numpy(dtype=np.uint8)
+    return series.to_numpy(dtype=np.float64)
+
+def head_to_head_blocks(h2h, size):
+    """(header entry, blocks) for a head-to-head table: pairs sorted by their packed int64 key."""
+    import numpy as np
+    from head_to_head import DISMISSAL_PREFIX, count_columns
+
+    formats = sorted(h2h['format'].astype(str).str.upper().unique())
+    codes = h2h['format'].astype(str).str.upper().map({fmt: code for code, fmt in enumerate(formats)})
+    batter = h2h['batter_id'].to_numpy(dtype=np.int64)
+    bowler = h2h['bowler_id'].to_numpy(dtype=np.int64)
+    width = max([size] + [int(ids.max()) + 1 for ids in (batter, bowler) if len(ids)])
+    keys = (codes.to_numpy(dtype=np.int64) * width + batter) * width + bowler
+    order = np.argsort(keys, kind='stable')
+
+    entry = {'formats': formats, 'width': width, 'rows': len(h2h), 'keys': {}, 'columns': []}
+    blocks = [(entry['keys'], keys[order])]
+    for name in count_columns(h2h):
+        # zero dismissal kinds are left out of a pair's record, as in head_to_head.HeadToHead
+        entry['columns'].append({'name': name, 'optional': name.startswith(DISMISSAL_PREFIX)})
+        blocks.append((entry['columns'][-1], h2h[name].to_numpy(dtype=np.int64)[order]))
+    return entry, blocks
+
+def write_store(features_df, path=None, source_path=None, head_to_head=None, head_to_head_path=None):
+    """
+    Writes features_df (player_features.csv rows with player_id) as a store at path, with the
+    head_to_head table (saved at head_to_head_path) when given. Rows without a player_id can't be
+    indexed and are left out. Returns the path.
+    """
+    import uuid
+    from datetime import datetime, timezone
+
+    import numpy as np
+    import pandas as pd
+    from league_baselines import compute_baselines
+
+    path = path or STORE_FILE
+    df = features_df[features_df['player_id'].notna()].reset_index(drop=True)
+    if len(df) < len(features_df):
+        print(f"⚠️ {len(features_df) - len(df)} feature rows have no player_id; left out of the store")
+
+    player_ids = df['player_id'].to_numpy(dtype=np.int64)
+    formats = sorted(df[FORMAT_COLUMN].astype(str).unique())
+    format_codes = pd.Categorical(df[FORMAT_COLUMN].astype(str), categories=formats).codes.astype(np.uint8)
+    size = int(player_ids.max()) + 1 if len(df) else 0
+
+    blocks = []      # (header entry, array)
+    columns = []
+    for name in df.columns:
+        if name == NAME_COLUMN:
+            continue
+        values = format_codes if name == FORMAT_COLUMN else column_array(df[name])
+        columns.append({'name': name, 'dtype': values.dtype.str})
+        blocks.append((columns[-1], values))
+
+    index = {}
+    for code, fmt in enumerate(formats):
+        rows = np.full(size, -1, dtype=np.int32)
+        positions = np.flatnonzero(format_codes == code)
+        rows[player_ids[positions]] = positions
+        index[fmt] = {'length': size}
+        blocks.append((index[fmt], rows))
+
+    names = [''] * size
+    for player_id, name in zip(player_ids.tolist(), df[NAME_COLUMN].tolist()):
+        names[player_id] = name
+    encoded = [n.encode('utf-8') for n in names]
+    offsets = np.zeros(size + 1, dtype=np.uint64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    names_entry = {'count': size}
+    blob_entry = {'length': int(offsets[-1])}
+    blocks.append((names_entry, offsets))
+    blocks.append((blob_entry, np.frombuffer(b''.join(encoded), dtype=np.uint8)))
+
+    pairs = None
+    if head_to_head is not None:
+        pairs, pair_blocks = head_to_head_blocks(head_to_head, size)
+        pairs['source'] = source_version(head_to_head_path)
+        blocks.extend(pair_blocks)
+
+    offset = 0
+    for entry, values in blocks:
+        entry['offset'] = offset
+        offset = aligned(offset + values.nbytes)
+
+    header = {
+        'build_id': uuid.uuid4().hex,
+        'created': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'source': source_version(source_path),
+        'rows': len(df),
+        'column_order': list(df.columns),
+        'formats': formats,
+        'columns': columns,
+        'index': index,
+        'names': names_entry,
+        'names_blob': blob_entry,
+        'baselines': compute_baselines(features_df),
+        'head_to_head': pairs,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = aligned(PREAMBLE.size + len(header_bytes))
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(PREAMBLE.pack(MAGIC, LAYOUT_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for entry, values in blocks:
+            f.seek(data_start + entry['offset'])
+            f.write(np.ascontiguousarray(values).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    return path
+
+def read_header(path):
+    """(header dict, data section start) of a store, or None if the file isn't one of this layout."""
+    with open(path, "rb") as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) < PREAMBLE.size:
+            return None
+        magic, layout, length = PREAMBLE.unpack(preamble)
+        if magic != MAGIC or layout != LAYOUT_VERSION:
+            return None
+        header = json.loads(f.read(length))
+    return header, aligned(PREAMBLE.size + length)
+
+class FeatureStore:
+    """Read-only view of a store; every array is a memoryview onto the one memory map."""
+
+    def __init__(self, path):
+        parsed = read_header(path)
+        if parsed is None or sys.byteorder != 'little':
+            raise ValueError(f"{path} is not a player feature store (layout {LAYOUT_VERSION})")
+        self.path = path
+        self.header, start = parsed
+        self.build_id = self.header['build_id']
+        self.rows = self.header['rows']
+        self.formats = self.header['formats']
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        data = memoryview(self._map)
+
+        def view(entry, dtype, length):
+            code = TYPECODES[dtype]
+            begin = start + entry['offset']
+            return data[begin:begin + length * struct.calcsize(code)].cast(code)
+
+        self.dtypes = {c['name']: c['dtype'] for c in self.header['columns']}
+        self.columns = {name: view(c, c['dtype'], self.rows) for name, c in zip(self.dtypes, self.header['columns'])}
+        self.index = {fmt: view(entry, '<i4', entry['length']) for fmt, entry in self.header['index'].items()}
+        names = self.header['names']
+        self._name_offsets = view(names, '<u8', names['count'] + 1)
+        self._names_blob = view(self.header['names_blob'], '|u1', self.header['names_blob']['length'])
+        self._row_names = None
+
+        pairs = self.header['head_to_head']
+        self._pair_formats = {fmt: code for code, fmt in enumerate(pairs['formats'])} if pairs else {}
+        self._pair_keys = view(pairs['keys'], '<i8', pairs['rows']) if pairs else None
+        self._pair_columns = [(c['name'], c['optional'], view(c, '<i8', pairs['rows'])) for c in pairs['columns']] \
+            if pairs else []
+
+    def matches(self, source_path):
+        """True when the store was written from source_path as it is now."""
+        return self.header['source'] is not None and self.header['source'] == source_version(source_path)
+
+    def has_head_to_head(self, table_path):
+        """True when the stored pairs were written from the head-to-head table at table_path as it is now
+        (or there is neither)."""
+        pairs = self.header['head_to_head']
+        if pairs is None:
+            return source_version(table_path) is None
+        return pairs['source'] is not None and pairs['source'] == source_version(table_path)
+
+    def is_current(self):
+        """False once the file on disk has been rebuilt (or removed) since this store was opened."""
+        try:
+            parsed = read_header(self.path)
+        except OSError:
+            return False
+        return parsed is not None and parsed[0]['build_id'] == self.build_id
+
+    def name(self, player_id):
+        if not 0 <= player_id < len(self._name_offsets) - 1:
+            return None
+        start, stop = self._name_offsets[player_id], self._name_offsets[player_id + 1]
+        return self._names_blob[start:stop].tobytes().decode('utf-8') or None
+
+    def names(self, player_ids):
+        """Names for a sequence of player IDs, copying the blob out of the map once."""
+        blob = self._names_blob.tobytes()
+        offsets = self._name_offsets
+        return [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in player_ids]
+
+    def row_names(self):
+        """player_name of every row, in row order (decoded on first use)."""
+        if self._row_names is None:
+            self._row_names = self.names(self.columns['player_id'])
+        return self._row_names
+
+    def position(self, fmt, player_id):
+        """Row of (format, player_id), or None."""
+        rows = self.index.get(str(fmt).upper())
+        if rows is None or player_id is None or not 0 <= int(player_id) < len(rows):
+            return None
+        row = rows[int(player_id)]
+        return row if row >= 0 else None
+
+    def record(self, pos):
+        """The row at pos as a dict (same keys as player_features.csv)."""
+        record = {}
+        for name in self.header['column_order']:
+            if name == NAME_COLUMN:
+                record[name] = self.name(self.columns['player_id'][pos])
+            elif name == FORMAT_COLUMN:
+                record[name] = self.formats[self.columns[name][pos]]
+            else:
+                record[name] = self.columns[name][pos]
+        return record
+
+    def row(self, fmt, player_id):
+        """One player's feature row as a dict, or None."""
+        pos = self.position(fmt, player_id)
+        return None if pos is None else self.record(pos)
+
+    def format_rows(self, fmt):
+        """(position, player_name) of the rows in fmt, in row order."""
+        codes = [code for code, name in enumerate(self.formats) if name.upper() == str(fmt).upper()]
+        column = self.columns[FORMAT_COLUMN]
+        return [(pos, name) for pos, name in enumerate(self.row_names()) if column[pos] in codes]
+
+    def find_row(self, query, fmt):
+        """
+        Row dict for the exact (case-insensitive) name match in fmt, else the first partial match,
+        else None: the rules of player_registry.PlayerIndex.find, by one scan instead of an index.
+        """
+        q = query.lower()
+        partial = None
+        for pos, name in self.format_rows(fmt):
+            low = name.lower()
+            if low == q:
+                return self.record(pos)
+            if partial is None and q in low:
+                partial = pos
+        return None if partial is None else self.record(partial)
+
+    def suggest(self, prefix, fmt, limit=10):
+        """Distinct names in fmt with a word starting with prefix (player_registry.PlayerIndex.suggest)."""
+        p = prefix.lower().strip()
+        if not p:
+            return []
+        entries = sorted((token, pos, name) for pos, name in self.format_rows(fmt)
+                         for token in name.lower().split() if token.startswith(p))
+        names = []
+        for _, _, name in entries:
+            if name not in names:
+                names.append(name)
+                if len(names) == limit:
+                    break
+        return names
+
+    def baselines(self, fmt=None):
+        """League baselines for fmt (pooled when fmt is None or unknown), as league_baselines.baselines_for."""
+        baselines = self.header['baselines']
+        key = str(fmt).upper() if fmt is not None else ALL_FORMATS
+        return baselines.get(key) or baselines[ALL_FORMATS]
+
+    def head_to_head(self, fmt, batter_id, bowler_id):
+        """The pair's counts as a dict (as head_to_head.HeadToHead.lookup), or None if they never met."""
+        code = self._pair_formats.get(str(fmt).upper()) if fmt is not None else None
+        if code is None or batter_id is None or bowler_id is None:
+            return None
+        width = self.header['head_to_head']['width']
+        batter_id, bowler_id = int(batter_id), int(bowler_id)
+        if not (0 <= batter_id < width and 0 <= bowler_id < width):
+            return None
+        key = (code * width + batter_id) * width + bowler_id
+        row = bisect.bisect_left(self._pair_keys, key)
+        if row == len(self._pair_keys) or self._pair_keys[row] != key:
+            return None
+        return {name: values[row] for name, optional, values in self._pair_columns if values[row] or not optional}
+
+    def frame(self):
+        """
+        The features as a DataFrame laid out like player_features.csv. Numeric columns wrap the
+        mapped arrays without copying (they are read-only); names and formats are decoded.
+        """
+        import numpy as np
+        import pandas as pd
+
+        columns = {}
+        for name in self.header['column_order']:
+            if name == NAME_COLUMN:
+                columns[name] = pd.Series(self.row_names(), dtype="str")
+            elif name == FORMAT_COLUMN:
+                codes = np.frombuffer(self.columns[name], dtype=np.uint8)
+                columns[name] = pd.Series(np.array(self.formats, dtype=object)[codes], dtype="str")
+            else:
+                columns[name] = np.frombuffer(self.columns[name], dtype=np.dtype(self.dtypes[name]))
+        return pd.DataFrame(columns, copy=False)
+
+_cache = {}
+
+def open_store(path=None):
+    """
+    The FeatureStore at path (default data/player_features.bin), reopened only when the file has
+    been replaced. None if there is no readable store.
+    """
+    path = path or STORE_FILE
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    version = (stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    cached = _cache.get(path)
+    if cached is None or cached[0] != version:
+        try:
+            cached = (version, FeatureStore(path))
+        except ValueError as e:
+            print(f"⚠️ {e}", file=sys.stderr)
+            return None
+        _cache[path] = cached
+    return cached[1]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect the memory-mapped player feature store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Write the store from player_features.csv and the head-to-head table")
+    sub.add_parser("info", help="Print the store's header")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        import pandas as pd
+        from head_to_head import H2H_TABLE, load_table
+        from table_io import find_table
+
+        path = write_store(pd.read_csv(FEATURES_FILE), STORE_FILE, source_path=FEATURES_FILE,
+                           head_to_head=load_table(BASE_PATH), head_to_head_path=find_table(H2H_TABLE, BASE_PATH))
+        print(f"✅ Feature store saved to {path}")
+    else:
+        store = open_store()
+        if store is None:
+            raise SystemExit("❌ No feature store found. Run generate_player_features.py first.")
+        pairs = store.header['head_to_head']
+        print(f"build_id: {store.build_id}")
+        print(f"created: {store.header['created']}")
+        print(f"rows: {store.rows} ({', '.join(store.formats)})")
+        print(f"head-to-head pairs: {pairs['rows'] if pairs else 0}")
+        print(f"matches player_features.csv: {store.matches(FEATURES_FILE)}")
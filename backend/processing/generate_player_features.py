@@ -1,100 +1,190 @@
 import pandas as pd
 import numpy as np
 import os
+import argparse
+
+from head_to_head import H2H_TABLE, add_head_to_head, build_head_to_head, load_table, save_table
+from feature_store import STORE_FILE, write_store
+from incremental import read_json, write_json, can_apply
+from instrumentation import add_arguments, configure_from_args, count_formats, instrumented, profiled, stage
+from league_baselines import write_baselines
+from player_metrics import (BATTING_COUNTS, BOWLING_COUNTS, add_batting_metrics, add_bowling_metrics,
+                            ball_indicators, merge_features)
+from player_registry import update_registry
+import recent_form
+from table_io import data_dir, read_table, table_exists
 
 # Paths
-BASE_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data'))
-INPUT_FILE = os.path.join(BASE_PATH, "clean_balls.csv")
+BASE_PATH = data_dir()
+# extract_cricsheet stores clean player names, so features read its tables directly
+INPUT_TABLE = "balls"
 OUTPUT_FILE = os.path.join(BASE_PATH, "player_features.csv")
 
+# Incremental mode: consume clean_players' delta (its rows are extract_cricsheet's balls_delta)
+CLEAN_DELTA_FILE = os.path.join(BASE_PATH, "clean_delta.json")
+INPUT_DELTA_TABLE = "balls_delta"
+STATE_FILE = os.path.join(BASE_PATH, "features_state.json")
+
+# Only these columns of the balls table are loaded (match_id and inning date the innings for recent_form)
+REQUIRED_COLUMNS = ['match_id', 'format', 'inning', 'batter', 'bowler', 'runs_batter', 'runs_total', 'is_wicket',
+                    'wicket_kind', 'player_out']
+
 def generate_batting_features(df):
     """
     Generate batting features for each player by format.
     """
     print("📊 Generating batting metrics...")
+    if 'is_four' not in df.columns:
+        df = ball_indicators(df)
+
+    grouped = df.groupby(['format', 'batter'], observed=True)
+    batting = grouped[['runs_batter', 'is_four', 'is_six', 'is_dismissal']].sum()
+    batting.columns = ['runs_scored', 'fours', 'sixes', 'dismissals']
+    batting.insert(0, 'balls_faced', grouped.size())
+    batting = batting.reset_index()
+    batting[['format', 'batter']] = batting[['format', 'batter']].astype(object)
 
-    batting = df.groupby(['format', 'batter']).agg(
-        balls_faced=('batter', 'count'),
-        runs_scored=('runs_batter', 'sum'),
-        fours=('runs_batter', lambda x: (x == 4).sum()),
-        sixes=('runs_batter', lambda x: (x == 6).sum()),
-        dismissals=('player_out', lambda x: (x.notna()).sum())
-    ).reset_index()
-
-    # Derived Metrics
-    batting['strike_rate'] = (batting['runs_scored'] / batting['balls_faced']) * 100
-    batting['boundary_percent'] = ((batting['fours'] + batting['sixes']) / batting['balls_faced']) * 100
-    batting['batting_average'] = batting.apply(
-        lambda row: row['runs_scored'] / row['dismissals'] if row['dismissals'] > 0 else row['runs_scored'],
-        axis=1
-    )
-    batting['dismissal_probability'] = batting['dismissals'] / batting['balls_faced']
-
-    return batting
+    return add_batting_metrics(batting)
 
 def generate_bowling_features(df):
     """
     Generate bowling features for each player by format.
     """
     print("📊 Generating bowling metrics...")
+    if 'is_dot' not in df.columns:
+        df = ball_indicators(df)
 
-    bowling = df.groupby(['format', 'bowler']).agg(
-        balls_bowled=('bowler', 'count'),
-        runs_conceded=('runs_total', 'sum'),
-        wickets=('is_wicket', 'sum'),
-        dot_balls=('runs_total', lambda x: (x == 0).sum())
-    ).reset_index()
-
-    # Derived Metrics
-    bowling['overs_bowled'] = bowling['balls_bowled'] / 6
-    bowling['economy_rate'] = bowling.apply(
-        lambda row: row['runs_conceded'] / row['overs_bowled'] if row['overs_bowled'] > 0 else 0,
-        axis=1
-    )
-    bowling['wicket_probability'] = bowling['wickets'] / bowling['balls_bowled']
-    bowling['dot_ball_percent'] = (bowling['dot_balls'] / bowling['balls_bowled']) * 100
-
-    return bowling
-
-def main():
-    print("🚀 Generating player features...")
+    grouped = df.groupby(['format', 'bowler'], observed=True)
+    bowling = grouped[['runs_total', 'is_wicket', 'is_dot']].sum()
+    bowling.columns = ['runs_conceded', 'wickets', 'dot_balls']
+    bowling.insert(0, 'balls_bowled', grouped.size())
+    bowling = bowling.reset_index()
+    bowling[['format', 'bowler']] = bowling[['format', 'bowler']].astype(object)
 
-    # Load cleaned data
-    df = pd.read_csv(INPUT_FILE)
-    print(f"🔹 Loaded {len(df)} rows from {INPUT_FILE}")
+    return add_bowling_metrics(bowling)
 
-    # Ensure essential columns are present
-    required_columns = ['format', 'batter', 'bowler', 'runs_batter', 'runs_total', 'is_wicket', 'player_out']
-    for col in required_columns:
-        if col not in df.columns:
-            raise ValueError(f"Missing required column in clean_balls.csv: {col}")
+def add_counts(existing, delta, key, counts):
+    """Sums additive count columns of two tables keyed by ['format', key]."""
+    combined = pd.concat([existing[['format', key] + counts], delta[['format', key] + counts]])
+    return combined.groupby(['format', key], as_index=False)[counts].sum()
 
-    # Generate batting and bowling metrics
+def update_features(features_df, delta_df):
+    """
+    Folds new deliveries into existing features by summing their counts and
+    recomputing the derived metrics. Only valid for appended (not replaced) matches.
+    """
+    existing = features_df.rename(columns={'player_name': 'batter'})
+    batting = add_counts(existing[existing['balls_faced'] > 0], generate_batting_features(delta_df), 'batter', BATTING_COUNTS)
+    existing = features_df.rename(columns={'player_name': 'bowler'})
+    bowling = add_counts(existing[existing['balls_bowled'] > 0], generate_bowling_features(delta_df), 'bowler', BOWLING_COUNTS)
+    return merge_features(add_batting_metrics(batting), add_bowling_metrics(bowling))
+
+def compute_features(balls_df):
+    """Full (non-incremental) per-format player features from a balls table."""
+    # Indicator columns once, then batting and bowling metrics
+    df = ball_indicators(balls_df)
     batting_df = generate_batting_features(df)
     bowling_df = generate_bowling_features(df)
 
     # Merge both on player and format
-    features_df = pd.merge(
-        batting_df,
-        bowling_df,
-        left_on=['format', 'batter'],
-        right_on=['format', 'bowler'],
-        how='outer'
-    )
-
-    # Clean column names after merge
-    features_df = features_df.rename(columns={'batter': 'player_name'})
-    features_df.drop(columns=['bowler'], inplace=True)
-
-    # Fill NaNs with 0 for numerical fields
-    numeric_cols = features_df.select_dtypes(include=[np.number]).columns
-    features_df[numeric_cols] = features_df[numeric_cols].fillna(0)
+    return merge_features(batting_df, bowling_df)
+
+def add_player_ids(features_df, registry):
+    """Inserts the registry's player_id column next to player_name, in place."""
+    features_df.insert(2, 'player_id', features_df['player_name'].map(registry).astype('Int64'))
+    return features_df
+
+def load_balls(table):
+    """Loads the feature columns of a balls table, failing clearly if any are missing."""
+    try:
+        return read_table(table, columns=REQUIRED_COLUMNS, base_path=BASE_PATH)
+    except (KeyError, ValueError) as e:
+        # Ensure essential columns are present
+        raise ValueError(f"Missing required column in {table}: {e}") from e
+
+@instrumented("generate_player_features")
+def main(incremental=False):
+    print("🚀 Generating player features...")
+
+    clean_delta = read_json(CLEAN_DELTA_FILE)
+    state = read_json(STATE_FILE)
+    applied = state.get('source_delta_id') if state else None
+
+    if incremental and clean_delta is not None and applied == clean_delta['delta_id']:
+        print("✅ Cleaning delta already applied; features are up to date.")
+        return
+
+    if incremental and not (can_apply(clean_delta, applied) and not clean_delta['removed']
+                            and os.path.exists(OUTPUT_FILE) and table_exists(INPUT_DELTA_TABLE, BASE_PATH)
+                            and table_exists(H2H_TABLE, BASE_PATH) and recent_form.stats_exist(BASE_PATH)
+                            and os.path.exists(recent_form.MATCHES_DELTA_FILE) and os.path.exists(recent_form.FORM_FILE)):
+        print("⚠️ Cleaning delta can't be applied on top of the current features; recomputing everything.")
+        incremental = False
+
+    with stage("load"):
+        balls_df = load_balls(INPUT_DELTA_TABLE if incremental else INPUT_TABLE)
+        count_formats("rows", balls_df)
+    print(f"🔹 Loaded {len(balls_df)} {'delta ' if incremental else ''}rows from "
+          f"{INPUT_DELTA_TABLE if incremental else INPUT_TABLE}")
+
+    with stage("features", incremental=incremental), profiled("features"):
+        if incremental:
+            features_df = update_features(pd.read_csv(OUTPUT_FILE), balls_df)
+        else:
+            features_df = compute_features(balls_df)
+        count_formats("players", features_df)
+
+    # Stable integer IDs from the player registry
+    with stage("registry"):
+        registry = update_registry(features_df['player_name'])
+        add_player_ids(features_df, registry)
+
+    # Batter-vs-bowler matrix over the same deliveries, keyed by registry IDs
+    with stage("head_to_head"):
+        h2h = build_head_to_head(balls_df, registry)
+        if incremental:
+            h2h = add_head_to_head(load_table(BASE_PATH), h2h)
+        count_formats("pairs", h2h)
+        h2h_path = save_table(h2h, BASE_PATH)
+    print(f"✅ Head-to-head matrix ({len(h2h)} pairs) saved to {h2h_path}")
+
+    # Recency windows: this run's statistics, folded into the stored partitions of its players when incremental
+    with stage("form"):
+        if incremental:
+            form_stats = recent_form.build_stats(balls_df, recent_form.match_days(recent_form.MATCHES_DELTA_FILE))
+            touched = recent_form.update_stats(form_stats, BASE_PATH)
+            form_df = recent_form.update_form(recent_form.load_form(), touched)
+            if form_df is None:
+                print("🔹 Form windows moved into a new month; recomputing every player's form")
+                form_df = recent_form.form_features(recent_form.load_stats(BASE_PATH))
+        else:
+            form_stats = recent_form.build_stats(balls_df, recent_form.match_days())
+            recent_form.save_stats(form_stats, BASE_PATH)
+            form_df = recent_form.form_features(form_stats)
+        count_formats("form_players", form_df)
+        form_path = recent_form.save_form(form_df, registry)
+    print(f"✅ Recent form ({len(form_df)} rows) saved to {form_path}")
 
     # Save final CSV
-    features_df.to_csv(OUTPUT_FILE, index=False)
+    with stage("save"):
+        features_df.to_csv(OUTPUT_FILE, index=False)
+        baselines_path = write_baselines(features_df, OUTPUT_FILE)
+        # written after the CSV so it is stamped with the CSV's final size and mtime
+        store_path = write_store(features_df, STORE_FILE, source_path=OUTPUT_FILE,
+                                 head_to_head=h2h, head_to_head_path=h2h_path)
     print(f"✅ Player features saved to {OUTPUT_FILE}")
+    print(f"✅ Feature store saved to {store_path}")
+    print(f"✅ League baselines saved to {baselines_path}")
     print(f"Final shape: {features_df.shape}")
     print(features_df.head(10))
 
+    write_json(STATE_FILE, {'source_delta_id': clean_delta['delta_id'] if clean_delta else None})
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Generate per-format player features from the balls table")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Fold in only the deliveries added by the last incremental clean")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    main(incremental=args.incremental)
@@ -0,0 +1,179 @@
+"""
+Batter-vs-bowler head-to-head matrix.
+
+A sparse per-format table with one row per (format, batter_id, bowler_id) pair that has actually
+met, built by generate_player_features.py in one grouped pass over the balls and stored as the
+head_to_head table (see table_io). Columns:
+ - balls, runs               deliveries faced from this bowler and runs off the bat
+ - runs_0 .. runs_6          how many of the balls the batter survived went for each run value
+ - dismissals                deliveries on which the batter on strike was out
+ - dismissed_<kind>          dismissals by kind (bowled, caught, lbw, run_out, ...)
+
+Every column is an additive count, so incremental runs sum the delta's matrix into the existing one.
+HeadToHead loads the table once and answers pair lookups from a hash map, so the duel model can use
+the real history without touching the balls at request time.
+
+Usage:
+  python processing/head_to_head.py "V Kohli" "JM Anderson" --format TEST
+"""
+
+import argparse
+import os
+
+import numpy as np
+
+from table_io import data_dir, find_table, read_table, write_table
+
+BASE_PATH = data_dir()
+H2H_TABLE = "head_to_head"
+
+KEY_COLUMNS = ['format', 'batter_id', 'bowler_id']
+RUN_VALUES = [0, 1, 2, 3, 4, 6]
+RUN_COLUMNS = [f"runs_{r}" for r in RUN_VALUES]
+DISMISSAL_PREFIX = "dismissed_"
+
+# Columns of the balls table the matrix is built from
+REQUIRED_COLUMNS = ['format', 'batter', 'bowler', 'runs_batter', 'wicket_kind', 'player_out']
+
+def kind_column(kind):
+    return DISMISSAL_PREFIX + str(kind).strip().lower().replace(" ", "_")
+
+def count_columns(df):
+    """Additive columns of a head-to-head table, in table order."""
+    return [c for c in df.columns if c not in KEY_COLUMNS]
+
+def player_ids(series, registry):
+    """Registry IDs for a (categorical) name column, mapped once per distinct name; -1 when unknown."""
+    values = series.astype("category")
+    ids = np.array([registry.get(name, -1) for name in values.cat.categories], dtype=np.int64)
+    codes = values.cat.codes.to_numpy()
+    return np.where(codes >= 0, ids[codes], -1)
+
+def build_head_to_head(df, registry):
+    """
+    Head-to-head counts for every (format, batter, bowler) pair in a balls table.
+    Players missing from the registry are left out.
+    """
+    import pandas as pd
+
+    print("📊 Generating head-to-head matrix...")
+    batter_id = player_ids(df['batter'], registry)
+    bowler_id = player_ids(df['bowler'], registry)
+    out_id = player_ids(df['player_out'], registry)
+    runs_batter = df['runs_batter'].to_numpy()
+
+    # only the striker's dismissals count against the pair (not non-striker run outs)
+    dismissed = (out_id >= 0) & (out_id == batter_id)
+    survived = ~dismissed
+
+    columns = {
+        'format': df['format'].astype("category"),
+        'batter_id': batter_id,
+        'bowler_id': bowler_id,
+        'runs': runs_batter,
+    }
+    for value, col in zip(RUN_VALUES, RUN_COLUMNS):
+        columns[col] = survived & (runs_batter == value)
+    columns['dismissals'] = dismissed
+
+    kinds = df['wicket_kind'].astype("category")
+    kind_codes = kinds.cat.codes.to_numpy()
+    for code in np.unique(kind_codes[dismissed]):
+        if code >= 0:
+            columns[kind_column(kinds.cat.categories[code])] = dismissed & (kind_codes == code)
+
+    balls = pd.DataFrame(columns)
+    balls = balls[(balls['batter_id'] >= 0) & (balls['bowler_id'] >= 0)]
+    grouped = balls.groupby(KEY_COLUMNS, observed=True, sort=True)
+    h2h = grouped.sum()
+    h2h.insert(0, 'balls', grouped.size())
+    h2h = h2h.reset_index()
+    h2h['format'] = h2h['format'].astype(object)
+    counts = count_columns(h2h)
+    h2h[counts] = h2h[counts].astype(np.int64)
+    return h2h
+
+def add_head_to_head(existing, delta):
+    """Sums two head-to-head tables; dismissal kinds seen in only one of them count as 0 in the other."""
+    import pandas as pd
+
+    combined = pd.concat([existing, delta], ignore_index=True)
+    combined['format'] = combined['format'].astype(object)
+    counts = count_columns(combined)
+    combined[counts] = combined[counts].fillna(0)
+    h2h = combined.groupby(KEY_COLUMNS, as_index=False, sort=True)[counts].sum()
+    h2h[counts] = h2h[counts].astype(np.int64)
+    return h2h
+
+def load_table(base_path=None):
+    """The stored head-to-head table, or None if it hasn't been built."""
+    if find_table(H2H_TABLE, base_path or BASE_PATH) is None:
+        return None
+    return read_table(H2H_TABLE, base_path=base_path or BASE_PATH)
+
+def save_table(h2h, base_path=None):
+    return write_table(h2h, H2H_TABLE, base_path or BASE_PATH)
+
+class HeadToHead:
+    """Pair lookups over a head-to-head table: (FORMAT, batter_id, bowler_id) -> row, O(1)."""
+
+    def __init__(self, df):
+        self.df = df.reset_index(drop=True)
+        self.counts = count_columns(self.df)
+        self.values = self.df[self.counts].to_numpy(dtype=np.int64)
+        formats = self.df['format'].astype(str).str.upper().to_numpy()
+        self.rows = dict(zip(
+            zip(formats, self.df['batter_id'].to_numpy().tolist(), self.df['bowler_id'].to_numpy().tolist()),
+            range(len(self.df))
+        ))
+
+    def __len__(self):
+        return len(self.rows)
+
+    def lookup(self, fmt, batter_id, bowler_id):
+        """Counts for the pair as a dict (zero-valued kinds dropped), or None if they never met."""
+        if fmt is None or batter_id is None or bowler_id is None:
+            return None
+        try:
+            key = (str(fmt).upper(), int(batter_id), int(bowler_id))
+        except (TypeError, ValueError):
+            return None
+        row = self.rows.get(key)
+        if row is None:
+            return None
+        record = dict(zip(self.counts, self.values[row].tolist()))
+        return {k: v for k, v in record.items() if v or not k.startswith(DISMISSAL_PREFIX)}
+
+_cache = {}
+
+def load_head_to_head(base_path=None):
+    """HeadToHead over the stored table, reloaded only when the table file changes. None if absent."""
+    path = find_table(H2H_TABLE, base_path or BASE_PATH)
+    if path is None:
+        return None
+    stat = os.stat(path)
+    version = (path, stat.st_size, stat.st_mtime_ns)
+    if _cache.get('version') != version:
+        _cache['version'] = version
+        _cache['index'] = HeadToHead(read_table(H2H_TABLE, base_path=base_path or BASE_PATH))
+    return _cache['index']
+
+if __name__ == "__main__":
+    from player_registry import load_registry
+
+    parser = argparse.ArgumentParser(description="Look up a batter-vs-bowler head-to-head record")
+    parser.add_argument("batter", help="Exact clean batter name")
+    parser.add_argument("bowler", help="Exact clean bowler name")
+    parser.add_argument("--format", default="ODI")
+    args = parser.parse_args()
+
+    index = load_head_to_head()
+    if index is None:
+        raise SystemExit("❌ head_to_head table not found. Run generate_player_features.py first.")
+    registry = load_registry()
+    record = index.lookup(args.format, registry.get(args.batter), registry.get(args.bowler))
+    if record is None:
+        print(f"⚠️ No {args.format.upper()} deliveries between {args.batter} and {args.bowler}.")
+    else:
+        for key, value in record.items():
+            print(f"{key}: {value}")
@@ -0,0 +1,56 @@
+"""
+Shared helpers for incremental pipeline runs.
+
+Each stage that supports --incremental writes a small delta JSON describing what changed:
+ - delta_id: unique id of this delta
+ - previous_delta_id: id of the delta this stage wrote before (None on a full rebuild)
+ - full_rebuild: True when the stage rewrote its outputs from scratch
+ - appended: [format, match_id] keys whose rows are in the stage's *_delta.csv
+ - removed: [format, match_id] keys whose old rows were dropped (changed or deleted files)
+
+A downstream stage records the last delta_id it applied. It can only apply a new delta when
+that delta's previous_delta_id matches, otherwise it falls back to a full rebuild.
+"""
+
+import json
+import os
+import uuid
+
+import pandas as pd
+
+def read_json(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def write_json(path, obj):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(obj, f, indent=1)
+    os.replace(tmp_path, path)
+
+def new_delta(previous_delta_id=None, full_rebuild=False, appended=(), removed=()):
+    return {
+        "delta_id": uuid.uuid4().hex,
+        "previous_delta_id": previous_delta_id,
+        "full_rebuild": full_rebuild,
+        "appended": sorted(list(k) for k in appended),
+        "removed": sorted(list(k) for k in removed),
+    }
+
+def can_apply(delta, applied_delta_id):
+    """True when delta directly follows the delta last applied downstream."""
+    return (
+        delta is not None
+        and not delta["full_rebuild"]
+        and applied_delta_id is not None
+        and delta["previous_delta_id"] == applied_delta_id
+    )
+
+def drop_matches(df, keys):
+    """Drops rows whose (format, match_id) is in keys."""
+    if df.empty or not keys:
+        return df
+    row_keys = pd.MultiIndex.from_arrays([df["format"], df["match_id"].astype(str)])
+    return df[~row_keys.isin([tuple(k) for k in keys])]
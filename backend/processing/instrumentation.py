@@ -0,0 +1,251 @@
+"""
+Lightweight per-stage instrumentation for the pipeline scripts.
+
+A script's entry point is wrapped with @instrumented("name"); inside it, sections are timed with
+`with stage("parse", format="ODI"):` and work is tallied with count("rows", n, format="ODI").
+When the entry point returns (or raises) one JSON record is appended to the metrics file:
+
+  {"script", "started", "status", "error", "params", "wall_s", "cpu_s", "peak_rss_mb",
+   "children_peak_rss_mb", "counters", "rates", "stages": [{"name", "labels", "wall_s", "cpu_s",
+   "peak_rss_mb", "counters", "rates"}]}
+
+Counters go to the innermost open stage and to the run's totals; rates are counters per wall
+second. Peak RSS is the process's high-water mark when the stage ends (pool workers are reported
+separately as children_peak_rss_mb). When an instrumented entry point is called inside another
+run, it becomes a stage of that run instead of writing its own record.
+
+Metrics go to PIPELINE_METRICS_FILE, or data/pipeline_metrics.jsonl ('-' writes to stderr; an
+empty value disables them). --profile (see add_arguments) runs the `with profiled(...)` hot sections
+under cProfile, saves data/profiles/<script>_<section>.prof and prints the top functions.
+"""
+
+import cProfile
+import functools
+import inspect
+import io
+import json
+import os
+import pstats
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from table_io import data_dir
+
+BASE_PATH = data_dir()
+METRICS_FILE = os.path.join(BASE_PATH, "pipeline_metrics.jsonl")
+PROFILE_DIR = os.path.join(BASE_PATH, "profiles")
+PROFILE_TOP = 25
+
+_config = {'metrics': os.environ.get('PIPELINE_METRICS_FILE', METRICS_FILE), 'profile': False}
+_runs = []
+
+def peak_rss_mb(who=None):
+    """High-water RSS in MB of this process (or its waited-for children); None without the resource module."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF if who is None else who).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+def children_peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    return peak_rss_mb(resource.RUSAGE_CHILDREN)
+
+def rates(counters, wall):
+    return {f"{k}_per_s": v / wall for k, v in counters.items() if wall > 0} if counters else {}
+
+class Stage:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.counters = {}
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+        self.record = None
+
+    def close(self):
+        wall = time.perf_counter() - self._wall
+        self.record = {
+            'name': self.name,
+            'labels': self.labels,
+            'wall_s': wall,
+            'cpu_s': time.process_time() - self._cpu,
+            'peak_rss_mb': peak_rss_mb(),
+            'counters': self.counters,
+            'rates': rates(self.counters, wall),
+        }
+        return self.record
+
+class Run:
+    """Timings and counters of one script invocation."""
+
+    def __init__(self, script, params=None):
+        self.script = script
+        self.params = params or {}
+        self.started = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.counters = {}
+        self.stages = []
+        self._open = []
+        self._wall = time.perf_counter()
+        self._cpu = time.process_time()
+
+    @contextmanager
+    def stage(self, name, **labels):
+        current = Stage(name, labels)
+        self._open.append(current)
+        try:
+            yield current
+        except Exception:
+            current.counters['errors'] = current.counters.get('errors', 0) + 1
+            raise
+        finally:
+            self._open.pop()
+            self.stages.append(current.close())
+
+    def annotate(self, **params):
+        self.params.update(params)
+
+    def count(self, name, value=1, **labels):
+        """Adds value to counter `name` of the innermost stage and the run, keyed "name.label1.label2..."."""
+        key = ".".join([name] + [str(v) for v in labels.values()])
+        for counters in ([self._open[-1].counters] if self._open else []) + [self.counters]:
+            counters[key] = counters.get(key, 0) + value
+
+    def finish(self, error=None):
+        wall = time.perf_counter() - self._wall
+        return {
+            'script': self.script,
+            'started': self.started,
+            'status': 'ok' if error is None else 'error',
+            'error': None if error is None else f"{type(error).__name__}: {error}",
+            'params': self.params,
+            'wall_s': wall,
+            'cpu_s': time.process_time() - self._cpu,
+            'peak_rss_mb': peak_rss_mb(),
+            'children_peak_rss_mb': children_peak_rss_mb(),
+            'counters': self.counters,
+            'rates': rates(self.counters, wall),
+            'stages': self.stages,
+        }
+
+class NullRun:
+    """Stand-in when no run is active, so library functions can be instrumented unconditionally."""
+
+    @contextmanager
+    def stage(self, name, **labels):
+        yield None
+
+    def count(self, name, value=1, **labels):
+        pass
+
+    def annotate(self, **params):
+        pass
+
+NULL_RUN = NullRun()
+
+def current():
+    return _runs[-1] if _runs else NULL_RUN
+
+def stage(name, **labels):
+    return current().stage(name, **labels)
+
+def count(name, value=1, **labels):
+    current().count(name, value, **labels)
+
+def count_formats(name, df):
+    """count(name, rows, format=...) for each format in df."""
+    for fmt, rows in df['format'].value_counts(sort=False).items():
+        if rows:
+            current().count(name, int(rows), format=fmt)
+
+def annotate(**params):
+    """Records parameters (e.g. parsed CLI arguments) on the active run."""
+    current().annotate(**params)
+
+def emit(record, path=None):
+    """Appends a run record as one JSON line ('-' = stderr, empty = nowhere)."""
+    path = _config['metrics'] if path is None else path
+    if not path:
+        return
+    line = json.dumps(record, default=str)
+    if path == "-":
+        print(line, file=sys.stderr)
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+def instrumented(script):
+    """Decorator for a script's entry point: one Run per call, emitted when it returns or raises."""
+    def decorate(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _runs:
+                with stage(script):
+                    return fn(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            run = Run(script, {k: v for k, v in bound.arguments.items() if isinstance(v, (str, int, float, bool))})
+            _runs.append(run)
+            error = None
+            try:
+                return fn(*args, **kwargs)
+            except SystemExit as e:
+                # --help and clean exits are not failures
+                error = e if e.code not in (None, 0) else None
+                raise
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _runs.pop()
+                emit(run.finish(error))
+        return wrapper
+    return decorate
+
+@contextmanager
+def profiled(section):
+    """Runs the block under cProfile when profiling is on; otherwise does nothing."""
+    if not _config['profile']:
+        yield
+        return
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        script = _runs[-1].script if _runs else "profile"
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{script}_{section}.prof")
+        profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        print(f"📊 Profile of {script}/{section} saved to {path}", file=sys.stderr)
+        print(out.getvalue(), file=sys.stderr)
+
+def configure(metrics=None, profile=None):
+    if metrics is not None:
+        _config['metrics'] = metrics
+    if profile is not None:
+        _config['profile'] = profile
+
+def add_arguments(parser):
+    """Adds --metrics and --profile to a script's argparse parser."""
+    parser.add_argument("--metrics", default=None,
+                        help="Append the run's JSON metrics to this file ('-' = stderr; default PIPELINE_METRICS_FILE "
+                             "or data/pipeline_metrics.jsonl)")
+    parser.add_argument("--profile", action="store_true",
+                        help="cProfile the hot section; saves data/profiles/<script>_<section>.prof and prints the top functions")
+
+def configure_from_args(args):
+    configure(metrics=args.metrics, profile=args.profile)
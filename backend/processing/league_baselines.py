@@ -0,0 +1,80 @@
+"""
+Per-format league baselines (mean strike rate, economy and wicket probability) for the duel model.
+
+generate_player_features.py writes them to data/league_baselines.json next to player_features.csv,
+stamped with the features file's size and mtime. The simulator loads that file when it matches the
+features it is using, and otherwise computes the baselines once per DataFrame and caches them, so
+build_ball_model never rescans the features table per duel.
+"""
+
+import json
+import math
+import os
+
+import numpy as np
+
+from table_io import data_dir
+
+BASE_PATH = data_dir()
+BASELINES_FILE = os.path.join(BASE_PATH, "league_baselines.json")
+
+BASELINE_COLUMNS = ['strike_rate', 'economy_rate', 'wicket_probability']
+ALL_FORMATS = "ALL"
+
+def file_version(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def column_mean(series):
+    value = series.replace([np.inf, -np.inf], np.nan).dropna().mean()
+    return None if value is None or math.isnan(value) else float(value)
+
+def compute_baselines(df):
+    """{FORMAT: {column: mean}} plus an ALL entry pooled over formats; missing columns map to None."""
+    def means(frame):
+        return {c: column_mean(frame[c]) if c in frame.columns else None for c in BASELINE_COLUMNS}
+
+    baselines = {ALL_FORMATS: means(df)}
+    if 'format' in df.columns:
+        for fmt, frame in df.groupby(df['format'].astype(str).str.upper()):
+            baselines[fmt] = means(frame)
+    return baselines
+
+def write_baselines(df, features_path, path=None):
+    """Saves baselines for df, stamped with the version of the features file df was saved to."""
+    path = path or BASELINES_FILE
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"features_version": file_version(features_path), "formats": compute_baselines(df)}, f, indent=1)
+    return path
+
+def load_baselines(features_path, path=None):
+    """Saved baselines if they were computed from the current features file, else None."""
+    path = path or BASELINES_FILE
+    if not os.path.exists(path) or not os.path.exists(features_path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    if saved.get("features_version") != file_version(features_path):
+        return None
+    return saved["formats"]
+
+_cache = []
+
+def baselines_for(df, fmt=None):
+    """
+    Baselines for one format (pooled over all formats when fmt is None or unknown).
+    Resolved once per DataFrame: from the saved file when df.attrs['features_path'] matches it,
+    otherwise computed from df.
+    """
+    for cached_df, baselines in _cache:
+        if cached_df is df:
+            break
+    else:
+        features_path = df.attrs.get('features_path') if hasattr(df, 'attrs') else None
+        baselines = load_baselines(features_path) if features_path else None
+        if baselines is None:
+            baselines = compute_baselines(df)
+        _cache.insert(0, (df, baselines))
+        del _cache[4:]
+    key = str(fmt).upper() if fmt is not None else ALL_FORMATS
+    return baselines.get(key) or baselines[ALL_FORMATS]
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo match simulator: XI vs XI
+
+Plays whole matches ball by ball on the per-ball model of monte_carlo_duel.build_ball_model,
+one model per (batter, bowler) pair, with every trial advanced together as numpy arrays:
+ - batting order as given; a wicket brings in the next batter, odd runs and over ends swap strike
+ - bowlers rotate from the fielding XI under the format's per-bowler over quota, never two overs running
+ - innings end at all out, at the format's over limit, or (chasing) once the target is passed
+ - TEST: four innings (no follow-on or declarations) inside a five-day ball budget; unfinished matches are draws
+
+Outputs win / tie / draw probabilities and innings score distributions.
+
+Notes / assumptions:
+ - only legal deliveries are modelled (the ball model has no wides or no-balls)
+ - non-striker run outs are not modelled
+ - a tie is reported as such (no super over)
+
+Usage:
+  python processing/match_simulator.py --team1 "A,B,...,K" --team2 "L,M,...,V" --format T20 --trials 10000 [--workers 0]
+"""
+
+import argparse
+import math
+import sys
+import time
+
+import numpy as np
+
+from monte_carlo_duel import build_ball_model, find_player_row, load_features
+from parallel_mc import histogram_distribution, merge_histograms, run_shards, shard_plan
+
+# overs per innings (None = unlimited), max overs per bowler, innings per side, balls in the match
+FORMAT_RULES = {
+    "T20": {"overs": 20, "bowler_overs": 4, "innings": 1, "match_balls": None},
+    "ODI": {"overs": 50, "bowler_overs": 10, "innings": 1, "match_balls": None},
+    "TEST": {"overs": None, "bowler_overs": None, "innings": 2, "match_balls": 5 * 90 * 6},
+}
+
+# Rotation: the frontline attack are players with at least this many balls bowled in the format
+FRONTLINE_MIN_BALLS = 60
+# Bowlers used per innings (the format's quota always lets five bowl the full overs)
+ATTACK_SIZE = 5
+# Runs a wicket is worth when ranking bowlers by cost per ball
+WICKET_VALUE_RUNS = 25.0
+
+def format_rules(fmt):
+    rules = FORMAT_RULES.get(str(fmt).upper())
+    if rules is None:
+        raise ValueError(f"Unknown format: {fmt}. Expected one of {', '.join(FORMAT_RULES)}")
+    return rules
+
+# --- Team setup ---
+def bowling_cost(row):
+    """Expected runs conceded per ball minus the value of the wickets taken; lower is better."""
+    if row is None or not row.get('balls_bowled'):
+        return math.inf
+    return float(row.get('economy_rate') or 0.0) / 6 - WICKET_VALUE_RUNS * float(row.get('wicket_probability') or 0.0)
+
+def bowling_attack(rows):
+    """Positions of the fielding XI ordered as they'd be used: frontline bowlers by cost, then part-timers."""
+    def key(pos):
+        row = rows[pos]
+        frontline = row is not None and (row.get('balls_bowled') or 0) >= FRONTLINE_MIN_BALLS
+        return (not frontline, bowling_cost(row), pos)
+    return sorted(range(len(rows)), key=key)
+
+def bowling_plan(attack, overs, quota):
+    """
+    Bowler position for each over: whoever in the attack has bowled the fewest overs (ties to the
+    better bowler), never the previous over's bowler and never beyond the quota.
+    """
+    if len(attack) < 2:
+        raise ValueError("A fielding side needs at least two bowlers")
+    if quota is not None and len(attack) * quota < overs:
+        raise ValueError(f"{len(attack)} bowlers can't bowl {overs} overs at {quota} overs each")
+    bowled = dict.fromkeys(attack, 0)
+    plan = []
+    previous = None
+    for _ in range(overs):
+        eligible = [b for b in attack if b != previous and (quota is None or bowled[b] < quota)]
+        previous = min(eligible, key=lambda b: bowled[b])  # stable: ties keep attack order
+        bowled[previous] += 1
+        plan.append(previous)
+    return plan
+
+def outcome_grid(models):
+    """
+    Stacks per-pair ball models onto one outcome grid.
+    Returns (run_values, cdf) with cdf shaped models.shape + (outcomes,); outcome 0 is a wicket.
+    """
+    runs = sorted({r for m in models.flat for r in m['run_probs']})
+    cdf = np.empty(models.shape + (len(runs) + 1,))
+    for idx, m in np.ndenumerate(models):
+        probs = np.array([m['run_probs'].get(r, 0.0) for r in runs])
+        total = probs.sum()
+        probs = probs / total if total > 0 else np.eye(len(runs))[0]
+        cdf[idx] = np.cumsum(np.concatenate(([m['p_wicket']], (1.0 - m['p_wicket']) * probs)))
+    cdf[..., -1] = 1.0
+    return np.array([0] + runs, dtype=np.int64), cdf
+
+def pair_models(batting_rows, bowling_rows, df, fmt):
+    """(batters x bowlers) object array of ball models."""
+    models = np.empty((len(batting_rows), len(bowling_rows)), dtype=object)
+    for i, batter in enumerate(batting_rows):
+        for j, bowler in enumerate(bowling_rows):
+            models[i, j] = build_ball_model(batter, bowler, df, fmt=fmt)
+    return models
+
+class Side:
+    """One team's batting order, bowling attack and per-ball outcome tables against the other side."""
+
+    def __init__(self, names, rows):
+        self.names = list(names)
+        self.rows = rows
+        self.attack = bowling_attack(rows)[:ATTACK_SIZE]
+        self.run_values = None
+        self.cdf = None
+
+    def face(self, fielding, df, fmt):
+        """Builds this side's (batter x fielder) outcome tables against the fielding side."""
+        self.run_values, self.cdf = outcome_grid(pair_models(self.rows, fielding.rows, df, fmt))
+
+# --- Innings engine ---
+def simulate_innings(batting, plan, trials, rng, max_balls, ball_limit=None, target=None):
+    """
+    Plays one innings for every trial at once.
+
+    batting is the Side batting; plan gives the fielding bowler position for each over.
+    ball_limit (per trial) caps the innings further, e.g. the balls left in a Test; target (per trial)
+    ends a chase as soon as it is reached. Returns (runs, wickets, balls) arrays.
+    """
+    run_values, cdf = batting.run_values, batting.cdf
+    max_wickets = len(batting.rows) - 1
+
+    runs = np.zeros(trials, dtype=np.int64)
+    wickets = np.zeros(trials, dtype=np.int64)
+    balls = np.zeros(trials, dtype=np.int64)
+    striker = np.zeros(trials, dtype=np.int64)
+    non_striker = np.ones(trials, dtype=np.int64)
+    limit = np.full(trials, max_balls, dtype=np.int64) if ball_limit is None else np.minimum(ball_limit, max_balls)
+    need = np.full(trials, np.iinfo(np.int64).max) if target is None else target
+
+    for over, bowler in enumerate(plan):
+        # only trials still batting take part; every one of them has bowled exactly `over` overs
+        active = np.flatnonzero((wickets < max_wickets) & (balls < limit) & (runs < need))
+        if active.size == 0:
+            break
+        r, w, b = runs[active], wickets[active], balls[active]
+        s, ns = striker[active], non_striker[active]
+        lim, nd = limit[active], need[active]
+        # one row of thresholds per outcome boundary (the last is always 1), indexed by batter
+        thresholds = np.ascontiguousarray(cdf[:, bowler, :-1].T)
+        for u in rng.random((6, active.size)):
+            live = (w < max_wickets) & (b < lim) & (r < nd)
+            if not live.any():
+                break
+            # inverse CDF: count the boundaries at or below u (per-boundary gathers beat a 2-D gather)
+            outcome = np.zeros(active.size, dtype=np.int64)
+            for row in thresholds:
+                outcome += row[s] <= u
+            out = live & (outcome == 0)
+            scored = np.where(live, run_values[outcome], 0)
+            r += scored
+            b += live
+            w += out
+            # the next batter takes strike; otherwise odd runs cross the batters over
+            s = np.where(out, np.minimum(w + 1, max_wickets), s)
+            cross = live & ~out & (scored % 2 == 1)
+            s, ns = np.where(cross, ns, s), np.where(cross, s, ns)
+        # change of ends
+        runs[active], wickets[active], balls[active] = r, w, b
+        striker[active], non_striker[active] = ns, s
+    return runs, wickets, balls
+
+def setup_match(team1, team2, fmt, df):
+    """Sides, bowling plans and innings limits for team1 (batting first) against team2."""
+    rules = format_rules(fmt)
+    fmt = str(fmt).upper()
+    sides = []
+    missing = []
+    for names in (team1, team2):
+        rows = [find_player_row(df, name, fmt) for name in names]
+        missing += [name for name, row in zip(names, rows) if row is None]
+        sides.append(Side(names, rows))
+    home, away = sides
+    home.face(away, df, fmt)
+    away.face(home, df, fmt)
+
+    overs = rules['overs'] or rules['match_balls'] // 6
+    plans = [bowling_plan(away.attack, overs, rules['bowler_overs']),
+             bowling_plan(home.attack, overs, rules['bowler_overs'])]
+    return {'format': fmt, 'rules': rules, 'sides': (home, away), 'plans': plans, 'max_balls': overs * 6,
+            'missing': missing}
+
+def play_match(setup, trials, rng):
+    """
+    Plays `trials` matches and reduces them to counts and histograms, which add up across shards:
+    results (team 1 wins, team 2 wins, ties, draws), each side's total runs histogram and per innings
+    a runs histogram with wicket and ball sums.
+    """
+    rules, sides, plans = setup['rules'], setup['sides'], setup['plans']
+    totals = [np.zeros(trials, dtype=np.int64), np.zeros(trials, dtype=np.int64)]
+    used = np.zeros(trials, dtype=np.int64)
+    innings = []
+    finished = np.ones(trials, dtype=bool)
+    last = 2 * rules['innings'] - 1
+    for number in range(2 * rules['innings']):
+        team = number % 2
+        batting = sides[team]
+        ball_limit = rules['match_balls'] - used if rules['match_balls'] else None
+        # the side batting last chases; it wins by passing the other side's total
+        target = totals[1 - team] - totals[team] + 1 if number == last else None
+        runs, wickets, balls = simulate_innings(batting, plans[team], trials, rng, setup['max_balls'],
+                                                ball_limit, target)
+        totals[team] += runs
+        used += balls
+        if number == last and rules['match_balls']:
+            # a Test chase is only decided if it was completed or the side was bowled out
+            finished = (runs >= target) | (wickets >= len(batting.rows) - 1)
+        innings.append({'runs': np.bincount(runs), 'wickets': int(wickets.sum()), 'balls': int(balls.sum())})
+
+    results = np.array([
+        np.sum(finished & (totals[0] > totals[1])),
+        np.sum(finished & (totals[1] > totals[0])),
+        np.sum(finished & (totals[0] == totals[1])),
+        np.sum(~finished),
+    ], dtype=np.int64)
+    return {'results': results, 'totals': [np.bincount(t) for t in totals], 'innings': innings}
+
+def merge_played(shards):
+    """Adds up the play_match outputs of several shards."""
+    return {
+        'results': sum(shard['results'] for shard in shards),
+        'totals': [merge_histograms([shard['totals'][team] for shard in shards]) for team in range(2)],
+        'innings': [{
+            'runs': merge_histograms([shard['innings'][i]['runs'] for shard in shards]),
+            'wickets': sum(shard['innings'][i]['wickets'] for shard in shards),
+            'balls': sum(shard['innings'][i]['balls'] for shard in shards),
+        } for i in range(len(shards[0]['innings']))],
+    }
+
+def match_shard(task):
+    """One shard of a parallel simulate_match. Top level so it pickles."""
+    setup, trials, seed_seq = task
+    return play_match(setup, trials, np.random.default_rng(seed_seq))
+
+def simulate_match(team1, team2, fmt="T20", df=None, trials=10000, rng_seed=None, workers=None):
+    """
+    Simulates team1 (batting first) against team2 and returns a summary dict:
+    win / tie / draw probabilities, per-innings score and wicket distributions, and any unknown players.
+
+    workers=None plays every trial from one stream. Any other value shards the trials over that many
+    processes (0 = all CPUs) with SeedSequence child streams (see parallel_mc), giving the same result
+    for a given seed whatever the worker count. Raises ValueError for fewer than one trial.
+    """
+    if trials < 1:
+        raise ValueError(f"trials must be at least 1, got {trials}")
+    df = load_features() if df is None else df
+    setup = setup_match(team1, team2, fmt, df)
+    if workers is None:
+        rng = rng_seed if isinstance(rng_seed, np.random.Generator) else np.random.default_rng(rng_seed)
+        played = play_match(setup, trials, rng)
+    else:
+        tasks = [(setup, size, child) for size, child in shard_plan(trials, rng_seed)]
+        played = merge_played(run_shards(match_shard, tasks, workers))
+
+    team1_wins, team2_wins, ties, draws = (int(count) for count in played['results'])
+    return {
+        'format': setup['format'],
+        'trials': trials,
+        'team1_win_probability': team1_wins / trials,
+        'team2_win_probability': team2_wins / trials,
+        'tie_probability': ties / trials,
+        'draw_probability': draws / trials,
+        'team1_total': histogram_distribution(played['totals'][0]),
+        'team2_total': histogram_distribution(played['totals'][1]),
+        'innings': [{
+            'team': f"Team {number % 2 + 1}",
+            'runs': histogram_distribution(inn['runs']),
+            'wickets': inn['wickets'] / trials,
+            'overs': inn['balls'] / trials / 6,
+        } for number, inn in enumerate(played['innings'])],
+        'missing_players': setup['missing'],
+    }
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="Monte Carlo XI vs XI match simulator")
+    parser.add_argument("--team1", required=True, help="Comma-separated batting order of the side batting first")
+    parser.add_argument("--team2", required=True, help="Comma-separated batting order of the side batting second")
+    parser.add_argument("--format", default="T20", help="Format: T20/ODI/TEST (default T20)")
+    parser.add_argument("--trials", type=int, default=10000, help="Monte Carlo trials (default 10000)")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed (optional)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Shard trials over N processes (0 = all CPUs); same seed, same result for any N")
+    args = parser.parse_args()
+
+    team1 = [name.strip() for name in args.team1.split(",") if name.strip()]
+    team2 = [name.strip() for name in args.team2.split(",") if name.strip()]
+    df = load_features()
+
+    start = time.perf_counter()
+    result = simulate_match(team1, team2, args.format, df, trials=args.trials, rng_seed=args.seed,
+                            workers=args.workers)
+    elapsed = time.perf_counter() - start
+
+    print("\n=== Match Simulation Results ===")
+    print(f"Format: {result['format']}   Trials: {result['trials']}   ({elapsed:.2f}s)")
+    if result['missing_players']:
+        print(f"⚠️ Not found (league averages used): {', '.join(result['missing_players'])}")
+    print()
+    print(f"Team 1 win: {result['team1_win_probability']:.1%}")
+    print(f"Team 2 win: {result['team2_win_probability']:.1%}")
+    print(f"Tie: {result['tie_probability']:.1%}")
+    if result['format'] == "TEST":
+        print(f"Draw: {result['draw_probability']:.1%}")
+    print()
+    for i, inn in enumerate(result['innings'], 1):
+        runs = inn['runs']
+        print(f"Innings {i} ({inn['team']}): mean {runs['mean']:.1f} (p10 {runs['p10']:.0f} / p50 {runs['p50']:.0f} / p90 {runs['p90']:.0f}), "
+              f"{inn['wickets']:.1f} wkts, {inn['overs']:.1f} overs")
+
+if __name__ == "__main__":
+    try:
+        main_cli()
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
@@ -3,7 +3,8 @@
 Monte Carlo duel simulator: Batsman vs Bowler
 
 Reads backend/data/player_features.csv (created earlier).
-Simulates a short duel of B balls (default 6) for N trials (default 10000).
+Simulates a short duel of B balls (default 6) for N trials (default 10000),
+or solves it exactly with --mode exact.
 
 Outputs:
  - survival probability (batsman survives all B balls)
@@ -24,42 +25,129 @@ import sys
 import math
 import random
 import numpy as np
-import pandas as pd
 
-BASE_DATA = os.path.join(os.path.dirname(__file__), "..", "data")
+from feature_store import STORE_NAME, open_store
+from head_to_head import H2H_TABLE, RUN_VALUES as H2H_RUN_VALUES, load_head_to_head
+from instrumentation import add_arguments, annotate, configure_from_args, count, instrumented, profiled, stage
+from league_baselines import baselines_for
+from parallel_mc import SHARD_TRIALS, histogram_mean, histogram_percentile, merge_histograms, run_shards, shard_plan
+from player_registry import index_for
+from table_io import data_dir, find_table
+
+BASE_DATA = data_dir()
 PLAYER_FEATURES_CSV = os.path.join(BASE_DATA, "player_features.csv")
+PLAYER_FORM_FILE = "player_form.csv"  # next to the features file
+# --form choices: career features as they are, or blended with a recent_form window (see recent_form.WINDOWS)
+FORM_CHOICES = ("career", "last10", "12m", "24m", "decay")
 
 # Tunable blending weights
 ALPHA_WICKET = 0.6   # weight for bowler wicket probability vs batter dismissal rate
 BOWLER_PRESSURE_FACTOR = 1.0  # multiplier on wicket probability if bowler unusually high
+H2H_PRIOR_BALLS = 60  # head-to-head balls at which the pair's own record gets half the weight
 
 # Minimal default distribution shape for non-boundary runs
 DEFAULT_RUN_DISTRIBUTION = {0: 0.45, 1: 0.35, 2: 0.08, 3: 0.02}  # leftover mass after boundaries
 
-def load_features(csv_path=PLAYER_FEATURES_CSV):
+def load_features(csv_path=PLAYER_FEATURES_CSV, form=None, copy=False):
+    """
+    Career features, or with form set to a recent_form window (e.g. "12m"), form-weighted ones:
+    each player's rates pulled towards that window's as far as its ball count supports.
+    Served from the memory-mapped feature store next to the CSV when it was written from the CSV
+    as it is now (see feature_store); the CSV is parsed otherwise.
+
+    Features served from the store (form-weighted ones too) are read-only: their numeric columns
+    wrap the mapped file, so writing into them in place (df.loc[i, col] = ..., df[col].to_numpy()[i] = ...) raises
+    "assignment destination is read-only". Replacing a whole column is fine. Pass copy=True for a
+    frame that can be modified in place.
+    """
     if not os.path.exists(csv_path):
         raise FileNotFoundError(f"player_features.csv not found at {csv_path}. Run generate_player_features.py first.")
-    df = pd.read_csv(csv_path)
-    # normalize column names
-    df.columns = [c.strip() for c in df.columns]
+    store = open_store(os.path.join(os.path.dirname(os.path.abspath(csv_path)), STORE_NAME))
+    if store is not None and store.matches(csv_path):
+        df = store.frame()
+        if copy:
+            df = df.copy()
+        df.attrs['feature_store'] = store.build_id
+    else:
+        import pandas as pd
+
+        df = pd.read_csv(csv_path)
+        # normalize column names
+        df.columns = [c.strip() for c in df.columns]
+    # lets league_baselines match this frame to the saved baselines file
+    df.attrs['features_path'] = os.path.abspath(csv_path)
+    if form and form != "career":
+        from recent_form import form_weighted, load_form
+
+        df = form_weighted(df, load_form(os.path.join(os.path.dirname(csv_path), PLAYER_FORM_FILE)), form)
     return df
 
+def current_store(csv_path=PLAYER_FEATURES_CSV):
+    """
+    The feature store next to csv_path when it was written from the CSV and the head-to-head table
+    as they are now, else None. It answers a career-form duel (players, baselines, head-to-head)
+    without loading the features into pandas, which is most of a one-shot process's start-up.
+    """
+    folder = os.path.dirname(os.path.abspath(csv_path))
+    store = open_store(os.path.join(folder, STORE_NAME))
+    if store is None or not store.matches(csv_path) or not store.has_head_to_head(find_table(H2H_TABLE, folder)):
+        return None
+    return store
+
 def find_player_row(df, player_name, fmt):
-    # exact match first
-    row = df[(df['format'].str.upper() == fmt.upper()) & (df['player_name'].str.lower() == player_name.lower())]
-    if not row.empty:
-        return row.iloc[0].to_dict()
-    # try case-insensitive contains
-    row = df[(df['format'].str.upper() == fmt.upper()) & (df['player_name'].str.lower().str.contains(player_name.lower()))]
-    if not row.empty:
-        return row.iloc[0].to_dict()
+    # exact match first, then case-insensitive contains; both served by the cached name index
+    index = index_for(df)
+    pos = index.find(player_name, fmt)
+    if pos is not None:
+        return index.record(pos)
     return None
 
-def build_ball_model(batter_row, bowler_row, df_all):
+def head_to_head_record(batter_row, bowler_row, fmt, store=None):
+    """
+    The pair's record from the precomputed head-to-head matrix (or the copy in a feature store),
+    or None (no table, no IDs, never met).
+    """
+    if batter_row is None or bowler_row is None:
+        return None
+    if store is not None:
+        return store.head_to_head(fmt, batter_row.get('player_id'), bowler_row.get('player_id'))
+    index = load_head_to_head()
+    if index is None:
+        return None
+    return index.lookup(fmt, batter_row.get('player_id'), bowler_row.get('player_id'))
+
+def blend_head_to_head(p_wicket, run_probs, h2h, prior_balls=H2H_PRIOR_BALLS):
+    """
+    Shrinks the pair's observed wicket rate and run-value mix towards the model's, with weight
+    balls / (balls + prior_balls). Returns (p_wicket, run_probs, weight).
+    """
+    balls = h2h['balls']
+    weight = balls / (balls + prior_balls)
+    blended_wicket = (1 - weight) * p_wicket + weight * h2h['dismissals'] / balls
+    blended_wicket = max(0.0005, min(blended_wicket, 0.5))
+
+    # run mix conditional on surviving the ball
+    model_total = sum(run_probs.values())
+    observed = {r: h2h.get(f"runs_{r}", 0) for r in H2H_RUN_VALUES}
+    observed_total = sum(observed.values())
+    conditional = {}
+    for r in sorted(set(run_probs) | set(observed)):
+        p = run_probs.get(r, 0.0) / model_total if model_total > 0 else 0.0
+        if observed_total > 0:
+            p = (1 - weight) * p + weight * observed.get(r, 0) / observed_total
+        conditional[r] = p
+    norm = sum(conditional.values()) or 1.0
+    blended_runs = {r: p / norm * (1 - blended_wicket) for r, p in conditional.items()}
+    return blended_wicket, blended_runs, weight
+
+def build_ball_model(batter_row, bowler_row, df_all, fmt=None, baselines=None, h2h=None):
     """
     Build a simple per-ball PMF and wicket probability by combining batter and bowler stats.
 
     Inputs: batter_row and bowler_row are dicts (or None if absent)
+            fmt selects the league baselines (defaults to the rows' format)
+            baselines optionally overrides them (dict as returned by league_baselines.baselines_for)
+            h2h is the pair's head-to-head record (looked up from the matrix when None; False skips it)
     Returns: dict with keys:
       - p_wicket (per-ball)
       - run_probs: dict mapping runs -> probability (excluding wicket)
@@ -68,23 +156,18 @@ def build_ball_model(batter_row, bowler_row, df_all):
     """
 
     notes = []
-    # Default baseline league averages computed from df_all to normalize if available
-    league_sr = None
-    league_econ = None
-    league_wicket_prob = None
-    try:
-        # compute approximate league averages excluding zeros
-        tmp = df_all.copy()
-        # strike_rate column may exist or not; compute if missing
-        if 'strike_rate' in tmp.columns:
-            league_sr = tmp['strike_rate'].replace([np.inf, -np.inf], np.nan).dropna().mean()
-        if 'economy_rate' in tmp.columns:
-            league_econ = tmp['economy_rate'].replace([np.inf, -np.inf], np.nan).dropna().mean()
-        # wicket prob per ball average among bowlers
-        if 'wicket_probability' in tmp.columns:
-            league_wicket_prob = tmp['wicket_probability'].replace([np.inf, -np.inf], np.nan).dropna().mean()
-    except Exception:
-        league_sr = league_econ = league_wicket_prob = None
+    if fmt is None:
+        fmt = (batter_row or {}).get('format') or (bowler_row or {}).get('format')
+    # Per-format league averages, precomputed by generate_player_features.py or cached per DataFrame
+    if baselines is None and df_all is not None:
+        try:
+            baselines = baselines_for(df_all, fmt)
+        except Exception:
+            baselines = None
+    baselines = baselines or {}
+    league_sr = baselines.get('strike_rate')
+    league_econ = baselines.get('economy_rate')
+    league_wicket_prob = baselines.get('wicket_probability')
 
     # Batter stats fallback defaults
     batter_sr = None
@@ -187,6 +270,13 @@ def build_ball_model(batter_row, bowler_row, df_all):
             leftover = 1.0 - total_mass
             run_probs[0] = run_probs.get(0, 0) + leftover
 
+    # Blend in what actually happened when these two met, weighted by how many balls that rests on
+    if h2h is None:
+        h2h = head_to_head_record(batter_row, bowler_row, fmt)
+    if h2h and h2h.get('balls', 0) > 0:
+        p_wicket, run_probs, weight = blend_head_to_head(p_wicket, run_probs, h2h)
+        notes.append(f"Head-to-head: {h2h['balls']} balls, {h2h['runs']} runs, {h2h['dismissals']} dismissals (weight {weight:.2f})")
+
     # compute expected runs per ball from this pmf (ignoring wicket)
     expected_runs_ball = sum(r * prob for r, prob in run_probs.items())
 
@@ -198,11 +288,231 @@ def build_ball_model(batter_row, bowler_row, df_all):
     }
     return model
 
-def simulate_duel(model, balls=6, trials=10000, rng_seed=None):
+# Cap on trials x balls cells sampled per batch so long duels stay within a few MB
+SAMPLE_CHUNK_CELLS = 1 << 21
+
+def outcome_table(model):
+    """
+    Flatten a ball model into a single per-ball outcome distribution.
+
+    Index 0 is a wicket; the remaining entries follow the sorted run values of run_probs.
+    Returns (run_values, cdf) as arrays so one uniform draw decides the whole ball.
+    """
+    p_wicket = model['p_wicket']
+    run_probs = model['run_probs']
+    outcomes = sorted(run_probs.keys())  # e.g. [0,1,2,3,4,6]
+    probs = np.array([run_probs[o] for o in outcomes], dtype=float)
+    # normalize in case small float error
+    probs = probs / probs.sum()
+    pmf = np.concatenate(([p_wicket], (1.0 - p_wicket) * probs))
+    cdf = np.cumsum(pmf)
+    cdf[-1] = 1.0
+    run_values = np.array([0] + outcomes, dtype=np.int64)
+    return run_values, cdf
+
+def sample_outcomes(run_values, cdf, uniforms):
+    """
+    Resolve a (trials x balls) matrix of uniforms into per-trial duel results.
+
+    Every ball after the first wicket is masked out, matching the early break of the loop engine.
+    Returns (total_runs, dismissed, balls_used) arrays of length trials.
+    """
+    balls = uniforms.shape[1]
+    idx = np.searchsorted(cdf, uniforms, side='right')
+    wicket = idx == 0
+    dismissed = wicket.any(axis=1)
+    first_wicket = np.where(dismissed, wicket.argmax(axis=1), balls)
+    live = np.arange(balls) < first_wicket[:, None]
+    total_runs = np.where(live, run_values[idx], 0).sum(axis=1)
+    balls_used = np.minimum(first_wicket + 1, balls)
+    return total_runs, dismissed, balls_used
+
+def summarize_trials(total_runs, dismissed, balls):
+    """Reduce per-trial arrays to the summary dict returned by the simulators."""
+    dismissal_prob = float(np.mean(dismissed))
+    # percentiles off the runs histogram match np.percentile, which would also import numpy.ma
+    hist = np.bincount(np.asarray(total_runs, dtype=np.int64))
+    return {
+        'trials': int(len(total_runs)),
+        'balls': balls,
+        'survival_probability': 1.0 - dismissal_prob,
+        'expected_runs': float(np.mean(total_runs)),
+        'dismissal_probability': dismissal_prob,
+        'runs_p50': histogram_percentile(hist, 50),
+        'runs_p10': histogram_percentile(hist, 10),
+        'runs_p90': histogram_percentile(hist, 90)
+    }
+
+# Uniform sampling schemes; all give unbiased estimates, the last two with lower variance
+SAMPLING_MODES = ("iid", "antithetic", "stratified")
+# Largest double below 1, so 1 - u never lands exactly on the final CDF step
+BELOW_ONE = np.nextafter(1.0, 0.0)
+
+def sample_uniforms(rng, trials, balls, sampling="iid"):
+    """
+    A (trials x balls) matrix of U(0,1) draws under a sampling scheme:
+     - iid: plain independent draws
+     - antithetic: the second half of the trials replays the first half as 1 - u
+     - stratified: Latin hypercube per ball, i.e. each ball's column has exactly one draw in
+       each of `trials` equal strata, independently permuted per ball
+    """
+    if sampling == "iid":
+        return rng.random((trials, balls))
+    if sampling == "antithetic":
+        half = rng.random(((trials + 1) // 2, balls))
+        return np.concatenate([half, np.minimum(1.0 - half, BELOW_ONE)])[:trials]
+    if sampling == "stratified":
+        strata = rng.permuted(np.tile(np.arange(trials), (balls, 1)), axis=1).T
+        return (strata + rng.random((trials, balls))) / trials
+    raise ValueError(f"Unknown sampling mode: {sampling}. Expected one of {', '.join(SAMPLING_MODES)}")
+
+def sample_duel_arrays(model, balls=6, trials=10000, rng=None, sampling="iid"):
+    """
+    Vectorized engine: draw all trials x balls outcomes in batches with a numpy Generator.
+    Returns (total_runs, dismissed) arrays of length trials.
+    """
+    if rng is None or isinstance(rng, (int, np.integer)):
+        rng = np.random.default_rng(rng)
+    run_values, cdf = outcome_table(model)
+
+    total_runs = np.zeros(trials, dtype=np.int64)
+    dismissed = np.zeros(trials, dtype=bool)
+    chunk = max(1, SAMPLE_CHUNK_CELLS // max(1, balls))
+    for start in range(0, trials, chunk):
+        stop = min(trials, start + chunk)
+        uniforms = sample_uniforms(rng, stop - start, balls, sampling)
+        total_runs[start:stop], dismissed[start:stop], _ = sample_outcomes(run_values, cdf, uniforms)
+    return total_runs, dismissed
+
+def simulate_duel(model, balls=6, trials=10000, rng_seed=None, sampling="iid"):
     """
     Run Monte Carlo trials. Each trial simulate 'balls' balls until either wicket or balls exhausted.
+    Outcomes for all trials are sampled as one batch; see sample_duel_arrays.
+    sampling picks the uniform scheme (see sample_uniforms); the estimates are unbiased in every mode.
     Returns summary dict.
     """
+    total_runs, dismissed = sample_duel_arrays(model, balls=balls, trials=trials, rng=rng_seed, sampling=sampling)
+    return summarize_trials(total_runs, dismissed, balls)
+
+def duel_shard(task):
+    """One shard of simulate_duel_parallel: (runs histogram, dismissals). Top level so it pickles."""
+    model, balls, trials, seed_seq, sampling = task
+    total_runs, dismissed = sample_duel_arrays(model, balls=balls, trials=trials,
+                                               rng=np.random.default_rng(seed_seq), sampling=sampling)
+    return np.bincount(total_runs), int(dismissed.sum())
+
+def simulate_duel_parallel(model, balls=6, trials=10000, rng_seed=None, workers=0, sampling="iid",
+                           shard_trials=SHARD_TRIALS):
+    """
+    simulate_duel sharded over a process pool (workers=0: all CPUs). Shard i uses the i-th
+    SeedSequence child of rng_seed, so a given seed returns the same result for any worker count.
+    Shards only send back runs histograms and dismissal counts; percentiles come from the merged histogram.
+    Sampling schemes apply within each shard. Raises ValueError for fewer than one trial.
+    """
+    if trials < 1:
+        raise ValueError(f"trials must be at least 1, got {trials}")
+    tasks = [(model, balls, size, child, sampling) for size, child in shard_plan(trials, rng_seed, shard_trials)]
+    shards = run_shards(duel_shard, tasks, workers)
+    histogram = merge_histograms([hist for hist, _ in shards])
+    dismissal_prob = sum(d for _, d in shards) / trials
+    return {
+        'trials': trials,
+        'balls': balls,
+        'survival_probability': 1.0 - dismissal_prob,
+        'expected_runs': histogram_mean(histogram),
+        'dismissal_probability': dismissal_prob,
+        'runs_p50': histogram_percentile(histogram, 50),
+        'runs_p10': histogram_percentile(histogram, 10),
+        'runs_p90': histogram_percentile(histogram, 90),
+    }
+
+# Adaptive mode: first batch size, default trial cap and the z for reported confidence intervals
+ADAPTIVE_BATCH = 2000
+ADAPTIVE_MAX_TRIALS = 200000
+CONFIDENCE_Z = 1.96
+
+def standard_errors(n, dismissals, runs_sum, runs_sq_sum):
+    """
+    SEs of survival probability and expected runs after n trials. The probability uses the
+    (x+1)/(n+2) estimate so a run of all-survived (or all-out) batches doesn't look converged.
+    """
+    p = (dismissals + 1) / (n + 2)
+    mean = runs_sum / n
+    var = max(0.0, runs_sq_sum / n - mean * mean) * n / max(1, n - 1)
+    return math.sqrt(p * (1 - p) / n), math.sqrt(var / n)
+
+def wilson_interval(successes, n, z=CONFIDENCE_Z):
+    p = successes / n
+    centre = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return [max(0.0, centre - half), min(1.0, centre + half)]
+
+def simulate_duel_adaptive(model, balls=6, target_se=0.002, target_runs_se=None,
+                           max_trials=ADAPTIVE_MAX_TRIALS, rng_seed=None, batch=ADAPTIVE_BATCH):
+    """
+    Samples in batches until the survival probability's standard error is at most target_se and
+    the expected runs' at most target_runs_se (either may be None) or max_trials is reached.
+    Each batch after the first is sized from the current variance estimate to land on the target.
+    Percentiles come from the accumulated runs histogram.
+    Returns the simulate_duel summary plus 'converged', 'standard_errors' and 95% 'confidence_intervals'.
+    Raises ValueError for a target that isn't positive or a max_trials below 1.
+    """
+    for name, target in (('target_se', target_se), ('target_runs_se', target_runs_se)):
+        if target is not None and not target > 0:
+            raise ValueError(f"{name} must be positive, got {target}")
+    if max_trials < 1:
+        raise ValueError(f"max_trials must be at least 1, got {max_trials}")
+    rng = rng_seed if isinstance(rng_seed, np.random.Generator) else np.random.default_rng(rng_seed)
+    histogram = np.zeros(max(outcome_table(model)[0]) * balls + 1, dtype=np.int64)
+    n = dismissals = 0
+    runs_sum = runs_sq_sum = 0.0
+    size = min(batch, max_trials)
+    while True:
+        total_runs, dismissed = sample_duel_arrays(model, balls=balls, trials=size, rng=rng)
+        n += size
+        dismissals += int(dismissed.sum())
+        runs_sum += float(total_runs.sum())
+        runs_sq_sum += float(np.dot(total_runs, total_runs))
+        histogram += np.bincount(total_runs, minlength=len(histogram))
+
+        se_prob, se_runs = standard_errors(n, dismissals, runs_sum, runs_sq_sum)
+        converged = ((target_se is None or se_prob <= target_se)
+                     and (target_runs_se is None or se_runs <= target_runs_se))
+        if converged or n >= max_trials:
+            break
+        # trials needed scale with (se / target)^2
+        needed = n * (se_prob / target_se) ** 2 if target_se is not None else 0
+        if target_runs_se is not None:
+            needed = max(needed, n * (se_runs / target_runs_se) ** 2)
+        size = int(min(max_trials - n, max(batch, math.ceil(needed) - n)))
+
+    pmf = histogram / n
+    dismissal_prob = dismissals / n
+    expected_runs = runs_sum / n
+    dismissal_ci = wilson_interval(dismissals, n)
+    return {
+        'trials': n,
+        'balls': balls,
+        'survival_probability': 1.0 - dismissal_prob,
+        'expected_runs': expected_runs,
+        'dismissal_probability': dismissal_prob,
+        'runs_p50': distribution_percentile(pmf, 50),
+        'runs_p10': distribution_percentile(pmf, 10),
+        'runs_p90': distribution_percentile(pmf, 90),
+        'converged': converged,
+        'standard_errors': {'survival_probability': se_prob, 'expected_runs': se_runs},
+        'confidence_intervals': {
+            'survival_probability': [1.0 - dismissal_ci[1], 1.0 - dismissal_ci[0]],
+            'dismissal_probability': dismissal_ci,
+            'expected_runs': [expected_runs - CONFIDENCE_Z * se_runs, expected_runs + CONFIDENCE_Z * se_runs],
+        },
+    }
+
+def simulate_duel_loop_arrays(model, balls=6, trials=10000, rng_seed=None):
+    """
+    Reference per-ball loop engine, kept for benchmarking and cross-checking the vectorized engine.
+    Returns (total_runs, dismissed) arrays of length trials.
+    """
     if rng_seed is not None:
         random.seed(rng_seed)
         np.random.seed(rng_seed)
@@ -218,14 +528,11 @@ def simulate_duel(model, balls=6, trials=10000, rng_seed=None):
 
     total_runs = np.zeros(trials, dtype=float)
     dismissed = np.zeros(trials, dtype=int)
-    balls_used = np.zeros(trials, dtype=int)
 
     for t in range(trials):
         runs = 0.0
         out_flag = 0
-        used = 0
         for b in range(balls):
-            used += 1
             # first check wicket
             if random.random() < p_wicket:
                 out_flag = 1
@@ -235,25 +542,58 @@ def simulate_duel(model, balls=6, trials=10000, rng_seed=None):
             runs += r
         total_runs[t] = runs
         dismissed[t] = out_flag
-        balls_used[t] = used
+    return total_runs, dismissed
+
+def simulate_duel_loop(model, balls=6, trials=10000, rng_seed=None):
+    """Loop-engine counterpart of simulate_duel with the same summary dict."""
+    total_runs, dismissed = simulate_duel_loop_arrays(model, balls=balls, trials=trials, rng_seed=rng_seed)
+    return summarize_trials(total_runs, dismissed, balls)
 
-    surv_prob = 1.0 - dismissed.mean()
-    exp_runs = total_runs.mean()
-    dismissal_prob = dismissed.mean()
-    # percentiles
-    runs_p50 = np.percentile(total_runs, 50)
-    runs_p90 = np.percentile(total_runs, 90)
-    runs_p10 = np.percentile(total_runs, 10)
+def duel_runs_distribution(model, balls=6):
+    """
+    Exact runs distribution of a duel by dynamic programming over (balls, runs, out).
 
+    Returns (survived, dismissed) arrays indexed by total runs: survived[r] is the probability
+    of batting all balls with r runs, dismissed[r] of being out with r runs on the board.
+    """
+    run_values, cdf = outcome_table(model)
+    pmf = np.diff(cdf, prepend=0.0)
+    max_runs = int(run_values.max()) * balls
+
+    survived = np.zeros(max_runs + 1)
+    survived[0] = 1.0
+    dismissed = np.zeros(max_runs + 1)
+    for _ in range(balls):
+        dismissed += pmf[0] * survived
+        after = np.zeros_like(survived)
+        for r, p in zip(run_values[1:], pmf[1:]):
+            if p > 0:
+                after[r:] += p * survived[:len(survived) - r]
+        survived = after
+    return survived, dismissed
+
+def distribution_percentile(pmf, q):
+    """Smallest run total whose cumulative probability reaches q percent."""
+    cum = np.cumsum(pmf)
+    return float(np.searchsorted(cum, q / 100.0 - 1e-12, side='left'))
+
+def solve_duel_exact(model, balls=6):
+    """
+    Exact alternative to simulate_duel: same summary fields with no sampling noise.
+    'trials' is None since nothing is sampled.
+    """
+    survived, dismissed = duel_runs_distribution(model, balls=balls)
+    pmf = survived + dismissed
+    dismissal_prob = float(dismissed.sum())
     return {
-        'trials': trials,
+        'trials': None,
         'balls': balls,
-        'survival_probability': surv_prob,
-        'expected_runs': float(exp_runs),
+        'survival_probability': 1.0 - dismissal_prob,
+        'expected_runs': float(np.dot(np.arange(len(pmf)), pmf)),
         'dismissal_probability': dismissal_prob,
-        'runs_p50': float(runs_p50),
-        'runs_p10': float(runs_p10),
-        'runs_p90': float(runs_p90)
+        'runs_p50': distribution_percentile(pmf, 50),
+        'runs_p10': distribution_percentile(pmf, 10),
+        'runs_p90': distribution_percentile(pmf, 90)
     }
 
 def pretty_reason(batter_row, bowler_row, model):
@@ -266,39 +606,136 @@ def pretty_reason(batter_row, bowler_row, model):
     parts.append(f"Expected runs/ball ≈ {model['expected_runs_per_ball']:.3f}")
     return " vs ".join(parts)
 
+# Settings each kind of duel runs without: exact solves don't sample, adaptive runs size themselves
+# and sample iid, fixed-count runs have no adaptive cap
+UNUSED_SETTINGS = {
+    'exact': ('trials', 'sampling', 'workers', 'target_se', 'target_runs_se', 'max_trials'),
+    'adaptive': ('trials', 'sampling', 'workers'),
+    'mc': ('max_trials',),
+}
+
+def duel_kind(mode, target_se=None, target_runs_se=None):
+    if mode == 'exact':
+        return 'exact'
+    return 'adaptive' if target_se is not None or target_runs_se is not None else 'mc'
+
+def unused_settings(kind, **settings):
+    """Names of the settings given (not None; iid sampling counts as none) that a `kind` duel would ignore."""
+    if settings.get('sampling') == 'iid':
+        settings['sampling'] = None
+    return [name for name in UNUSED_SETTINGS[kind] if settings.get(name) is not None]
+
+@instrumented("monte_carlo_duel")
 def main_cli():
     parser = argparse.ArgumentParser(description="Monte Carlo Batsman vs Bowler Duel Simulator")
-    parser.add_argument("--batsman", required=True, help="Batsman name (partial matches allowed)")
-    parser.add_argument("--bowler", required=True, help="Bowler name (partial matches allowed)")
+    parser.add_argument("--batsman", help="Batsman name (partial matches allowed)")
+    parser.add_argument("--bowler", help="Bowler name (partial matches allowed)")
     parser.add_argument("--format", default="ODI", help="Format: ODI/T20/TEST (default ODI)")
     parser.add_argument("--balls", type=int, default=6, help="Number of balls to simulate (default 6)")
-    parser.add_argument("--trials", type=int, default=10000, help="Monte Carlo trials (default 10000)")
+    parser.add_argument("--trials", type=int, default=None, help="Monte Carlo trials (default 10000)")
     parser.add_argument("--seed", type=int, default=None, help="Random seed (optional)")
+    parser.add_argument("--mode", choices=["mc", "exact"], default="mc",
+                        help="mc = Monte Carlo sampling, exact = Markov-chain solver (default mc)")
+    parser.add_argument("--sampling", choices=SAMPLING_MODES, default=None,
+                        help="Uniform sampling scheme for mc mode: iid, antithetic or stratified (default iid)")
+    parser.add_argument("--target-se", type=float, default=None,
+                        help="Adaptive mode: sample until the survival probability's standard error is at most this")
+    parser.add_argument("--target-runs-se", type=float, default=None,
+                        help="Adaptive mode: also require this standard error on expected runs")
+    parser.add_argument("--max-trials", type=int, default=None,
+                        help=f"Adaptive mode: trial cap (default {ADAPTIVE_MAX_TRIALS})")
+    parser.add_argument("--no-h2h", action="store_true", help="Ignore the pair's head-to-head record")
+    parser.add_argument("--form", choices=FORM_CHOICES, default="career",
+                        help="Weight player rates towards recent form: last10 innings, 12m / 24m months or "
+                             "decay (exponentially decayed); default career")
+    parser.add_argument("--batch", metavar="JSON",
+                        help="Run many duels from a JSON request file ('-' for stdin) and print JSON; see duel_batch.py")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="mc mode: shard trials over N processes (0 = all CPUs); same seed, same result for any N")
+    add_arguments(parser)
     args = parser.parse_args()
-
-    df = load_features()
-    batter_row = find_player_row(df, args.batsman, args.format)
-    bowler_row = find_player_row(df, args.bowler, args.format)
+    if args.batch is None and not (args.batsman and args.bowler):
+        parser.error("--batsman and --bowler are required unless --batch is given")
+    kind = duel_kind(args.mode, args.target_se, args.target_runs_se)
+    unused = unused_settings(kind, trials=args.trials, sampling=args.sampling, workers=args.workers,
+                             target_se=args.target_se, target_runs_se=args.target_runs_se, max_trials=args.max_trials)
+    if args.batch is None and unused:
+        flags = ", ".join("--" + name.replace("_", "-") for name in unused)
+        parser.error(f"{flags} can't be used with {kind} duels" if kind != 'mc' else f"{flags} needs --target-se or --target-runs-se")
+    args.trials = 10000 if args.trials is None else args.trials
+    args.sampling = args.sampling or "iid"
+    args.max_trials = ADAPTIVE_MAX_TRIALS if args.max_trials is None else args.max_trials
+    configure_from_args(args)
+    annotate(**{k: v for k, v in vars(args).items() if k not in ("metrics", "profile")})
+
+    # a career-form duel is answered from the feature store without building a DataFrame
+    store = current_store() if args.form == "career" and args.batch is None else None
+    if store is None:
+        with stage("load_features", form=args.form):
+            df = load_features(form=args.form)
+    if args.batch is not None:
+        import json
+        from duel_batch import run_batch
+
+        if args.batch == "-":
+            request = json.load(sys.stdin)
+        else:
+            with open(args.batch, "r", encoding="utf-8") as f:
+                request = json.load(f)
+        with stage("batch"), profiled("batch"):
+            result = run_batch(request, df)
+        print(json.dumps(result, indent=1))
+        return
+    with stage("build_model", format=args.format):
+        if store is not None:
+            batter_row = store.find_row(args.batsman, args.format)
+            bowler_row = store.find_row(args.bowler, args.format)
+            h2h = False if args.no_h2h else head_to_head_record(batter_row, bowler_row, args.format, store) or False
+            model = build_ball_model(batter_row, bowler_row, None, fmt=args.format,
+                                     baselines=store.baselines(args.format), h2h=h2h)
+        else:
+            batter_row = find_player_row(df, args.batsman, args.format)
+            bowler_row = find_player_row(df, args.bowler, args.format)
+            model = build_ball_model(batter_row, bowler_row, df, fmt=args.format, h2h=False if args.no_h2h else None)
 
     if batter_row is None:
         print(f"⚠️ Batsman '{args.batsman}' not found for format {args.format}. Try partial name or check player_features.csv")
     if bowler_row is None:
         print(f"⚠️ Bowler '{args.bowler}' not found for format {args.format}.")
 
-    model = build_ball_model(batter_row, bowler_row, df)
-    sim = simulate_duel(model, balls=args.balls, trials=args.trials, rng_seed=args.seed)
+    with stage("simulate", format=args.format, mode=args.mode), profiled("simulate"):
+        if args.mode == "exact":
+            sim = solve_duel_exact(model, balls=args.balls)
+        elif args.target_se is not None or args.target_runs_se is not None:
+            sim = simulate_duel_adaptive(model, balls=args.balls, target_se=args.target_se,
+                                         target_runs_se=args.target_runs_se, max_trials=args.max_trials,
+                                         rng_seed=args.seed)
+        elif args.workers is not None:
+            sim = simulate_duel_parallel(model, balls=args.balls, trials=args.trials, rng_seed=args.seed,
+                                         workers=args.workers, sampling=args.sampling)
+        else:
+            sim = simulate_duel(model, balls=args.balls, trials=args.trials, rng_seed=args.seed,
+                                sampling=args.sampling)
+        count("trials", sim['trials'] or 0)
 
     print("\n=== Monte Carlo Duel Results ===")
     print(f"Batsman: {args.batsman}")
     print(f"Bowler: {args.bowler}")
     print(f"Format: {args.format}")
+    print(f"Form: {args.form}")
     print(f"Balls simulated per trial: {args.balls}")
-    print(f"Trials: {args.trials}")
+    print(f"Trials: {sim['trials'] if sim['trials'] is not None else 'exact (no sampling)'}")
     print()
     print(f"Survival probability (no dismissal in {args.balls} balls): {sim['survival_probability']:.3%}")
     print(f"Dismissal probability during duel: {sim['dismissal_probability']:.3%}")
     print(f"Expected runs in duel: {sim['expected_runs']:.3f}")
     print(f"Runs distribution (p10 / p50 / p90): {sim['runs_p10']:.1f} / {sim['runs_p50']:.1f} / {sim['runs_p90']:.1f}")
+    if 'confidence_intervals' in sim:
+        ci, se = sim['confidence_intervals'], sim['standard_errors']
+        print(f"95% CI survival: {ci['survival_probability'][0]:.3%} - {ci['survival_probability'][1]:.3%} (SE {se['survival_probability']:.4f})")
+        print(f"95% CI expected runs: {ci['expected_runs'][0]:.3f} - {ci['expected_runs'][1]:.3f} (SE {se['expected_runs']:.4f})")
+        if not sim['converged']:
+            print(f"⚠️ Target precision not reached within {args.max_trials} trials")
     print()
     print("Reasoning (approx):")
     print(pretty_reason(batter_row, bowler_row, model))
@@ -0,0 +1,72 @@
+"""
+Deterministic multi-core Monte Carlo.
+
+Trials are split into fixed-size shards (SHARD_TRIALS, independent of the worker count) and shard i
+samples from the i-th child stream spawned from SeedSequence(seed). Shards run on a process pool
+and send back only integer counts and histograms, which are summed in shard order, so one seed gives
+bit-identical results on 1 worker or 32. Percentiles are read off the merged histograms and match
+np.percentile over the raw per-trial values.
+
+Used by monte_carlo_duel.simulate_duel_parallel and match_simulator.simulate_match(workers=...).
+"""
+
+import os
+
+import numpy as np
+
+SHARD_TRIALS = 50_000
+
+def resolve_workers(workers):
+    """Worker count for a --workers value (0 or None = all CPUs)."""
+    return workers if workers and workers > 0 else (os.cpu_count() or 1)
+
+def shard_plan(trials, seed=None, shard_trials=SHARD_TRIALS):
+    """[(trials, SeedSequence)] per shard; depends only on trials, seed and shard size."""
+    sizes = [shard_trials] * (trials // shard_trials)
+    if trials % shard_trials:
+        sizes.append(trials % shard_trials)
+    seed_seq = seed if isinstance(seed, np.random.SeedSequence) else np.random.SeedSequence(seed)
+    return list(zip(sizes, seed_seq.spawn(len(sizes))))
+
+def run_shards(fn, tasks, workers=None):
+    """fn over tasks, in order; on a process pool when more than one worker and one task."""
+    workers = min(resolve_workers(workers), len(tasks))
+    if workers <= 1:
+        return [fn(task) for task in tasks]
+    # imported here: it pulls in multiprocessing, which single-process callers never need
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(fn, tasks))
+
+def merge_histograms(histograms):
+    """Sums integer histograms of possibly different lengths."""
+    merged = np.zeros(max(len(h) for h in histograms), dtype=np.int64)
+    for h in histograms:
+        merged[:len(h)] += h
+    return merged
+
+def histogram_percentile(hist, q):
+    """np.percentile(values, q) (linear interpolation) for the values counted in hist[value]."""
+    n = int(hist.sum())
+    cum = np.cumsum(hist)
+    pos = (n - 1) * (q / 100.0)
+    lo = int(np.floor(pos))
+    below = float(np.searchsorted(cum, lo, side='right'))
+    above = float(np.searchsorted(cum, min(lo + 1, n - 1), side='right'))
+    t = pos - lo
+    # same lerp as numpy, so results are bit-identical with np.percentile
+    diff = above - below
+    return above - diff * (1 - t) if t >= 0.5 else below + diff * t
+
+def histogram_mean(hist):
+    return float(np.dot(np.arange(len(hist)), hist) / hist.sum())
+
+def histogram_distribution(hist):
+    """{'mean', 'p10', 'p50', 'p90'} of the values counted in hist."""
+    return {
+        'mean': histogram_mean(hist),
+        'p10': histogram_percentile(hist, 10),
+        'p50': histogram_percentile(hist, 50),
+        'p90': histogram_percentile(hist, 90),
+    }
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Pipeline orchestrator: extract -> clean -> features in one process.
+
+Runs the three processing steps as a DAG, handing DataFrames from stage to stage in memory
+instead of writing and re-reading the balls table between scripts. Outputs are persisted only
+once every stage has succeeded, so a failed run leaves the previous artifacts untouched.
+The files written are the same ones the standalone scripts produce.
+
+A stage is skipped when its key matches the last run and its outputs are still on disk as
+they were left. The key is a hash of:
+ - the stage's code version (the source of the modules it runs)
+ - its input: the content hash of the match files for extract, the upstream stage's key otherwise
+Match files are hashed once; later runs reuse the stored sha256 while a file's size and mtime are
+unchanged. A no-op rebuild therefore only stats the corpus. A skipped stage's outputs are
+read back from disk only if a later stage has to run.
+
+State lives in data/pipeline_state.json; --force ignores it.
+
+Usage:
+  python processing/pipeline.py [--workers 1] [--force] [--metrics PATH] [--profile]
+"""
+
+import argparse
+import hashlib
+import os
+import time
+
+from incremental import read_json, write_json, new_delta
+from instrumentation import add_arguments, configure_from_args, count, instrumented, profiled, stage
+from player_registry import assign_ids, load_registry, save_registry
+from table_io import STORAGE, data_dir, find_table, read_table, write_table
+import clean_players
+import extract_cricsheet
+import feature_store
+import generate_player_features
+import head_to_head
+import league_baselines
+import recent_form
+
+BASE_PATH = data_dir()
+STATE_FILE = os.path.join(BASE_PATH, "pipeline_state.json")
+
+# Stage -> modules whose source makes up its code version (pipeline.py is part of every stage)
+STAGE_CODE = {
+    'extract': [extract_cricsheet, clean_players, 'table_io', 'incremental'],
+    'clean': [clean_players, 'player_registry', 'incremental'],
+    'features': [generate_player_features, head_to_head, league_baselines, recent_form, feature_store,
+                 'player_metrics', 'player_registry', 'table_io'],
+}
+STAGES = ['extract', 'clean', 'features']
+
+def module_path(module):
+    if isinstance(module, str):
+        return os.path.join(os.path.dirname(os.path.abspath(__file__)), module + ".py")
+    return os.path.abspath(module.__file__)
+
+def code_version(stage_name):
+    sha = hashlib.sha256()
+    for path in sorted({module_path(m) for m in STAGE_CODE[stage_name]} | {os.path.abspath(__file__)}):
+        with open(path, "rb") as f:
+            sha.update(os.path.basename(path).encode() + b"\0" + f.read())
+    return sha.hexdigest()
+
+def stage_key(stage_name, input_hash):
+    payload = f"{stage_name}\0{code_version(stage_name)}\0{STORAGE}\0{input_hash}"
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def corpus_hash(tasks, known):
+    """
+    Content hash of the match files, plus {manifest key: fingerprint}. Fingerprints in `known`
+    are reused while a file's size and mtime are unchanged, so only new or touched files are read.
+    """
+    sha = hashlib.sha256()
+    files = {}
+    for file_path, match_format in tasks:
+        key = extract_cricsheet.manifest_key(file_path)
+        entry = extract_cricsheet.file_fingerprint(file_path, match_format, digest=False)
+        old = known.get(key)
+        if old is not None and old.get("sha256") and (old["size"], old["mtime"]) == (entry["size"], entry["mtime"]):
+            entry["sha256"] = old["sha256"]
+        else:
+            entry = extract_cricsheet.file_fingerprint(file_path, match_format)
+        files[key] = entry
+        sha.update(f"{key}\0{match_format}\0{entry['sha256']}\n".encode())
+    return sha.hexdigest(), files
+
+def output_paths(stage_name):
+    """Files a stage leaves on disk (tables resolved to their current storage)."""
+    if stage_name == 'extract':
+        return [os.path.join(BASE_PATH, "matches.csv"), os.path.join(BASE_PATH, "players.csv"),
+                find_table("balls", BASE_PATH), extract_cricsheet.MANIFEST_FILE, extract_cricsheet.DELTA_FILE]
+    if stage_name == 'clean':
+        return [clean_players.OUTPUT_MAPPING_FILE, clean_players.CLEAN_DELTA_FILE]
+    return [generate_player_features.OUTPUT_FILE, find_table(head_to_head.H2H_TABLE, BASE_PATH),
+            league_baselines.BASELINES_FILE, generate_player_features.STATE_FILE, recent_form.FORM_FILE,
+            feature_store.STORE_FILE] \
+        + (recent_form.stats_paths(BASE_PATH) or [None])
+
+def output_versions(stage_name):
+    """{path: [size, mtime_ns]} for a stage's outputs, or None if any is missing."""
+    versions = {}
+    for path in output_paths(stage_name):
+        if path is None or not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        versions[path] = [stat.st_size, stat.st_mtime_ns]
+    return versions
+
+def up_to_date(state, stage_name, key):
+    previous = state['stages'].get(stage_name)
+    return previous is not None and previous['key'] == key and previous['outputs'] == output_versions(stage_name)
+
+# --- Stages: each takes its upstream results and returns its own; nothing is written here ---
+def run_extract(tasks, workers):
+    matches_df, balls_df, players_df, manifest = extract_cricsheet.extract_frames(tasks, workers=workers)
+    return {'matches': matches_df, 'balls': balls_df, 'players': players_df, 'manifest': manifest,
+            'delta': new_delta(full_rebuild=True)}
+
+def run_clean(players_df, extract_delta, registry):
+    mapping_df = clean_players.player_mapping(players_df)
+    assign_ids(registry, mapping_df['clean_name'])
+    count("players", len(mapping_df))
+    delta = new_delta(full_rebuild=True)
+    delta['source_delta_id'] = extract_delta['delta_id']
+    return {'mapping': mapping_df, 'delta': delta}
+
+def run_features(balls_df, days, clean_delta, registry):
+    # the balls already carry clean names (see extract_cricsheet.canonical_categorical)
+    with profiled("features"):
+        features_df = generate_player_features.compute_features(balls_df)
+    assign_ids(registry, features_df['player_name'])
+    generate_player_features.add_player_ids(features_df, registry)
+    h2h = head_to_head.build_head_to_head(balls_df, registry)
+    form_stats = recent_form.build_stats(balls_df, days)
+    count("players", len(features_df))
+    count("pairs", len(h2h))
+    return {'features': features_df, 'head_to_head': h2h, 'form_stats': form_stats,
+            'form': recent_form.form_features(form_stats), 'state': {'source_delta_id': clean_delta['delta_id']}}
+
+# --- Reading a skipped stage's results back, when a later stage needs them ---
+def load_extracted():
+    import pandas as pd
+    return {'players': pd.read_csv(os.path.join(BASE_PATH, "players.csv")),
+            'balls': read_table("balls", columns=generate_player_features.REQUIRED_COLUMNS, base_path=BASE_PATH),
+            'delta': read_json(extract_cricsheet.DELTA_FILE)}
+
+def load_cleaned():
+    return {'delta': read_json(clean_players.CLEAN_DELTA_FILE)}
+
+def persist(results, registry, registry_changed):
+    """Writes every stage result that was produced in this run, in pipeline order."""
+    if 'extract' in results:
+        r = results['extract']
+        r['matches'].to_csv(os.path.join(BASE_PATH, "matches.csv"), index=False)
+        r['players'].to_csv(os.path.join(BASE_PATH, "players.csv"), index=False)
+        write_table(r['balls'], "balls", BASE_PATH)
+        write_json(extract_cricsheet.MANIFEST_FILE, extract_cricsheet.manifest_payload(r['manifest']))
+        write_json(extract_cricsheet.DELTA_FILE, r['delta'])
+    if registry_changed:
+        save_registry(registry)
+    if 'clean' in results:
+        r = results['clean']
+        r['mapping'][['player_name', 'clean_name']].to_csv(clean_players.OUTPUT_MAPPING_FILE, index=False)
+        write_json(clean_players.CLEAN_DELTA_FILE, r['delta'])
+    if 'features' in results:
+        r = results['features']
+        h2h_path = head_to_head.save_table(r['head_to_head'], BASE_PATH)
+        r['features'].to_csv(generate_player_features.OUTPUT_FILE, index=False)
+        league_baselines.write_baselines(r['features'], generate_player_features.OUTPUT_FILE)
+        feature_store.write_store(r['features'], feature_store.STORE_FILE, source_path=generate_player_features.OUTPUT_FILE,
+                                  head_to_head=r['head_to_head'], head_to_head_path=h2h_path)
+        recent_form.save_stats(r['form_stats'], BASE_PATH)
+        recent_form.save_form(r['form'], registry)
+        write_json(generate_player_features.STATE_FILE, r['state'])
+
+@instrumented("pipeline")
+def run_pipeline(workers=1, force=False):
+    """Runs the stages that are out of date and persists their outputs. Returns {stage: 'ran' | 'skipped'}."""
+    start = time.perf_counter()
+    os.makedirs(BASE_PATH, exist_ok=True)
+    state = read_json(STATE_FILE) or {'files': {}, 'stages': {}}
+    if force:
+        state['stages'] = {}
+
+    with stage("fingerprint"):
+        tasks = extract_cricsheet.list_match_files()
+        input_hash, files = corpus_hash(tasks, state['files'])
+        count("files", len(tasks))
+    keys = {}
+    for name in STAGES:
+        keys[name] = stage_key(name, input_hash)
+        input_hash = keys[name]
+
+    # a stage runs when it is out of date or anything upstream of it runs
+    outcome = {}
+    upstream_ran = False
+    for name in STAGES:
+        upstream_ran = upstream_ran or not up_to_date(state, name, keys[name])
+        outcome[name] = 'ran' if upstream_ran else 'skipped'
+    if all(v == 'skipped' for v in outcome.values()):
+        state['files'] = files
+        write_json(STATE_FILE, state)
+        print(f"✅ Everything up to date ({len(tasks)} match files checked in {time.perf_counter() - start:.2f}s)")
+        return outcome
+
+    results = {}
+    extracted = None
+    registry = load_registry()
+    registry_size = len(registry)
+    if outcome['extract'] == 'ran':
+        print(f"🔹 extract: parsing {len(tasks)} match files")
+        with stage("extract"):
+            results['extract'] = extracted = run_extract(tasks, workers)
+    if outcome['clean'] == 'ran':
+        print("🔹 clean: building the player name mapping")
+        with stage("clean"):
+            extracted = extracted or load_extracted()
+            results['clean'] = run_clean(extracted['players'], extracted['delta'], registry)
+    if outcome['features'] == 'ran':
+        print("🔹 features: building player features and head-to-head matrix")
+        with stage("features"):
+            extracted = extracted or load_extracted()
+            cleaned = results.get('clean') or load_cleaned()
+            days = recent_form.days_from_matches(extracted['matches']) if 'extract' in results else recent_form.match_days()
+            results['features'] = run_features(extracted['balls'], days, cleaned['delta'], registry)
+    for name, status in outcome.items():
+        if status == 'skipped':
+            print(f"⏭️ {name}: inputs and code unchanged, skipped")
+
+    with stage("persist"):
+        persist(results, registry, len(registry) != registry_size)
+
+    state['files'] = files
+    for name in results:
+        state['stages'][name] = {'key': keys[name], 'outputs': output_versions(name)}
+    write_json(STATE_FILE, state)
+    print(f"✅ Pipeline complete in {time.perf_counter() - start:.2f}s "
+          f"(ran: {', '.join(results)}; outputs in {BASE_PATH})")
+    return outcome
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run extract -> clean -> features in one process, skipping unchanged stages")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Parallel parser processes for extraction (default 1, 0 = all CPUs)")
+    parser.add_argument("--force", action="store_true", help="Rerun every stage regardless of the saved state")
+    add_arguments(parser)
+    args = parser.parse_args()
+    configure_from_args(args)
+    run_pipeline(workers=args.workers or os.cpu_count(), force=args.force)
@@ -0,0 +1,90 @@
+"""
+Per-ball indicators and the batting / bowling metrics derived from additive counts.
+
+A leaf module: generate_player_features (career features) and recent_form (recency windows)
+both build on these, so neither has to import the other for them.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Additive counts behind the derived metrics; these are what an incremental run sums up
+BATTING_COUNTS = ['balls_faced', 'runs_scored', 'fours', 'sixes', 'dismissals']
+BOWLING_COUNTS = ['balls_bowled', 'runs_conceded', 'wickets', 'dot_balls']
+
+def ball_indicators(df):
+    """
+    Per-ball indicator columns for the aggregations, computed once with array ops so every
+    batting/bowling aggregate is a native groupby sum or size rather than a Python lambda.
+    """
+    # keep the stored (narrow) dtypes; groupby sums accumulate in int64 regardless
+    runs_batter = df['runs_batter'].to_numpy()
+    runs_total = df['runs_total'].to_numpy()
+    return pd.DataFrame({
+        'format': df['format'],
+        'batter': df['batter'],
+        'bowler': df['bowler'],
+        'runs_batter': runs_batter,
+        'runs_total': runs_total,
+        'is_wicket': df['is_wicket'].to_numpy(),
+        'is_four': runs_batter == 4,
+        'is_six': runs_batter == 6,
+        'is_dismissal': df['player_out'].notna().to_numpy(),
+        'is_dot': runs_total == 0,
+    }, index=df.index)
+
+def add_batting_metrics(batting):
+    """
+    Derived batting metrics from the additive counts.
+    """
+    runs = batting['runs_scored'].to_numpy(dtype=float)
+    balls = batting['balls_faced'].to_numpy(dtype=float)
+    dismissals = batting['dismissals'].to_numpy(dtype=float)
+    boundaries = (batting['fours'] + batting['sixes']).to_numpy(dtype=float)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        batting['strike_rate'] = runs / balls * 100
+        batting['boundary_percent'] = boundaries / balls * 100
+        batting['dismissal_probability'] = dismissals / balls
+    # not out in every innings: average falls back to runs scored
+    batting['batting_average'] = np.divide(runs, dismissals, out=runs.copy(), where=dismissals > 0)
+
+    return batting[['format', 'batter'] + BATTING_COUNTS + ['strike_rate', 'boundary_percent', 'batting_average', 'dismissal_probability']]
+
+def add_bowling_metrics(bowling):
+    """
+    Derived bowling metrics from the additive counts.
+    """
+    balls = bowling['balls_bowled'].to_numpy(dtype=float)
+    runs = bowling['runs_conceded'].to_numpy(dtype=float)
+    overs = balls / 6
+
+    bowling['overs_bowled'] = overs
+    bowling['economy_rate'] = np.divide(runs, overs, out=np.zeros_like(runs), where=overs > 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bowling['wicket_probability'] = bowling['wickets'].to_numpy(dtype=float) / balls
+        bowling['dot_ball_percent'] = bowling['dot_balls'].to_numpy(dtype=float) / balls * 100
+
+    return bowling
+
+def merge_features(batting_df, bowling_df):
+    """
+    Merges batting and bowling tables into one row per (format, player).
+    """
+    features_df = pd.merge(
+        batting_df,
+        bowling_df,
+        left_on=['format', 'batter'],
+        right_on=['format', 'bowler'],
+        how='outer'
+    )
+
+    # Clean column names after merge (bowl-only players have no batter key)
+    features_df['batter'] = features_df['batter'].fillna(features_df['bowler'])
+    features_df = features_df.rename(columns={'batter': 'player_name'})
+    features_df.drop(columns=['bowler'], inplace=True)
+
+    # Fill NaNs with 0 for numerical fields
+    numeric_cols = features_df.select_dtypes(include=[np.number]).columns
+    features_df[numeric_cols] = features_df[numeric_cols].fillna(0)
+    return features_df
@@ -0,0 +1,196 @@
+"""
+Player registry and name index.
+
+ - Registry: stable integer player IDs for clean player names, kept in data/player_registry.csv.
+   IDs are only ever appended, so an ID keeps meaning the same player across rebuilds.
+ - PlayerIndex: lookup structures over a player_features table, built once per DataFrame:
+     * exact (format, lower-case name) hash -> O(1)
+     * trigram postings for the case-insensitive "contains" match the duel CLI promises -> O(k)
+     * sorted name tokens for prefix typeahead -> O(log n + k)
+
+Usage:
+  python processing/player_registry.py build          # assign IDs from player_mapping.csv / players.csv
+  python processing/player_registry.py search kohli --format ODI
+"""
+
+import argparse
+import bisect
+import os
+
+from table_io import data_dir
+
+BASE_PATH = data_dir()
+REGISTRY_FILE = os.path.join(BASE_PATH, "player_registry.csv")
+MAPPING_FILE = os.path.join(BASE_PATH, "player_mapping.csv")
+PLAYERS_FILE = os.path.join(BASE_PATH, "players.csv")
+
+NGRAM = 3
+
+# --- Registry ---
+def load_registry(path=None):
+    """Returns {player_name: player_id} (empty if no registry yet)."""
+    import pandas as pd
+
+    path = path or REGISTRY_FILE
+    if not os.path.exists(path):
+        return {}
+    df = pd.read_csv(path)
+    return dict(zip(df['player_name'], df['player_id'].astype(int)))
+
+def assign_ids(registry, names):
+    """
+    Adds names not yet in registry (in sorted order, after the current max ID), in place.
+    Returns the number of names added.
+    """
+    new_names = sorted({n for n in names if isinstance(n, str)} - set(registry))
+    next_id = max(registry.values(), default=0) + 1
+    for offset, name in enumerate(new_names):
+        registry[name] = next_id + offset
+    return len(new_names)
+
+def save_registry(registry, path=None):
+    import pandas as pd
+
+    path = path or REGISTRY_FILE
+    out = pd.DataFrame(sorted(registry.items(), key=lambda kv: kv[1]), columns=['player_name', 'player_id'])
+    out[['player_id', 'player_name']].to_csv(path, index=False)
+    return path
+
+def update_registry(names, path=None):
+    """
+    Assigns IDs to names not yet registered (see assign_ids) and saves the registry.
+    Returns the full {player_name: player_id} map.
+    """
+    path = path or REGISTRY_FILE
+    registry = load_registry(path)
+    if assign_ids(registry, names) or not os.path.exists(path):
+        save_registry(registry, path)
+    return registry
+
+def registry_source_names():
+    """Clean names from player_mapping.csv, falling back to raw names in players.csv."""
+    import pandas as pd
+
+    if os.path.exists(MAPPING_FILE):
+        return pd.read_csv(MAPPING_FILE)['clean_name']
+    return pd.read_csv(PLAYERS_FILE)['player_name']
+
+# --- Name index ---
+def ngrams(text):
+    return {text[i:i + NGRAM] for i in range(len(text) - NGRAM + 1)}
+
+class PlayerIndex:
+    """Name lookups over a player_features DataFrame; row positions refer to df.iloc."""
+
+    def __init__(self, df):
+        self.df = df
+        formats = df['format'].astype(str).str.upper().to_numpy()
+        names = df['player_name'].to_numpy(dtype=object)
+
+        self.lower = {}    # position -> lower-case name
+        self.exact = {}    # (FORMAT, lower name) -> first position
+        self.by_format = {}  # FORMAT -> positions, in row order
+        self.grams = {}    # FORMAT -> {ngram: positions, in row order}
+        self.tokens = {}   # FORMAT -> sorted [(token, position)]
+        for pos, (fmt, name) in enumerate(zip(formats, names)):
+            if not isinstance(name, str):
+                continue
+            low = name.lower()
+            self.lower[pos] = low
+            self.exact.setdefault((fmt, low), pos)
+            self.by_format.setdefault(fmt, []).append(pos)
+            postings = self.grams.setdefault(fmt, {})
+            for gram in ngrams(low):
+                postings.setdefault(gram, []).append(pos)
+            self.tokens.setdefault(fmt, []).extend((token, pos) for token in low.split())
+        for entries in self.tokens.values():
+            entries.sort()
+        self._columns = None  # [(column, values)] for record(), built on first use
+
+    def contains(self, query, fmt):
+        """Positions (in row order) of names in fmt containing query, case-insensitive."""
+        q = query.lower()
+        fmt = fmt.upper()
+        if len(q) < NGRAM:
+            candidates = self.by_format.get(fmt, [])
+        else:
+            postings = self.grams.get(fmt, {})
+            lists = [postings.get(gram) for gram in ngrams(q)]
+            if any(lst is None for lst in lists):
+                return []
+            candidates = min(lists, key=len)
+        return [pos for pos in candidates if q in self.lower[pos]]
+
+    def find(self, query, fmt):
+        """Row position of the exact (case-insensitive) match, else the first partial match, else None."""
+        pos = self.exact.get((fmt.upper(), query.lower()))
+        if pos is not None:
+            return pos
+        matches = self.contains(query, fmt)
+        return matches[0] if matches else None
+
+    def record(self, pos):
+        """
+        df.iloc[pos].to_dict() without building a row Series: values come from per-column lists made on
+        first use, with a nullable column's missing values as None, as iloc gives them.
+        """
+        if self._columns is None:
+            import pandas as pd
+
+            self._columns = []
+            for col in self.df.columns:
+                values = self.df[col].tolist()
+                if getattr(self.df[col].dtype, 'na_value', None) is pd.NA:
+                    values = [None if v is pd.NA else v for v in values]
+                self._columns.append((col, values))
+        return {col: values[pos] for col, values in self._columns}
+
+    def suggest(self, prefix, fmt, limit=10):
+        """Distinct names in fmt with a word starting with prefix, for typeahead."""
+        p = prefix.lower().strip()
+        if not p:
+            return []
+        entries = self.tokens.get(fmt.upper(), [])
+        names = []
+        seen = set()
+        i = bisect.bisect_left(entries, (p,))
+        while i < len(entries) and entries[i][0].startswith(p) and len(names) < limit:
+            pos = entries[i][1]
+            name = self.df['player_name'].iat[pos]
+            if name not in seen:
+                seen.add(name)
+                names.append(name)
+            i += 1
+        return names
+
+_index_cache = []
+
+def index_for(df):
+    """PlayerIndex for df, built on first use and reused for the same DataFrame object."""
+    for cached_df, index in _index_cache:
+        if cached_df is df:
+            return index
+    index = PlayerIndex(df)
+    _index_cache.insert(0, (df, index))
+    del _index_cache[4:]
+    return index
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Player registry and name index")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("build", help="Assign IDs to any unregistered players")
+    search = sub.add_parser("search", help="Typeahead search over player_features.csv")
+    search.add_argument("prefix")
+    search.add_argument("--format", default="ODI")
+    search.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        registry = update_registry(registry_source_names())
+        print(f"✅ {len(registry)} players registered in {REGISTRY_FILE}")
+    else:
+        import pandas as pd
+
+        features = pd.read_csv(os.path.join(BASE_PATH, "player_features.csv"))
+        for player in index_for(features).suggest(args.prefix, args.format, args.limit):
+            print(player)
@@ -0,0 +1,429 @@
+"""
+Recency-windowed player features ("form"), kept as mergeable sufficient statistics.
+
+Career features weigh a debut season the same as last month. This module keeps, per (format, player),
+the additive batting/bowling counts behind those features (see player_metrics) in three statistics
+tables, each of which merges with a newer batch of deliveries without revisiting old balls:
+ - form_innings  per-innings counts of the player's last FORM_INNINGS batting and bowling innings
+ - form_months   counts bucketed by calendar month of the match date
+ - form_decay    counts weighted by 0.5 ** (age / HALF_LIFE_DAYS), stored at the player's latest
+                 match day; merging rescales both sides to the later day before adding
+Months older than the longest month window before a player's latest match are dropped, so every
+table is bounded by the number of players, not the length of their careers.
+
+The tables are partitioned by format and a hash bucket of the player name (FORM_BUCKETS per format),
+one file per table and partition under data/form_stats/. An incremental run reads, merges and
+rewrites only the partitions of players in its batch, and dates its innings from the new matches
+alone (extract_cricsheet's matches_delta.csv); a full run dates them from matches.csv. It also
+recomputes player_form rows for those partitions only (see update_form).
+
+player_form.csv is derived from the tables as of the latest match day in the data, with the career
+metric columns for each window:
+ - last10_*  last FORM_INNINGS innings (batting and bowling innings counted separately)
+ - m12_* / m24_*  the 12 / 24 calendar months up to and including the latest match's month
+ - ewm_*     exponentially decayed counts (balls columns are then effective balls)
+
+A player with no balls in a window gets 0 in its columns. form_weighted() blends a window into the
+career features for the duel model, trusting it more the more balls it rests on.
+
+Usage:
+  python processing/recent_form.py "V Kohli" --format ODI
+"""
+
+import argparse
+import os
+import shutil
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from incremental import read_json, write_json
+from player_metrics import (BATTING_COUNTS, BOWLING_COUNTS, add_batting_metrics, add_bowling_metrics,
+                            ball_indicators, merge_features)
+from table_io import data_dir, find_table, read_table, write_table
+
+BASE_PATH = data_dir()
+MATCHES_FILE = os.path.join(BASE_PATH, "matches.csv")
+MATCHES_DELTA_FILE = os.path.join(BASE_PATH, "matches_delta.csv")
+FORM_FILE = os.path.join(BASE_PATH, "player_form.csv")
+# Statistics partitions (tables named <table>-<format>-<bucket> in this folder) and their list
+STATS_DIR = "form_stats"
+PARTITIONS_FILE = "partitions.json"
+FORM_BUCKETS = 16
+
+FORM_INNINGS = 10
+MONTH_WINDOWS = (12, 24)
+HALF_LIFE_DAYS = 365
+
+PLAYER_KEY = ['format', 'player_name']
+INNINGS_KEY = PLAYER_KEY + ['match_id', 'inning']
+COUNTS = BATTING_COUNTS + BOWLING_COUNTS
+
+# Window columns taken from the career metric builders (counts that are not rates stay out, except balls)
+BATTING_WINDOW_COLUMNS = ['balls_faced', 'strike_rate', 'boundary_percent', 'batting_average', 'dismissal_probability']
+BOWLING_WINDOW_COLUMNS = ['balls_bowled', 'economy_rate', 'wicket_probability', 'dot_ball_percent']
+
+# --form name -> column prefix in player_form.csv
+WINDOWS = {'last10': 'last10_', '12m': 'm12_', '24m': 'm24_', 'decay': 'ewm_'}
+# Window balls at which the window's rate gets half the weight against the career rate
+FORM_PRIOR_BALLS = 120
+
+def days_from_matches(matches_df):
+    """DataFrame of (format, match_id, day): the match's first date as a day ordinal (days since 1970-01-01)."""
+    dates = pd.to_datetime(matches_df['date'], errors='coerce')
+    days = pd.DataFrame({
+        'format': matches_df['format'].astype(str),
+        'match_id': matches_df['match_id'].astype(str),
+        'day': (dates - pd.Timestamp("1970-01-01")).dt.days,
+    })
+    return days.dropna(subset=['day']).astype({'day': np.int64})
+
+def match_days(matches_path=MATCHES_FILE):
+    """days_from_matches for matches.csv (or an incremental run's matches_delta.csv)."""
+    try:
+        matches = pd.read_csv(matches_path, usecols=['match_id', 'format', 'date'], dtype={'match_id': str})
+    except pd.errors.EmptyDataError:
+        # an incremental extraction that only removed matches
+        matches = pd.DataFrame({'match_id': [], 'format': [], 'date': []})
+    return days_from_matches(matches)
+
+def month_of(day):
+    """Months since January 1970 for a day ordinal (array-like)."""
+    months = pd.to_datetime(np.asarray(day, dtype=np.int64), unit="D")
+    return np.asarray((months.year - 1970) * 12 + months.month - 1, dtype=np.int64)
+
+def decay_factor(age_days):
+    return 0.5 ** (np.asarray(age_days, dtype=float) / HALF_LIFE_DAYS)
+
+def innings_counts(balls_df, days):
+    """
+    Batting and bowling counts per (format, player, match, inning) with the match day.
+    Deliveries of matches without a usable date are left out.
+    """
+    ind = ball_indicators(balls_df)
+    # grouped as categoricals; the keys become plain strings only once there is a row per innings
+    ind['match_id'] = balls_df['match_id'].astype('category')
+    ind['inning'] = balls_df['inning'].to_numpy()
+
+    keys = ['format', 'match_id', 'inning']
+    grouped = ind.groupby(keys + ['batter'], observed=True)
+    batting = grouped[['runs_batter', 'is_four', 'is_six', 'is_dismissal']].sum()
+    batting.columns = BATTING_COUNTS[1:]
+    batting.insert(0, 'balls_faced', grouped.size())
+    batting = batting.reset_index().rename(columns={'batter': 'player_name'})
+
+    grouped = ind.groupby(keys + ['bowler'], observed=True)
+    bowling = grouped[['runs_total', 'is_wicket', 'is_dot']].sum()
+    bowling.columns = BOWLING_COUNTS[1:]
+    bowling.insert(0, 'balls_bowled', grouped.size())
+    bowling = bowling.reset_index().rename(columns={'bowler': 'player_name'})
+
+    innings = pd.merge(batting, bowling, on=keys + ['player_name'], how='outer')
+    innings[['format', 'match_id', 'player_name']] = innings[['format', 'match_id', 'player_name']].astype(str)
+    innings[COUNTS] = innings[COUNTS].fillna(0).astype(np.int64)
+    innings = innings.merge(days, on=['format', 'match_id'], how='inner')
+    return innings[INNINGS_KEY + ['day'] + COUNTS]
+
+def trim_innings(innings, n=FORM_INNINGS):
+    """Keeps each player's last n batting innings and last n bowling innings."""
+    innings = innings.sort_values(PLAYER_KEY + ['day', 'match_id', 'inning'], ignore_index=True)
+    keep = np.zeros(len(innings), dtype=bool)
+    for balls in ('balls_faced', 'balls_bowled'):
+        played = innings[balls].to_numpy() > 0
+        rank = innings[played].groupby(PLAYER_KEY, sort=False).cumcount(ascending=False).to_numpy()
+        keep[np.flatnonzero(played)[rank < n]] = True
+    return innings[keep].reset_index(drop=True)
+
+def decayed(frame, ref_day):
+    """frame's counts decayed from their own 'day' to ref_day (both aligned to frame's rows)."""
+    factor = decay_factor(np.asarray(ref_day) - frame['day'].to_numpy())
+    return frame[COUNTS].to_numpy(dtype=float) * factor[:, None]
+
+def decay_to_latest(frame):
+    """One decayed row per player: every row of frame decayed to the player's latest day and summed."""
+    ref = frame.groupby(PLAYER_KEY)['day'].transform('max').to_numpy()
+    decay = pd.DataFrame(decayed(frame, ref), columns=COUNTS)
+    decay[PLAYER_KEY] = frame[PLAYER_KEY].to_numpy()
+    decay['day'] = ref
+    decay = decay.groupby(PLAYER_KEY + ['day'], as_index=False, sort=True)[COUNTS].sum()
+    return decay[PLAYER_KEY + ['day'] + COUNTS]
+
+def prune_months(months, decay):
+    """Drops month rows no window can reach: older than the longest window before the player's latest day."""
+    latest = months[PLAYER_KEY].merge(decay[PLAYER_KEY + ['day']], on=PLAYER_KEY, how='left')['day']
+    oldest = month_of(latest.fillna(0).to_numpy()) - max(MONTH_WINDOWS)
+    return months[months['month'].to_numpy() > oldest].reset_index(drop=True)
+
+def stats_from_innings(innings):
+    """The three statistics tables for one batch of innings."""
+    months = innings[PLAYER_KEY + COUNTS].copy()
+    months['month'] = month_of(innings['day'])
+    months = months.groupby(PLAYER_KEY + ['month'], as_index=False, sort=True)[COUNTS].sum()
+    decay = decay_to_latest(innings)
+
+    return {'innings': trim_innings(innings), 'months': prune_months(months, decay), 'decay': decay}
+
+def build_stats(balls_df, days):
+    """Statistics tables for a balls table (or a delta of one)."""
+    print("📊 Generating recent form statistics...")
+    return stats_from_innings(innings_counts(balls_df, days))
+
+def merge_decay(old, new):
+    return decay_to_latest(pd.concat([old, new], ignore_index=True))
+
+def merge_months(old, new):
+    return pd.concat([old, new], ignore_index=True).groupby(PLAYER_KEY + ['month'], as_index=False, sort=True)[COUNTS].sum()
+
+def merge_innings(old, new):
+    return trim_innings(pd.concat([old, new], ignore_index=True))
+
+MERGERS = {'innings': merge_innings, 'months': merge_months, 'decay': merge_decay}
+
+def player_mask(frame, players):
+    return pd.MultiIndex.from_frame(frame[PLAYER_KEY].astype(object)).isin(players)
+
+def merge_stats(existing, delta):
+    """
+    Folds a newer batch's statistics into existing ones. Only rows of players in the batch are
+    recombined; everyone else's rows are carried over untouched.
+    """
+    players = pd.MultiIndex.from_frame(delta['decay'][PLAYER_KEY].astype(object))
+    merged = {}
+    for name, merge in MERGERS.items():
+        old = existing[name]
+        touched = player_mask(old, players)
+        merged[name] = pd.concat([old[~touched], merge(old[touched], delta[name])], ignore_index=True) \
+            .sort_values(PLAYER_KEY, kind="stable", ignore_index=True)
+    merged['months'] = prune_months(merged['months'], merged['decay'])
+    return merged
+
+# --- Storage: one file per table and (format, player bucket) partition ---
+TABLES = ('innings', 'months', 'decay')
+
+def player_buckets(frame):
+    """The partition bucket of each row's player: a stable hash of the name, so runs and processes agree."""
+    codes, names = pd.factorize(frame['player_name'])
+    buckets = np.array([zlib.crc32(str(name).encode("utf-8")) % FORM_BUCKETS for name in names], dtype=np.int64)
+    return buckets[codes]
+
+def partitions_of(stats):
+    """{(format, bucket): statistics tables of that partition's players}"""
+    parts = {}
+    for name in TABLES:
+        frame = stats[name]
+        for (fmt, bucket), rows in frame.groupby([frame['format'].to_numpy(), player_buckets(frame)], sort=True):
+            part = parts.setdefault((fmt, int(bucket)), {n: stats[n].iloc[:0] for n in TABLES})
+            part[name] = rows.reset_index(drop=True)
+    return parts
+
+def partition_table(name, key):
+    fmt, bucket = key
+    return os.path.join(STATS_DIR, f"{name}-{fmt}-{bucket:02d}")
+
+def stored_partitions(base_path=None):
+    """The stored partitions as a set of (format, bucket), or None if the tables haven't been built."""
+    listing = read_json(os.path.join(base_path or BASE_PATH, STATS_DIR, PARTITIONS_FILE))
+    if listing is None or listing.get('buckets') != FORM_BUCKETS:
+        return None
+    return {(fmt, bucket) for fmt, bucket in listing['partitions']}
+
+def stats_exist(base_path=None):
+    return stored_partitions(base_path) is not None
+
+def stats_paths(base_path=None):
+    """Files of the stored statistics (None for a missing partition table); empty if there are none."""
+    partitions = stored_partitions(base_path)
+    if partitions is None:
+        return []
+    base_path = base_path or BASE_PATH
+    return [os.path.join(base_path, STATS_DIR, PARTITIONS_FILE)] + [
+        find_table(partition_table(name, key), base_path) for key in sorted(partitions) for name in TABLES]
+
+def load_partition(key, base_path=None):
+    part = {}
+    for name in TABLES:
+        df = read_table(partition_table(name, key), base_path=base_path or BASE_PATH)
+        df[['format', 'player_name']] = df[['format', 'player_name']].astype(object)
+        if 'match_id' in df.columns:
+            df['match_id'] = df['match_id'].astype(object)
+        part[name] = df
+    return part
+
+def save_partitions(parts, partitions, base_path=None):
+    """Writes the given partitions' tables, then the list of every stored partition."""
+    base_path = base_path or BASE_PATH
+    os.makedirs(os.path.join(base_path, STATS_DIR), exist_ok=True)
+    paths = [write_table(part[name], partition_table(name, key), base_path)
+             for key, part in parts.items() for name in TABLES]
+    write_json(os.path.join(base_path, STATS_DIR, PARTITIONS_FILE),
+               {'buckets': FORM_BUCKETS, 'partitions': sorted([fmt, bucket] for fmt, bucket in partitions)})
+    return paths
+
+def load_stats(base_path=None):
+    """Every stored partition's statistics as three tables, or None if they haven't been built."""
+    partitions = stored_partitions(base_path)
+    if partitions is None:
+        return None
+    parts = [load_partition(key, base_path) for key in sorted(partitions)]
+    if not parts:
+        return stats_from_innings(pd.DataFrame({c: pd.Series(dtype=object if c in INNINGS_KEY[:3] else np.int64)
+                                                for c in INNINGS_KEY + ['day'] + COUNTS}))
+    return {name: pd.concat([part[name] for part in parts], ignore_index=True) for name in TABLES}
+
+def save_stats(stats, base_path=None):
+    """Replaces the stored statistics with `stats` (a full run)."""
+    base_path = base_path or BASE_PATH
+    shutil.rmtree(os.path.join(base_path, STATS_DIR), ignore_errors=True)
+    parts = partitions_of(stats)
+    return save_partitions(parts, parts.keys(), base_path)
+
+def update_stats(delta, base_path=None):
+    """
+    Folds a newer batch's statistics into the stored ones. Only the partitions of players in the
+    batch are read, merged and rewritten; the others are never loaded. Returns the statistics of
+    the rewritten partitions.
+    """
+    base_path = base_path or BASE_PATH
+    partitions = stored_partitions(base_path)
+    parts = partitions_of(delta)
+    for key in parts:
+        if key in partitions:
+            parts[key] = merge_stats(load_partition(key, base_path), parts[key])
+    save_partitions(parts, partitions | parts.keys(), base_path)
+    return {name: pd.concat([part[name] for part in parts.values()], ignore_index=True) for name in TABLES}
+
+def window_features(counts, prefix):
+    """Career metric builders over a window's summed counts, with prefixed column names."""
+    batting = counts.loc[counts['balls_faced'] > 0, PLAYER_KEY + BATTING_COUNTS]
+    bowling = counts.loc[counts['balls_bowled'] > 0, PLAYER_KEY + BOWLING_COUNTS]
+    batting = add_batting_metrics(batting.rename(columns={'player_name': 'batter'}).reset_index(drop=True))
+    bowling = add_bowling_metrics(bowling.rename(columns={'player_name': 'bowler'}).reset_index(drop=True))
+    features = merge_features(batting, bowling)
+    features = features[PLAYER_KEY + BATTING_WINDOW_COLUMNS + BOWLING_WINDOW_COLUMNS]
+    return features.rename(columns={c: prefix + c for c in BATTING_WINDOW_COLUMNS + BOWLING_WINDOW_COLUMNS})
+
+def last_innings_counts(innings, n=FORM_INNINGS):
+    """Summed counts of each player's last n batting innings (batting) and bowling innings (bowling)."""
+    innings = innings.sort_values(PLAYER_KEY + ['day', 'match_id', 'inning'], ignore_index=True)
+    parts = []
+    for balls, counts in (('balls_faced', BATTING_COUNTS), ('balls_bowled', BOWLING_COUNTS)):
+        played = innings[innings[balls] > 0]
+        played = played[played.groupby(PLAYER_KEY, sort=False).cumcount(ascending=False) < n]
+        parts.append(played.groupby(PLAYER_KEY, as_index=False)[counts].sum())
+    return pd.merge(parts[0], parts[1], on=PLAYER_KEY, how='outer').fillna(0)
+
+def form_features(stats, as_of=None):
+    """
+    player_form rows (one per format and player) from the statistics tables, as of a day ordinal
+    (default: the latest match day in them). Month windows reaching past the stored months (see
+    prune_months) only count what is stored, so as_of shouldn't be before the latest day.
+    """
+    if as_of is None:
+        as_of = int(stats['decay']['day'].max()) if len(stats['decay']) else 0
+    windows = [window_features(last_innings_counts(stats['innings']), WINDOWS['last10'])]
+
+    months = stats['months']
+    current_month = month_of([as_of])[0]
+    for span in MONTH_WINDOWS:
+        recent = months[(months['month'] > current_month - span) & (months['month'] <= current_month)]
+        counts = recent.groupby(PLAYER_KEY, as_index=False)[COUNTS].sum()
+        windows.append(window_features(counts, WINDOWS[f"{span}m"]))
+
+    decay = stats['decay']
+    counts = pd.DataFrame(decayed(decay, np.full(len(decay), as_of)), columns=COUNTS)
+    counts[PLAYER_KEY] = decay[PLAYER_KEY].to_numpy()
+    windows.append(window_features(counts, WINDOWS['decay']))
+
+    form = windows[0]
+    for window in windows[1:]:
+        form = form.merge(window, on=PLAYER_KEY, how='outer')
+    form = form.fillna(0).sort_values(PLAYER_KEY, ignore_index=True)
+    form.insert(2, 'as_of', (pd.Timestamp("1970-01-01") + pd.Timedelta(days=as_of)).date().isoformat())
+    return form
+
+def day_of(date):
+    """Day ordinal of an ISO date (player_form's as_of)."""
+    return (pd.Timestamp(date) - pd.Timestamp("1970-01-01")).days
+
+def update_form(form_df, touched):
+    """
+    player_form rows after an incremental run, from the previous rows and the statistics of the
+    partitions it rewrote (update_stats). Rows of those partitions are recomputed; every other
+    player's rows are carried over with their decayed totals rescaled to the new as_of (the decayed
+    rates are ratios of counts sharing one factor, so they don't move). Returns None when as_of
+    moves into another month, which shifts everyone's month windows: recompute from load_stats then.
+    """
+    previous = day_of(form_df['as_of'].iloc[0]) if len(form_df) else None
+    latest = int(touched['decay']['day'].max()) if len(touched['decay']) else previous
+    if previous is None or latest is None:
+        return None
+    as_of = max(previous, latest)
+    if month_of([as_of])[0] != month_of([previous])[0]:
+        return None
+
+    recomputed = form_features(touched, as_of)
+    carried = form_df.drop(columns=['player_id'], errors='ignore')
+    carried = carried[~player_mask(carried, pd.MultiIndex.from_frame(touched['decay'][PLAYER_KEY].astype(object)))].copy()
+    # totals rather than rates: the balls, and a batting average that fell back to runs (no dismissals)
+    ewm = WINDOWS['decay']
+    factor = decay_factor(as_of - previous)
+    carried[[ewm + 'balls_faced', ewm + 'balls_bowled']] *= factor
+    carried.loc[carried[ewm + 'dismissal_probability'] == 0, ewm + 'batting_average'] *= factor
+    carried['as_of'] = recomputed['as_of'].iloc[0] if len(recomputed) else carried['as_of']
+    return pd.concat([carried, recomputed], ignore_index=True).sort_values(PLAYER_KEY, ignore_index=True)
+
+def save_form(form_df, registry=None, path=None):
+    """Writes player_form.csv (with registry IDs next to the names when given)."""
+    path = path or FORM_FILE
+    if registry is not None and 'player_id' not in form_df.columns:
+        form_df = form_df.copy()
+        form_df.insert(2, 'player_id', form_df['player_name'].map(registry).astype('Int64'))
+    form_df.to_csv(path, index=False)
+    return path
+
+def load_form(path=None):
+    path = path or FORM_FILE
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"player_form.csv not found at {path}. Run generate_player_features.py first.")
+    return pd.read_csv(path)
+
+def form_weighted(features_df, form_df, window, prior_balls=FORM_PRIOR_BALLS):
+    """
+    Career features with the duel model's rate columns pulled towards a window's, with weight
+    window balls / (window balls + prior_balls) (batting and bowling weighted separately).
+    Keeps features_df's attrs, so league baselines still come from the career file.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f"Unknown form window: {window}. Expected one of {', '.join(WINDOWS)}")
+    prefix = WINDOWS[window]
+    columns = [prefix + c for c in BATTING_WINDOW_COLUMNS + BOWLING_WINDOW_COLUMNS]
+    form = form_df[PLAYER_KEY + columns].astype({'format': str, 'player_name': str})
+    weighted = features_df.merge(form, on=PLAYER_KEY, how='left')
+    weighted[columns] = weighted[columns].fillna(0)
+
+    for balls, rates in (('balls_faced', BATTING_WINDOW_COLUMNS[1:]), ('balls_bowled', BOWLING_WINDOW_COLUMNS[1:])):
+        window_balls = weighted[prefix + balls].to_numpy(dtype=float)
+        weight = window_balls / (window_balls + prior_balls)
+        for rate in rates:
+            if rate in weighted.columns:
+                weighted[rate] = (1 - weight) * weighted[rate].to_numpy(dtype=float) \
+                    + weight * weighted[prefix + rate].to_numpy(dtype=float)
+    weighted = weighted.drop(columns=columns)
+    weighted.attrs.update(features_df.attrs)
+    weighted.attrs['form'] = window
+    return weighted
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show a player's recency-windowed form")
+    parser.add_argument("player", help="Exact clean player name")
+    parser.add_argument("--format", default="ODI")
+    args = parser.parse_args()
+
+    form = load_form()
+    rows = form[(form['player_name'] == args.player) & (form['format'].str.upper() == args.format.upper())]
+    if rows.empty:
+        print(f"⚠️ No {args.format.upper()} form for {args.player}.")
+    else:
+        for key, value in rows.iloc[0].items():
+            print(f"{key}: {value}")
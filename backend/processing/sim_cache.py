@@ -0,0 +1,172 @@
+"""
+Result cache for duel and match simulations.
+
+A bounded LRU with a TTL, optionally backed by a SQLite file so results survive worker restarts
+(and are shared between the workers of one server). Keys hash everything a result depends on:
+the players' IDs, format, balls / trials / seed, the model's tuning constants and the versions of
+player_features.csv and the head-to-head table. Regenerating the features changes the key, so
+stale entries are never served; the memory tier is also dropped as soon as a new version shows up.
+Unseeded runs (the web app sends no seed) are cached too, under a seed=None key but only for
+SIM_CACHE_UNSEEDED_TTL: a burst of requests for a popular matchup shares one sample, and a later
+request gets a fresh one (see predictor.result_ttl).
+
+Configured from the environment by from_env():
+  SIM_CACHE_SIZE   max in-memory entries (default 1024, 0 disables the cache)
+  SIM_CACHE_TTL    seconds an entry stays valid (default 3600)
+  SIM_CACHE_UNSEEDED_TTL  seconds an unseeded run's result stays valid (default 60, 0 = not cached)
+  SIM_CACHE_FILE   SQLite file for the on-disk tier (default: none)
+"""
+
+import copy
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+import monte_carlo_duel
+from head_to_head import H2H_TABLE
+from table_io import find_table
+
+DEFAULT_SIZE = 1024
+DEFAULT_TTL = 3600
+DEFAULT_UNSEEDED_TTL = 60
+# on-disk rows kept per in-memory slot before the oldest are pruned
+DISK_FACTOR = 16
+
+def file_version(path):
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return [os.path.basename(path), stat.st_size, stat.st_mtime_ns]
+
+def data_version(features_path=None):
+    """Versions of the files a simulation reads: player_features.csv and the head-to-head table."""
+    return {
+        'features': file_version(features_path or monte_carlo_duel.PLAYER_FEATURES_CSV),
+        'head_to_head': file_version(find_table(H2H_TABLE)),
+    }
+
+def model_params():
+    """Tuning constants of the per-ball model, read at call time so retuning invalidates the cache."""
+    return {
+        'alpha_wicket': monte_carlo_duel.ALPHA_WICKET,
+        'bowler_pressure_factor': monte_carlo_duel.BOWLER_PRESSURE_FACTOR,
+        'h2h_prior_balls': monte_carlo_duel.H2H_PRIOR_BALLS,
+    }
+
+def make_key(kind, version, **params):
+    """Stable hex key for a simulation of `kind` with the given inputs."""
+    payload = json.dumps({'kind': kind, 'version': version, 'model': model_params(), 'params': params},
+                         sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class SimulationCache:
+    """LRU + TTL cache of JSON-serializable results, with an optional SQLite tier and counters."""
+
+    def __init__(self, max_entries=DEFAULT_SIZE, ttl=DEFAULT_TTL, disk_path=None, clock=time.time,
+                 unseeded_ttl=DEFAULT_UNSEEDED_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.unseeded_ttl = min(unseeded_ttl, ttl)
+        self.clock = clock
+        self.entries = OrderedDict()  # key -> (stored_at, value)
+        self.version = None
+        self.counters = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'stores': 0}
+        self.disk_path = disk_path
+        self._db = None
+        if disk_path:
+            import sqlite3
+
+            self._db = sqlite3.connect(disk_path, timeout=5, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stored_at REAL, value TEXT)")
+
+    def __len__(self):
+        return len(self.entries)
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    def check_version(self, version):
+        """Drops the memory tier when the data version changes (old keys can never match again)."""
+        if version != self.version:
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key):
+        """Cached value (a copy) or None."""
+        if not self.enabled:
+            return None
+        now = self.clock()
+        entry = self.entries.get(key)
+        if entry is not None:
+            if now - entry[0] <= self.ttl:
+                self.entries.move_to_end(key)
+                self.counters['hits'] += 1
+                return copy.deepcopy(entry[1])
+            del self.entries[key]
+            self.counters['expirations'] += 1
+        if self._db is not None:
+            row = self._db.execute("SELECT stored_at, value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is not None and now - row[0] <= self.ttl:
+                value = json.loads(row[1])
+                self._remember(key, row[0], value)
+                self.counters['disk_hits'] += 1
+                return copy.deepcopy(value)
+        self.counters['misses'] += 1
+        return None
+
+    def put(self, key, value, ttl=None):
+        """Stores value for `ttl` seconds (default: the cache's TTL, which is also the longest)."""
+        if not self.enabled:
+            return
+        now = self.clock()
+        # a shorter-lived entry is stored as if it were older, so one age check expires every entry
+        stored_at = now if ttl is None else now - (self.ttl - min(ttl, self.ttl))
+        self._remember(key, stored_at, copy.deepcopy(value))
+        self.counters['stores'] += 1
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?)", (key, stored_at, json.dumps(value, default=float)))
+            if self.counters['stores'] % self.max_entries == 0:
+                self._prune_disk(now)
+
+    def get_or_compute(self, key, compute, ttl=None):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value, ttl)
+        return value
+
+    def _remember(self, key, stored_at, value):
+        self.entries[key] = (stored_at, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.counters['evictions'] += 1
+
+    def _prune_disk(self, now):
+        self._db.execute("DELETE FROM results WHERE stored_at < ?", (now - self.ttl,))
+        self._db.execute(
+            "DELETE FROM results WHERE key IN (SELECT key FROM results ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries * DISK_FACTOR,)
+        )
+
+    def clear(self):
+        self.entries.clear()
+        if self._db is not None:
+            self._db.execute("DELETE FROM results")
+
+    def stats(self):
+        return dict(self.counters, entries=len(self.entries), max_entries=self.max_entries, ttl=self.ttl,
+                    unseeded_ttl=self.unseeded_ttl, disk=self.disk_path)
+
+def from_env():
+    """SimulationCache configured from SIM_CACHE_SIZE / SIM_CACHE_TTL / SIM_CACHE_UNSEEDED_TTL / SIM_CACHE_FILE."""
+    return SimulationCache(
+        max_entries=int(os.environ.get('SIM_CACHE_SIZE', DEFAULT_SIZE)),
+        ttl=float(os.environ.get('SIM_CACHE_TTL', DEFAULT_TTL)),
+        disk_path=os.environ.get('SIM_CACHE_FILE') or None,
+        unseeded_ttl=float(os.environ.get('SIM_CACHE_UNSEEDED_TTL', DEFAULT_UNSEEDED_TTL)),
+    )
@@ -0,0 +1,258 @@
+"""
+Columnar storage for the ball-by-ball tables (balls, balls_delta).
+
+Tables are written as Parquet with dictionary-encoded (categorical) name/team/match columns and
+narrow integer dtypes, so each stage re-reads them without re-parsing repeated strings. Readers can
+project just the columns they need. Appending to a Parquet table turns it into a dataset folder
+(<name>.parquet/) of part files, read back as one table, so an append only writes its own rows.
+CSV stays available, both as a storage fallback (set
+CRICKET_STORAGE=csv or run without pyarrow) and as an explicit export:
+
+  python processing/table_io.py export balls
+"""
+
+import argparse
+import importlib.util
+import os
+import shutil
+
+# pandas (and pyarrow) are imported by the functions that read or write tables, so modules that
+# only need a table's path (find_table) don't pay for them at import
+
+def data_dir():
+    """
+    The data folder every processing script reads and writes: CRICKET_DATA_DIR when set (the
+    benchmarks point it at a scratch folder), else backend/data.
+    """
+    return os.path.abspath(os.environ.get('CRICKET_DATA_DIR') or os.path.join(os.path.dirname(__file__), '..', 'data'))
+
+BASE_PATH = data_dir()
+
+# Column order of the balls tables
+BALL_COLUMNS = [
+    "match_id", "format", "inning", "batting_team", "over", "ball", "batter", "bowler", "non_striker",
+    "runs_batter", "runs_extras", "runs_total", "is_wicket", "wicket_kind", "player_out"
+]
+
+CATEGORICAL_COLUMNS = [
+    "match_id", "format", "batting_team", "batter", "bowler", "non_striker", "wicket_kind", "player_out"
+]
+INTEGER_DTYPES = {
+    "inning": "int8",
+    "over": "int16",
+    "runs_batter": "int8",
+    "runs_extras": "int8",
+    "runs_total": "int8",
+    "is_wicket": "int8",
+}
+
+def parquet_available():
+    return importlib.util.find_spec("pyarrow") is not None
+
+def default_storage():
+    storage = os.environ.get("CRICKET_STORAGE", "parquet").lower()
+    if storage == "parquet" and not parquet_available():
+        print("⚠️ pyarrow is not installed; storing tables as CSV.")
+        return "csv"
+    return storage
+
+STORAGE = default_storage()
+
+EXTENSIONS = {"parquet": ".parquet", "csv": ".csv"}
+
+# Part files of an appended Parquet table; past MAX_PARTS the next append compacts them into one file
+PART_PREFIX = "part-"
+MAX_PARTS = 32
+
+def table_path(name, storage=None, base_path=None):
+    return os.path.join(base_path or BASE_PATH, name + EXTENSIONS[storage or STORAGE])
+
+def find_table(name, base_path=None):
+    """Path of an existing table, preferring the configured storage. None if neither exists."""
+    for storage in (STORAGE, "csv" if STORAGE == "parquet" else "parquet"):
+        path = table_path(name, storage, base_path)
+        if os.path.exists(path):
+            return path
+    return None
+
+def table_exists(name, base_path=None):
+    return find_table(name, base_path) is not None
+
+def table_parts(path):
+    """Part files of a Parquet dataset folder, oldest first."""
+    return sorted(f for f in os.listdir(path) if f.startswith(PART_PREFIX) and f.endswith(".parquet"))
+
+def part_name(index):
+    return f"{PART_PREFIX}{index:05d}.parquet"
+
+def clear_dataset(path):
+    """Removes a dataset folder about to be replaced by a single-file table."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+
+def encode(df):
+    """Casts known columns to categorical / narrow integer dtypes (integers only when null-free)."""
+    import pandas as pd
+
+    df = df.copy()
+    for col in CATEGORICAL_COLUMNS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype("category")
+    for col, dtype in INTEGER_DTYPES.items():
+        if col in df.columns and not df[col].isna().any():
+            df[col] = df[col].astype(dtype)
+    return df
+
+def write_table(df, name, base_path=None, storage=None):
+    """Writes df as table `name` in the given (default: configured) storage."""
+    storage = storage or STORAGE
+    path = table_path(name, storage, base_path)
+    if storage == "parquet":
+        clear_dataset(path)
+        encode(df).to_parquet(path, index=False)
+    else:
+        df.to_csv(path, index=False)
+    return path
+
+def read_table(name, columns=None, base_path=None):
+    """Reads table `name`, loading only `columns` when given."""
+    import pandas as pd
+
+    path = find_table(name, base_path)
+    if path is None:
+        raise FileNotFoundError(f"{name} not found in {base_path or BASE_PATH}")
+    if path.endswith(".parquet"):
+        return pd.read_parquet(path, columns=columns)
+    dtypes = {c: "category" for c in CATEGORICAL_COLUMNS}
+    return encode(pd.read_csv(path, usecols=columns, dtype=dtypes))
+
+def append_table(df, name, base_path=None):
+    """
+    Appends rows to an existing table without reading it: in place for CSV, as a new part file
+    of the dataset folder for Parquet (the first append moves the single file in as part 0).
+    """
+    path = find_table(name, base_path)
+    if path is None:
+        return write_table(df, name, base_path)
+    if path.endswith(".csv"):
+        df.to_csv(path, mode="a", header=False, index=False)
+        return path
+
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if os.path.isfile(path):
+        tmp_dir = path + ".tmp"
+        clear_dataset(tmp_dir)
+        os.makedirs(tmp_dir)
+        os.replace(path, os.path.join(tmp_dir, part_name(0)))
+        os.replace(tmp_dir, path)
+
+    parts = table_parts(path)
+    if len(parts) >= MAX_PARTS:
+        combined = pd.concat([read_table(name, base_path=base_path), df], ignore_index=True)
+        return write_table(combined, name, base_path, storage="parquet")
+    # the first part's schema, so every part has the same columns and types
+    schema = pq.read_schema(os.path.join(path, parts[0]))
+    table = pa.Table.from_pandas(encode(df[schema.names]), schema=schema, preserve_index=False)
+    part = part_name(int(parts[-1][len(PART_PREFIX):-len(".parquet")]) + 1)
+    # dot-prefixed while being written: dataset readers skip hidden files
+    tmp_path = os.path.join(path, "." + part)
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, os.path.join(path, part))
+    return path
+
+def ball_schema():
+    """Fixed Arrow schema for the balls tables, so every streamed chunk writes the same row-group layout."""
+    import pyarrow as pa
+
+    fields = []
+    for col in BALL_COLUMNS:
+        if col in CATEGORICAL_COLUMNS:
+            fields.append((col, pa.dictionary(pa.int32(), pa.string())))
+        elif col in INTEGER_DTYPES:
+            fields.append((col, pa.from_numpy_dtype(INTEGER_DTYPES[col])))
+        else:
+            fields.append((col, pa.float64()))
+    return pa.schema(fields)
+
+class TableWriter:
+    """
+    Streams DataFrame chunks into one table so the whole table never has to be in memory.
+
+    Parquet chunks become row groups of a single file; CSV chunks are appended. The file is written
+    under a temporary name and moved into place on close(), so readers never see a partial table.
+    """
+
+    def __init__(self, name, columns, base_path=None, storage=None, schema=None):
+        self.name = name
+        self.columns = list(columns)
+        self.storage = storage or STORAGE
+        self.path = table_path(name, self.storage, base_path)
+        self.tmp_path = self.path + ".tmp"
+        self.schema = schema
+        self.rows = 0
+        self._writer = None
+        self._started = False
+
+    def write(self, df):
+        df = df[self.columns]
+        if self.storage == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(encode(df), schema=self.schema, preserve_index=False)
+            if self._writer is None:
+                self.schema = table.schema
+                self._writer = pq.ParquetWriter(self.tmp_path, self.schema)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.tmp_path, mode="a" if self._started else "w", header=not self._started, index=False)
+        self._started = True
+        self.rows += len(df)
+
+    def close(self):
+        if not self._started:
+            import pandas as pd
+
+            # keep the header / schema even when there were no rows
+            self.write(pd.DataFrame({c: [] for c in self.columns}))
+        if self._writer is not None:
+            self._writer.close()
+        clear_dataset(self.path)
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            if self._writer is not None:
+                self._writer.close()
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+def ball_table_writer(name, base_path=None):
+    """TableWriter for a balls-shaped table with the fixed ball schema."""
+    storage = STORAGE
+    return TableWriter(name, BALL_COLUMNS, base_path, storage, ball_schema() if storage == "parquet" else None)
+
+def export_csv(name, base_path=None):
+    """Writes table `name` out as CSV alongside the columnar copy."""
+    path = table_path(name, "csv", base_path)
+    read_table(name, base_path=base_path).to_csv(path, index=False)
+    return path
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inspect or export ball-by-ball tables")
+    sub = parser.add_subparsers(dest="command", required=True)
+    export = sub.add_parser("export", help="Export a table to CSV")
+    export.add_argument("names", nargs="+", help="Table names, e.g. balls balls_delta")
+    args = parser.parse_args()
+
+    for table_name in args.names:
+        print(f"✅ Exported {table_name} to {export_csv(table_name)}")
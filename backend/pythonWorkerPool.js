@@ -0,0 +1,193 @@
+const { spawn } = require('child_process');
+const path = require('path');
+const readline = require('readline');
+
+/**
+ * Pool of long-lived Python workers (ml_model/worker.py) speaking JSON lines over stdio.
+ *
+ * Each worker runs one request at a time; extra requests wait in a bounded queue.
+ * A request's timeout runs from when it is queued: one still queued is rejected, one running
+ * has its worker killed. Crashed, timed-out or failed-to-start workers are restarted and their
+ * in-flight request is rejected; if no worker could be started, queued requests are rejected too.
+ */
+class PythonWorkerPool {
+    constructor({
+        script = path.join(__dirname, 'ml_model', 'worker.py'),
+        python = process.env.PYTHON || 'python3',
+        size = 2,
+        maxQueue = 100,
+        requestTimeoutMs = 30000,
+        restartDelayMs = 500,
+    } = {}) {
+        this.script = script;
+        this.python = python;
+        this.size = size;
+        this.maxQueue = maxQueue;
+        this.requestTimeoutMs = requestTimeoutMs;
+        this.restartDelayMs = restartDelayMs;
+        this.workers = [];
+        this.queue = [];
+        this.nextId = 1;
+        this.closed = false;
+    }
+
+    start() {
+        for (let i = 0; i < this.size; i++) {
+            this.workers.push(this._spawn(i));
+        }
+        return this;
+    }
+
+    request(command, args = {}) {
+        if (this.closed) {
+            return Promise.reject(new Error('Worker pool is closed.'));
+        }
+        if (this.queue.length >= this.maxQueue) {
+            const error = new Error('Prediction workers are busy, try again shortly.');
+            error.code = 'POOL_BUSY';
+            return Promise.reject(error);
+        }
+        return new Promise((resolve, reject) => {
+            const job = { id: this.nextId++, command, args, resolve, reject };
+            job.timer = setTimeout(() => this._onTimeout(job), this.requestTimeoutMs);
+            this.queue.push(job);
+            this._dispatch();
+        });
+    }
+
+    close() {
+        this.closed = true;
+        this._rejectQueued('Worker pool is closed.');
+        for (const worker of this.workers) {
+            worker.proc.kill();
+        }
+    }
+
+    _spawn(slot) {
+        const proc = spawn(this.python, [this.script], {
+            cwd: path.dirname(this.script),
+            stdio: ['pipe', 'pipe', 'pipe'],
+        });
+        const worker = { slot, proc, ready: false, job: null, exited: false };
+
+        readline.createInterface({ input: proc.stdout }).on('line', (line) => this._onLine(worker, line));
+        proc.stderr.on('data', (data) => {
+            console.error(`Python Error [worker ${slot}]: ${data.toString()}`);
+        });
+        proc.on('error', (error) => {
+            if (proc.pid !== undefined) {
+                console.error(`Python worker ${slot}:`, error);
+                return;
+            }
+            // It never started, so no 'exit' follows: restart it from here.
+            console.error(`Failed to start Python worker ${slot}:`, error);
+            this._onExit(worker, null, null);
+            if (!this.workers.some((w) => !w.exited)) {
+                this._rejectQueued(`No Python worker could be started (${error.message}).`, 'POOL_UNAVAILABLE');
+            }
+        });
+        // Writing to a worker that has just died fails with EPIPE; its 'exit' rejects the job.
+        proc.stdin.on('error', (error) => {
+            console.error(`Python worker ${slot} stdin: ${error.message}`);
+        });
+        proc.on('exit', (code, signal) => this._onExit(worker, code, signal));
+        return worker;
+    }
+
+    _onLine(worker, line) {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (error) {
+            console.error(`Unparseable output from worker ${worker.slot}: ${line}`);
+            return;
+        }
+        if (message.ready) {
+            worker.ready = true;
+            this._dispatch();
+            return;
+        }
+        const job = worker.job;
+        if (!job || message.id !== job.id) {
+            return;
+        }
+        this._finish(worker);
+        if (message.ok) {
+            job.resolve(message.result);
+        } else {
+            const error = new Error(message.error || 'Prediction failed.');
+            error.code = message.code;
+            job.reject(error);
+        }
+        this._dispatch();
+    }
+
+    _onExit(worker, code, signal) {
+        if (worker.exited) {
+            return;
+        }
+        worker.exited = true;
+        const job = worker.job;
+        this._finish(worker);
+        worker.ready = false;
+        if (job) {
+            job.reject(new Error(`Python worker exited (code ${code}, signal ${signal}).`));
+        }
+        if (this.closed) {
+            return;
+        }
+        console.error(`Python worker ${worker.slot} exited (code ${code}, signal ${signal}); restarting.`);
+        setTimeout(() => {
+            if (!this.closed) {
+                this.workers[worker.slot] = this._spawn(worker.slot);
+            }
+        }, this.restartDelayMs);
+    }
+
+    _finish(worker) {
+        if (worker.job) {
+            clearTimeout(worker.job.timer);
+        }
+        worker.job = null;
+    }
+
+    _onTimeout(job) {
+        const queued = this.queue.indexOf(job);
+        if (queued >= 0) {
+            this.queue.splice(queued, 1);
+            job.reject(new Error(`Request ${job.id} (${job.command}) timed out waiting for a worker.`));
+            return;
+        }
+        const worker = this.workers.find((w) => w.job === job);
+        if (worker) {
+            // A stuck worker can't be trusted with the next request; kill it and let _onExit restart it.
+            console.error(`Request ${job.id} (${job.command}) timed out on worker ${worker.slot}.`);
+            worker.proc.kill('SIGKILL');
+        }
+    }
+
+    _rejectQueued(reason, code) {
+        for (const job of this.queue.splice(0)) {
+            clearTimeout(job.timer);
+            const error = new Error(reason);
+            error.code = code;
+            job.reject(error);
+        }
+    }
+
+    _dispatch() {
+        for (const worker of this.workers) {
+            if (!this.queue.length) {
+                return;
+            }
+            if (!worker.ready || worker.job) {
+                continue;
+            }
+            const job = this.queue.shift();
+            worker.job = job;
+            worker.proc.stdin.write(JSON.stringify({ id: job.id, command: job.command, args: job.args }) + '\n');
+        }
+    }
+}
+
+module.exports = { PythonWorkerPool };
@@ -1,120 +1,190 @@
+const os = require('os');
 const express = require('express');
 const cors = require('cors');
-const { spawn } = require('child_process');
+const { PythonWorkerPool } = require('./pythonWorkerPool');
+const { SimServiceClient } = require('./simServiceClient');
 
 const app = express();
 const PORT = process.env.PORT || 5000;
 
+// Long-lived Python workers: data is loaded once per worker instead of once per request.
+const pool = new PythonWorkerPool({
+    size: parseInt(process.env.PY_WORKERS || '2', 10),
+    maxQueue: parseInt(process.env.PY_MAX_QUEUE || '100', 10),
+    requestTimeoutMs: parseInt(process.env.PY_TIMEOUT_MS || '30000', 10),
+}).start();
+
+// Optional micro-batching simulation service (ml_model/sim_service.py): when SIM_SERVICE_PORT is set,
+// duel and duel-matrix requests go to it so concurrent duels share vectorized batches.
+const simService = process.env.SIM_SERVICE_PORT ? new SimServiceClient({
+    host: process.env.SIM_SERVICE_HOST || '127.0.0.1',
+    port: parseInt(process.env.SIM_SERVICE_PORT, 10),
+    requestTimeoutMs: parseInt(process.env.PY_TIMEOUT_MS || '30000', 10),
+}) : null;
+const simulator = simService || pool;
+
 app.use(cors());
 app.use(express.json());
 
+const sendPoolError = (res, error, message) => {
+    console.error(message, error);
+    if (error.code === 'INVALID_REQUEST') {
+        return res.status(400).json({ error: error.message });
+    }
+    if (['POOL_BUSY', 'POOL_UNAVAILABLE', 'SERVICE_UNAVAILABLE'].includes(error.code)) {
+        return res.status(503).json({ error: error.message });
+    }
+    res.status(500).json({ error: message });
+};
+
+// Process-pool size for sharded simulations: each request would otherwise pick its own (0 = every CPU),
+// so it is kept within 1..CPU count. null (no sharding) passes through; anything else non-numeric is rejected.
+const shardWorkers = (workers) => {
+    if (workers === null || workers === undefined) {
+        return null;
+    }
+    const count = Number(workers);
+    if (!Number.isInteger(count)) {
+        return undefined;
+    }
+    return Math.min(Math.max(count, 1), os.cpus().length);
+};
+
 app.post('/api/simulate/player-vs-player', async (req, res) => {
+    const { player1, player2, format = 't20' } = req.body;
+    if (!player1 || !player2) {
+        return res.status(400).json({ error: 'Please select both players.' });
+    }
     try {
-        const { player1, player2 } = req.body;
-        if (!player1 || !player2) {
-            return res.status(400).json({ error: 'Please select both players.' });
-        }
-        const winner = Math.random() > 0.5 ? player1 : player2;
-        const probability = (Math.random() * 20 + 70).toFixed(2);
-        const pythonProcess = spawn('python3', [
-            'ml_model/predictor.py',
-            'generate_reasoning',
-            JSON.stringify({ winner, opponent: winner === player1 ? player2 : player1, probability, type: 'player' })
-        ]);
-
-        let reasoning = '';
-        pythonProcess.stdout.on('data', (data) => {
-            reasoning += data.toString();
-        });
-        pythonProcess.stderr.on('data', (data) => {
-            console.error(`Python Error: ${data.toString()}`);
-        });
-        pythonProcess.on('close', (code) => {
-            if (code !== 0) {
-                return res.status(500).json({ error: 'Failed to generate reasoning.' });
-            }
-            res.json({
-                winner,
-                probability: `${probability}%`,
-                reasoning: reasoning.trim() || "No specific reasoning available.",
-            });
+        const result = await pool.request('simulate_player_vs_player', { player1, player2, format });
+        res.json({
+            winner: result.winner,
+            probability: result.probability,
+            reasoning: result.reasoning || "No specific reasoning available.",
         });
     } catch (error) {
-        console.error('Error during player simulation:', error);
-        res.status(500).json({ error: 'Internal Server Error' });
+        sendPoolError(res, error, 'Failed to simulate player matchup.');
     }
 });
 
 app.post('/api/simulate/team-vs-team', async (req, res) => {
+    const { team1, team2, format = 't20', trials = 10000, seed = null } = req.body;
+    if (!team1 || team1.length !== 11 || !team2 || team2.length !== 11) {
+        return res.status(400).json({ error: 'Each team must have exactly 11 players.' });
+    }
+    const workers = shardWorkers(req.body.workers);
+    if (workers === undefined) {
+        return res.status(400).json({ error: 'workers must be an integer.' });
+    }
     try {
-        const { team1, team2 } = req.body;
-        if (!team1 || team1.length !== 11 || !team2 || team2.length !== 11) {
-            return res.status(400).json({ error: 'Each team must have exactly 11 players.' });
-        }
-        const winner = Math.random() > 0.5 ? 'Team 1' : 'Team 2';
-        const probability = (Math.random() * 20 + 70).toFixed(2);
-        const pythonProcess = spawn('python3', [
-            'ml_model/predictor.py',
-            'generate_reasoning',
-            JSON.stringify({ winner, teams: { team1, team2 }, probability, type: 'team' })
-        ]);
-
-        let reasoning = '';
-        pythonProcess.stdout.on('data', (data) => {
-            reasoning += data.toString();
-        });
-        pythonProcess.stderr.on('data', (data) => {
-            console.error(`Python Error: ${data.toString()}`);
-        });
-        pythonProcess.on('close', (code) => {
-            if (code !== 0) {
-                return res.status(500).json({ error: 'Failed to generate reasoning.' });
-            }
-            res.json({
-                winner,
-                probability: `${probability}%`,
-                reasoning: reasoning.trim() || "No specific reasoning available.",
-            });
+        const result = await pool.request('simulate_team_vs_team', { team1, team2, format, trials, seed, workers });
+        res.json({
+            winner: result.winner,
+            probability: result.probability,
+            reasoning: result.reasoning || "No specific reasoning available.",
+            simulation: result.simulation,
         });
     } catch (error) {
-        console.error('Error during team simulation:', error);
-        res.status(500).json({ error: 'Internal Server Error' });
+        sendPoolError(res, error, 'Failed to simulate team matchup.');
+    }
+});
+
+app.post('/api/simulate/duel', async (req, res) => {
+    const {
+        batsman, bowler, format = 'ODI', balls = 6, trials = 10000, seed = null, mode = 'mc',
+        target_se = null, target_runs_se = null, max_trials = null, sampling = 'iid',
+    } = req.body;
+    if (!batsman || !bowler) {
+        return res.status(400).json({ error: 'Please provide both a batsman and a bowler.' });
+    }
+    const workers = shardWorkers(req.body.workers);
+    if (workers === undefined) {
+        return res.status(400).json({ error: 'workers must be an integer.' });
+    }
+    try {
+        res.json(await simulator.request('duel', {
+            batsman, bowler, format, balls, trials, seed, mode, target_se, target_runs_se, max_trials, sampling, workers,
+        }));
+    } catch (error) {
+        sendPoolError(res, error, 'Failed to simulate duel.');
+    }
+});
+
+app.post('/api/simulate/duel-matrix', async (req, res) => {
+    const {
+        batters, bowlers, pairs, format = 'ODI', balls = 6, trials = 10000, seed = null, mode = 'mc',
+        sampling = 'iid', crn = false,
+    } = req.body;
+    const hasMatrix = Array.isArray(batters) && batters.length > 0 && Array.isArray(bowlers) && bowlers.length > 0;
+    if (!hasMatrix && !(Array.isArray(pairs) && pairs.length > 0)) {
+        return res.status(400).json({ error: 'Please provide batters and bowlers, or a list of pairs.' });
+    }
+    try {
+        const args = hasMatrix ? { batters, bowlers } : { pairs };
+        res.json(await simulator.request('duel_matrix', { ...args, format, balls, trials, seed, mode, sampling, crn }));
+    } catch (error) {
+        sendPoolError(res, error, 'Failed to simulate duels.');
+    }
+});
+
+// Queue depth, batch sizes, per-request latency and throughput of the simulation service.
+app.get('/api/simulate/metrics', async (req, res) => {
+    if (!simService) {
+        return res.status(404).json({ error: 'The simulation service is not configured (SIM_SERVICE_PORT).' });
+    }
+    try {
+        res.json(await simService.request('metrics'));
+    } catch (error) {
+        sendPoolError(res, error, 'Failed to read simulation metrics.');
+    }
+});
+
+// Result cache counters of whichever worker serves the request (each worker has its own memory tier).
+app.get('/api/cache/stats', async (req, res) => {
+    try {
+        res.json(await pool.request('cache_stats'));
+    } catch (error) {
+        sendPoolError(res, error, 'Failed to read cache stats.');
+    }
+});
+
+app.get('/api/players/search', async (req, res) => {
+    const { q, format = 'ODI', limit = 10 } = req.query;
+    if (!q) {
+        return res.json({ players: [] });
+    }
+    try {
+        res.json({ players: await pool.request('search_players', { query: q, format, limit }) });
+    } catch (error) {
+        sendPoolError(res, error, 'Failed to search players.');
     }
 });
 
 app.post('/api/player-insights', async (req, res) => {
+    const { player } = req.body;
+    if (!player) {
+        return res.status(400).json({ error: 'Please provide a player name.' });
+    }
     try {
-        const { player } = req.body;
-        if (!player) {
-            return res.status(400).json({ error: 'Please provide a player name.' });
-        }
-        const pythonProcess = spawn('python3', [
-            'ml_model/predictor.py',
-            'generate_insights',
-            player
-        ]);
-
-        let insights = '';
-        pythonProcess.stdout.on('data', (data) => {
-            insights += data.toString();
-        });
-        pythonProcess.stderr.on('data', (data) => {
-            console.error(`Python Error: ${data.toString()}`);
-        });
-        pythonProcess.on('close', (code) => {
-            if (code !== 0) {
-                return res.status(500).json({ error: 'Failed to generate insights.' });
-            }
-            res.json({
-                insight: insights.trim() || "Could not generate insights for this player."
-            });
+        const insights = await pool.request('generate_insights', { player });
+        res.json({
+            insight: (insights || '').trim() || "Could not generate insights for this player."
         });
     } catch (error) {
-        console.error('Error generating player insights:', error);
-        res.status(500).json({ error: 'Internal Server Error' });
+        sendPoolError(res, error, 'Failed to generate insights.');
     }
 });
 
-app.listen(PORT, () => {
+const server = app.listen(PORT, () => {
     console.log(`Server is running on http://localhost:${PORT}`);
 });
+
+const shutdown = () => {
+    pool.close();
+    if (simService) {
+        simService.close();
+    }
+    server.close(() => process.exit(0));
+};
+process.on('SIGINT', shutdown);
+process.on('SIGTERM', shutdown);
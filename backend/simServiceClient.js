@@ -0,0 +1,103 @@
+const net = require('net');
+const readline = require('readline');
+
+/**
+ * Client of the simulation service (ml_model/sim_service.py) speaking JSON lines over TCP.
+ *
+ * Unlike the worker pool, many requests share one connection: the service micro-batches them and
+ * answers in any order, matched by id. The connection is opened on first use and reopened after it
+ * drops; requests in flight when it drops are rejected with code SERVICE_UNAVAILABLE.
+ */
+class SimServiceClient {
+    constructor({ host = '127.0.0.1', port = 5100, requestTimeoutMs = 30000 } = {}) {
+        this.host = host;
+        this.port = port;
+        this.requestTimeoutMs = requestTimeoutMs;
+        this.socket = null;
+        this.pending = new Map();
+        this.nextId = 1;
+        this.closed = false;
+    }
+
+    request(command, args = {}) {
+        if (this.closed) {
+            return Promise.reject(new Error('Simulation service client is closed.'));
+        }
+        const socket = this._connect();
+        return new Promise((resolve, reject) => {
+            const id = this.nextId++;
+            const timer = setTimeout(() => {
+                this.pending.delete(id);
+                reject(new Error(`Request ${id} (${command}) to the simulation service timed out.`));
+            }, this.requestTimeoutMs);
+            this.pending.set(id, { resolve, reject, timer });
+            socket.write(JSON.stringify({ id, command, args }) + '\n');
+        });
+    }
+
+    close() {
+        this.closed = true;
+        this._rejectAll('Simulation service client is closed.');
+        if (this.socket) {
+            this.socket.destroy();
+            this.socket = null;
+        }
+    }
+
+    _connect() {
+        if (this.socket) {
+            return this.socket;
+        }
+        const socket = net.createConnection({ host: this.host, port: this.port });
+        socket.setNoDelay(true);
+        // readline re-emits the socket's errors, so they are handled (logged) once, here; 'close' follows.
+        readline.createInterface({ input: socket })
+            .on('line', (line) => this._onLine(line))
+            .on('error', (error) => {
+                console.error(`Simulation service ${this.host}:${this.port}: ${error.message}`);
+            });
+        socket.on('close', () => {
+            if (this.socket === socket) {
+                this.socket = null;
+            }
+            this._rejectAll(`Simulation service at ${this.host}:${this.port} is unavailable.`);
+        });
+        this.socket = socket;
+        return socket;
+    }
+
+    _onLine(line) {
+        let message;
+        try {
+            message = JSON.parse(line);
+        } catch (error) {
+            console.error(`Unparseable output from the simulation service: ${line}`);
+            return;
+        }
+        const job = this.pending.get(message.id);
+        if (!job) {
+            return;
+        }
+        this.pending.delete(message.id);
+        clearTimeout(job.timer);
+        if (message.ok) {
+            job.resolve(message.result);
+        } else {
+            const error = new Error(message.error || 'Simulation failed.');
+            error.code = message.code;
+            job.reject(error);
+        }
+    }
+
+    _rejectAll(reason) {
+        for (const job of this.pending.values()) {
+            clearTimeout(job.timer);
+            const error = new Error(reason);
+            error.code = 'SERVICE_UNAVAILABLE';
+            job.reject(error);
+        }
+        this.pending.clear();
+    }
+}
+
+module.exports = { SimServiceClient };
@@ -0,0 +1,64 @@
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "processing"))
+
+from extract_cricsheet import DeliveryBuffer, parse_shard
+
+def delivery(batter, bowler, runs=0, **extra):
+    return dict({"batter": batter, "bowler": bowler, "non_striker": "C Striker",
+                 "runs": {"batter": runs, "extras": 0, "total": runs}}, **extra)
+
+def write_match(path, overs):
+    match = {
+        "info": {"dates": ["2024-01-01"], "teams": ["A", "B"], "venue": "Ground"},
+        "innings": [{"team": "A", "overs": overs}],
+    }
+    path.write_text(json.dumps(match), encoding="utf-8")
+    return str(path)
+
+def test_delivery_with_missing_fields_is_kept(tmp_path):
+    overs = [
+        {"over": 0, "deliveries": [delivery("A Batter", "B Bowler", 4, ball=1)]},
+        # no over number, no ball number and a null batter score
+        {"deliveries": [delivery("A Batter", "B Bowler", None)]},
+    ]
+    path = write_match(tmp_path / "1001.json", overs)
+
+    deliveries, results = parse_shard([(path, "ODI")])
+
+    assert [(rows, error) for *_, rows, error in results] == [(2, None)]
+    frame = deliveries.to_frame()
+    assert frame["over"].tolist()[0] == 0 and np.isnan(frame["over"].tolist()[1])
+    assert frame["ball"].tolist()[0] == 1 and np.isnan(frame["ball"].tolist()[1])
+    assert frame["runs_batter"].tolist()[0] == 4 and np.isnan(frame["runs_batter"].tolist()[1])
+    # columns without a missing value keep their integer type
+    assert frame["runs_extras"].dtype == np.int16
+    assert frame["batter"].tolist() == ["A Batter", "A Batter"]
+
+def test_failed_file_rolls_back_its_missing_values(tmp_path):
+    good = write_match(tmp_path / "1001.json", [{"over": 0, "deliveries": [delivery("A Batter", "B Bowler", 1)]}])
+    # the second delivery breaks parsing after the first (missing over) was buffered
+    bad = write_match(tmp_path / "1002.json", [{"deliveries": [delivery("A Batter", "B Bowler"), {"runs": 5}]}])
+
+    deliveries, results = parse_shard([(good, "ODI"), (bad, "ODI")])
+
+    assert results[1][-1] is not None
+    frame = deliveries.to_frame()
+    assert len(frame) == 1
+    assert frame["over"].dtype == np.int16
+
+def test_extend_offsets_missing_rows():
+    first, second = DeliveryBuffer(), DeliveryBuffer()
+    row = ("m1", "ODI", 1, "A", 0, 1.0, "X", "Y", "Z", 1, 0, 1, 0, None, None)
+    first.append(row)
+    second.append(row)
+    second.append(row[:4] + (None,) + row[5:])
+
+    first.extend(second)
+
+    overs = first.to_frame()["over"].tolist()
+    assert overs[:2] == [0, 0] and np.isnan(overs[2])
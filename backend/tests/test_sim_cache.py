@@ -0,0 +1,36 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "processing"))
+
+from sim_cache import SimulationCache
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def test_short_ttl_entries_expire_first():
+    clock = Clock()
+    cache = SimulationCache(max_entries=8, ttl=3600, clock=clock, unseeded_ttl=60)
+    cache.put("seeded", {"runs": 1})
+    cache.put("unseeded", {"runs": 2}, ttl=cache.unseeded_ttl)
+
+    clock.now += 59
+    assert cache.get("unseeded") == {"runs": 2}
+    clock.now += 2
+    assert cache.get("unseeded") is None
+    assert cache.get("seeded") == {"runs": 1}
+    assert cache.stats()["expirations"] == 1
+
+def test_short_ttl_survives_the_disk_tier(tmp_path):
+    clock = Clock()
+    path = str(tmp_path / "cache.sqlite")
+    SimulationCache(max_entries=8, ttl=3600, disk_path=path, clock=clock).put("unseeded", [3], ttl=60)
+
+    restarted = SimulationCache(max_entries=8, ttl=3600, disk_path=path, clock=clock)
+    assert restarted.get("unseeded") == [3]
+    clock.now += 61
+    assert SimulationCache(max_entries=8, ttl=3600, disk_path=path, clock=clock).get("unseeded") is None
@@ -0,0 +1,79 @@
+import builtins
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "processing"))
+
+import table_io
+from table_io import append_table, ball_table_writer, read_table, table_path, write_table
+
+def balls(match_id, batter, overs):
+    return pd.DataFrame({
+        "match_id": match_id, "format": "ODI", "inning": 1, "batting_team": "A", "over": overs,
+        "ball": 1.0, "batter": batter, "bowler": "B Bowler", "non_striker": "C Striker",
+        "runs_batter": 1, "runs_extras": 0, "runs_total": 1, "is_wicket": 0,
+        "wicket_kind": None, "player_out": None,
+    }, index=range(len(overs)))
+
+@pytest.fixture
+def parquet(monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(table_io, "STORAGE", "parquet")
+
+def test_csv_append_works_without_pyarrow(tmp_path, monkeypatch):
+    # pandas may use pyarrow itself, so only table_io's own imports of it fail
+    real_import = builtins.__import__
+
+    def no_pyarrow(name, globals=None, *args, **kwargs):
+        if name.startswith("pyarrow") and (globals or {}).get("__name__") == "table_io":
+            raise ImportError(f"No module named {name!r}")
+        return real_import(name, globals, *args, **kwargs)
+
+    monkeypatch.setattr(builtins, "__import__", no_pyarrow)
+    monkeypatch.setattr(table_io, "STORAGE", "csv")
+    with ball_table_writer("balls", str(tmp_path)) as writer:
+        writer.write(balls("m1", "A Batter", [0, 1]))
+
+    append_table(balls("m2", "D Batter", [0]), "balls", str(tmp_path))
+
+    assert table_path("balls", base_path=str(tmp_path)).endswith(".csv")
+    df = read_table("balls", base_path=str(tmp_path))
+    assert df["match_id"].tolist() == ["m1", "m1", "m2"]
+    assert df["batter"].tolist() == ["A Batter", "A Batter", "D Batter"]
+
+def test_append_writes_a_part_without_rewriting(tmp_path, parquet):
+    with ball_table_writer("balls", str(tmp_path)) as writer:
+        writer.write(balls("m1", "A Batter", [0, 1]))
+    first = os.stat(table_path("balls", base_path=str(tmp_path))).st_ino
+
+    append_table(balls("m2", "D Batter", [0]), "balls", str(tmp_path))
+    # a missing value in a column the first part stores as an integer
+    append_table(balls("m3", "A Batter", [None]), "balls", str(tmp_path))
+
+    path = table_path("balls", base_path=str(tmp_path))
+    assert sorted(os.listdir(path)) == ["part-00000.parquet", "part-00001.parquet", "part-00002.parquet"]
+    assert os.stat(os.path.join(path, "part-00000.parquet")).st_ino == first
+    df = read_table("balls", base_path=str(tmp_path))
+    assert df["match_id"].tolist() == ["m1", "m1", "m2", "m3"]
+    assert df["batter"].tolist() == ["A Batter", "A Batter", "D Batter", "A Batter"]
+    assert isinstance(df["batter"].dtype, pd.CategoricalDtype)
+    assert df["over"].tolist()[:3] == [0, 1, 0] and pd.isna(df["over"].iloc[3])
+    assert read_table("balls", columns=["runs_total"], base_path=str(tmp_path)).shape == (4, 1)
+
+def test_write_replaces_a_dataset_and_appends_compact(tmp_path, parquet, monkeypatch):
+    monkeypatch.setattr(table_io, "MAX_PARTS", 2)
+    write_table(balls("m1", "A Batter", [0]), "balls", str(tmp_path))
+    for match_id in ("m2", "m3"):
+        append_table(balls(match_id, "A Batter", [0]), "balls", str(tmp_path))
+
+    path = table_path("balls", base_path=str(tmp_path))
+    assert os.path.isfile(path)
+    assert read_table("balls", base_path=str(tmp_path))["match_id"].tolist() == ["m1", "m2", "m3"]
+
+    append_table(balls("m4", "A Batter", [0]), "balls", str(tmp_path))
+    write_table(balls("m5", "A Batter", [0]), "balls", str(tmp_path))
+    assert os.path.isfile(path)
+    assert read_table("balls", base_path=str(tmp_path))["match_id"].tolist() == ["m5"]